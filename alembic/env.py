@@ -5,6 +5,7 @@ from sqlalchemy import pool
 
 from alembic import context
 from app import config as settings
+from app import online_migrations
 from app.models import Base
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -23,6 +24,13 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+
+def include_name(name, type_, parent_names):
+    # Bookkeeping for interrupted backfills, not part of the schema
+    return not (type_ == "table" and name == online_migrations.CHECKPOINT_TABLE)
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -68,9 +76,22 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_name,
+            # SQLite can't ALTER most constraints; autogenerate batch (copy-and-move) operations for it
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
+        if online_migrations.dry_run():
+            # See app/online_migrations.py: only Postgres can roll back the DDL afterwards
+            if not context.get_context().impl.transactional_ddl:
+                raise SystemExit(f"dry_run needs transactional DDL, which {connection.dialect.name} lacks")
+            with connection.begin() as transaction:
+                context.run_migrations()
+                transaction.rollback()
+            print(f"Dry run: online migration steps estimated at ~{online_migrations.estimated_seconds:.0f}s")
+            return
+
         with context.begin_transaction():
             context.run_migrations()
 
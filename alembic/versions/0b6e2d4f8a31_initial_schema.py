@@ -0,0 +1,101 @@
+"""Initial schema
+
+Revision ID: 0b6e2d4f8a31
+Revises:
+Create Date: 2025-01-02 10:12:41.218730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6e2d4f8a31'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The tables as they stood before the first migration, so an empty
+    # database (a fresh SQLite file, a CI Postgres) can be built by
+    # `alembic upgrade head` alone. Databases created before this revision
+    # existed already have them and are past it.
+    op.create_table('founders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('password', sa.String(), nullable=False),
+    sa.Column('contact_details', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_founders_email'), 'founders', ['email'], unique=True)
+    op.create_index(op.f('ix_founders_id'), 'founders', ['id'], unique=False)
+    op.create_table('investors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('password', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_investors_email'), 'investors', ['email'], unique=True)
+    op.create_index(op.f('ix_investors_id'), 'investors', ['id'], unique=False)
+    op.create_table('admins',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('password', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_admins_email'), 'admins', ['email'], unique=True)
+    op.create_index(op.f('ix_admins_id'), 'admins', ['id'], unique=False)
+    op.create_table('projects',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('target_amount', sa.Float(), nullable=True),
+    sa.Column('image_url', sa.String(), nullable=True),
+    sa.Column('pdf_document_path', sa.String(), nullable=True),
+    sa.Column('founder_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['founder_id'], ['founders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_projects_id'), 'projects', ['id'], unique=False)
+    op.create_table('investments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('investor_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['investor_id'], ['investors.id'], ),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_investments_id'), 'investments', ['id'], unique=False)
+    op.create_table('updates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_updates_id'), 'updates', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_updates_id'), table_name='updates')
+    op.drop_table('updates')
+    op.drop_index(op.f('ix_investments_id'), table_name='investments')
+    op.drop_table('investments')
+    op.drop_index(op.f('ix_projects_id'), table_name='projects')
+    op.drop_table('projects')
+    op.drop_index(op.f('ix_admins_id'), table_name='admins')
+    op.drop_index(op.f('ix_admins_email'), table_name='admins')
+    op.drop_table('admins')
+    op.drop_index(op.f('ix_investors_id'), table_name='investors')
+    op.drop_index(op.f('ix_investors_email'), table_name='investors')
+    op.drop_table('investors')
+    op.drop_index(op.f('ix_founders_id'), table_name='founders')
+    op.drop_index(op.f('ix_founders_email'), table_name='founders')
+    op.drop_table('founders')
@@ -0,0 +1,43 @@
+"""Investor timeline
+
+Revision ID: 3f1c9a2e7b40
+Revises: 5574f6afb0d7
+Create Date: 2026-10-19 16:02:11.418233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import online_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a2e7b40'
+down_revision: Union[str, None] = '5574f6afb0d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('timeline_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('investor_id', sa.Integer(), nullable=False),
+    sa.Column('update_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['investor_id'], ['investors.id'], ),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['update_id'], ['updates.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_timeline_entries_investor_update', 'timeline_entries', ['investor_id', 'update_id'], unique=True)
+    online_migrations.create_index_concurrently('ix_updates_project_id_id', 'updates', ['project_id', 'id'])
+    op.add_column('projects', sa.Column('fanout_on_read', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('projects', 'fanout_on_read')
+    online_migrations.drop_index_concurrently('ix_updates_project_id_id', 'updates')
+    op.drop_index('ix_timeline_entries_investor_update', table_name='timeline_entries')
+    op.drop_table('timeline_entries')
@@ -0,0 +1,40 @@
+"""Investment timestamps and funding rollups
+
+Revision ID: 8a4d2c6e1f93
+Revises: 3f1c9a2e7b40
+Create Date: 2026-10-19 17:10:42.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4d2c6e1f93'
+down_revision: Union[str, None] = '3f1c9a2e7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('investments', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.create_table('funding_rollups',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('project_id', 'granularity', 'bucket')
+    )
+
+    # Historical investments have no real timestamp. They keep created_at NULL
+    # and stay out of the rollups: the funding charts start when timestamps
+    # did, rather than show every earlier investment at migration time.
+
+
+def downgrade() -> None:
+    op.drop_table('funding_rollups')
+    op.drop_column('investments', 'created_at')
@@ -0,0 +1,54 @@
+"""Backfill investor timelines
+
+Revision ID: a6c2e9f4d7b3
+Revises: f3b8d2a6c9e1
+Create Date: 2026-10-20 11:32:07.915342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import online_migrations
+from app.config import FANOUT_MAX_INVESTORS
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e9f4d7b3'
+down_revision: Union[str, None] = 'f3b8d2a6c9e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Updates per batch; each is copied to every investor of its project
+BACKFILL_BATCH_SIZE = 100
+
+
+def upgrade() -> None:
+    # Timelines only held updates posted after they were introduced. Projects
+    # too big to fan out are read at request time instead, as
+    # feed.fan_out_update would have decided when they next posted.
+    op.get_bind().execute(
+        sa.text(
+            "UPDATE projects SET fanout_on_read = :flag WHERE NOT fanout_on_read AND "
+            "(SELECT count(DISTINCT investor_id) FROM investments "
+            "WHERE investments.project_id = projects.id) > :max_investors"
+        ),
+        {"flag": True, "max_investors": FANOUT_MAX_INVESTORS},
+    )
+    # Every earlier update of the other projects, for everyone who backed them
+    online_migrations.backfill_insert(
+        'timeline_entries', ['investor_id', 'update_id', 'project_id'],
+        "SELECT DISTINCT investments.investor_id, updates.id, updates.project_id FROM updates "
+        "JOIN projects ON projects.id = updates.project_id AND NOT projects.fanout_on_read "
+        "JOIN investments ON investments.project_id = updates.project_id "
+        "WHERE updates.id > :last_key AND updates.id <= :upto AND NOT EXISTS ("
+        "SELECT 1 FROM timeline_entries WHERE timeline_entries.investor_id = investments.investor_id "
+        "AND timeline_entries.update_id = updates.id)",
+        key_table='updates', name='timeline_entries:backfill', batch_size=BACKFILL_BATCH_SIZE,
+    )
+
+
+def downgrade() -> None:
+    # The backfilled rows are indistinguishable from fanned-out ones and harmless to keep
+    pass
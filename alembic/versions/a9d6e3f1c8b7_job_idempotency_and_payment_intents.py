@@ -0,0 +1,39 @@
+"""Job idempotency keys and payment intents
+
+Revision ID: a9d6e3f1c8b7
+Revises: f4c3a7e9b5d2
+Create Date: 2026-10-19 19:34:50.226907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d6e3f1c8b7'
+down_revision: Union[str, None] = 'f4c3a7e9b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('idempotency_key', sa.String(), nullable=True))
+    # Batch mode, so SQLite (which can't ALTER in a constraint) rebuilds the table instead
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.create_unique_constraint('uq_jobs_idempotency_key', ['idempotency_key'])
+    op.add_column('investments', sa.Column('payment_intent_id', sa.String(), nullable=True))
+    op.add_column('investments', sa.Column('payment_status', sa.String(), nullable=True))
+    with op.batch_alter_table('investments') as batch_op:
+        batch_op.create_unique_constraint('uq_investments_payment_intent_id', ['payment_intent_id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('investments') as batch_op:
+        batch_op.drop_constraint('uq_investments_payment_intent_id', type_='unique')
+    op.drop_column('investments', 'payment_status')
+    op.drop_column('investments', 'payment_intent_id')
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_constraint('uq_jobs_idempotency_key', type_='unique')
+    op.drop_column('jobs', 'idempotency_key')
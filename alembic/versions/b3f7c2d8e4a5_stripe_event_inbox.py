@@ -0,0 +1,37 @@
+"""Stripe event inbox
+
+Revision ID: b3f7c2d8e4a5
+Revises: a9d6e3f1c8b7
+Create Date: 2026-10-19 20:12:03.671584
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f7c2d8e4a5'
+down_revision: Union[str, None] = 'a9d6e3f1c8b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stripe_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id')
+    )
+    op.create_index('ix_stripe_events_unprocessed', 'stripe_events', ['id'], unique=False, postgresql_where=sa.text('processed_at IS NULL'), sqlite_where=sa.text('processed_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stripe_events_unprocessed', table_name='stripe_events')
+    op.drop_table('stripe_events')
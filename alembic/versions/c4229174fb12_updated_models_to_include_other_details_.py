@@ -1,7 +1,7 @@
 """Updated models to include other_details field
 
 Revision ID: c4229174fb12
-Revises: 
+Revises: 0b6e2d4f8a31
 Create Date: 2025-01-06 18:56:00.584128
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = 'c4229174fb12'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '0b6e2d4f8a31'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
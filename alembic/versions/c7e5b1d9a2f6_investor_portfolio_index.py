@@ -0,0 +1,28 @@
+"""Investor portfolio index
+
+Revision ID: c7e5b1d9a2f6
+Revises: 8a4d2c6e1f93
+Create Date: 2026-10-19 17:48:05.913376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import online_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e5b1d9a2f6'
+down_revision: Union[str, None] = '8a4d2c6e1f93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online_migrations.create_index_concurrently('ix_investments_investor_project', 'investments', ['investor_id', 'project_id'], postgresql_include=['amount'])
+
+
+def downgrade() -> None:
+    online_migrations.drop_index_concurrently('ix_investments_investor_project', 'investments')
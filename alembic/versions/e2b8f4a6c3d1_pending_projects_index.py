@@ -0,0 +1,28 @@
+"""Pending projects index
+
+Revision ID: e2b8f4a6c3d1
+Revises: c7e5b1d9a2f6
+Create Date: 2026-10-19 18:21:37.170442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import online_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8f4a6c3d1'
+down_revision: Union[str, None] = 'c7e5b1d9a2f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online_migrations.create_index_concurrently('ix_projects_pending', 'projects', ['id'], where="status = 'pending' OR status IS NULL")
+
+
+def downgrade() -> None:
+    online_migrations.drop_index_concurrently('ix_projects_pending', 'projects')
@@ -0,0 +1,40 @@
+"""Resumable uploads
+
+Revision ID: e7a3c9d1b5f4
+Revises: d5a1e8c4f7b2
+Create Date: 2026-10-19 23:05:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c9d1b5f4'
+down_revision: Union[str, None] = 'd5a1e8c4f7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('uploads',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('founder_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('path', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['founder_id'], ['founders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_uploads_unattached_updated_at', 'uploads', ['updated_at'], unique=False, postgresql_where=sa.text("status != 'attached'"), sqlite_where=sa.text("status != 'attached'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_uploads_unattached_updated_at', table_name='uploads')
+    op.drop_table('uploads')
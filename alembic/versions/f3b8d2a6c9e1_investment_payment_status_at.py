@@ -0,0 +1,26 @@
+"""Investment payment status timestamp
+
+Revision ID: f3b8d2a6c9e1
+Revises: e7a3c9d1b5f4
+Create Date: 2026-10-20 09:14:22.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a6c9e1'
+down_revision: Union[str, None] = 'e7a3c9d1b5f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('investments', sa.Column('payment_status_at', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('investments', 'payment_status_at')
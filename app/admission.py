@@ -0,0 +1,211 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Optional
+
+from . import config
+
+PRUNE_THRESHOLD = 10000
+
+
+class TokenBucket:
+    """`rate` requests per second with bursts up to `burst`, one bucket per client."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def take(self, client: str) -> float:
+        """Spend one token. Returns 0 on success, otherwise seconds until a token is free."""
+        now = time.monotonic()
+        tokens, last = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[client] = (tokens - 1, now)
+        if len(self._buckets) > PRUNE_THRESHOLD:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float):
+        # Clients whose bucket has refilled are indistinguishable from new ones
+        refill = self.burst / self.rate
+        for client, (_, last) in list(self._buckets.items()):
+            if now - last > refill:
+                del self._buckets[client]
+
+
+class RouteClass:
+    """
+    A concurrency limit with a bounded wait queue for one class of routes.
+
+    Requests beyond `concurrency` queue in arrival order. A request is shed
+    up front when the expected wait, from queue depth and a moving average
+    of service time, already exceeds `budget` seconds, and is shed later if
+    it is still queued once `budget` has passed.
+    """
+
+    def __init__(self, name: str, concurrency: int, budget: float, rate: float, burst: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.budget = budget
+        self.limiter = TokenBucket(rate, burst) if rate > 0 else None
+        self.in_flight = 0
+        self.shed = 0
+        self.rate_limited = 0
+        self.service_seconds = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self) -> float:
+        return (self.queued + 1) * self.service_seconds / self.concurrency
+
+    async def acquire(self) -> Optional[float]:
+        """Take a slot. Returns None once admitted, or a Retry-After in seconds when shed."""
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            return None
+        wait = self.expected_wait()
+        if wait > self.budget:
+            self.shed += 1
+            return wait
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.budget)
+        except BaseException:
+            self._leave(waiter)
+            raise
+        if waiter.done():
+            return None
+        self._leave(waiter)
+        self.shed += 1
+        return self.expected_wait() or self.budget
+
+    def _leave(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as we gave up on it
+            self.release()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, elapsed: Optional[float] = None):
+        if elapsed is not None:
+            self.service_seconds = elapsed if not self.service_seconds else 0.8 * self.service_seconds + 0.2 * elapsed
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter; in_flight is unchanged
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def default_classes() -> dict[tuple[str, str], RouteClass]:
+    signin = RouteClass(
+        "signin", config.SIGNIN_CONCURRENCY, config.ADMISSION_BUDGET_SECONDS,
+        config.SIGNIN_RATE_PER_SECOND, config.SIGNIN_RATE_BURST,
+    )
+    upload = RouteClass(
+        "upload", config.UPLOAD_CONCURRENCY, config.ADMISSION_BUDGET_SECONDS,
+        config.UPLOAD_RATE_PER_SECOND, config.UPLOAD_RATE_BURST,
+    )
+    listing = RouteClass(
+        "listing", config.LISTING_CONCURRENCY, config.ADMISSION_BUDGET_SECONDS,
+        config.LISTING_RATE_PER_SECOND, config.LISTING_RATE_BURST,
+    )
+    return {
+        ("POST", "/signin"): signin,
+        ("POST", "/token"): signin,
+        ("POST", "/campaigns"): upload,
+        ("GET", "/campaigns"): listing,
+    }
+
+
+class AdmissionMiddleware:
+    """
+    Per-route-class concurrency limits and per-client token buckets.
+
+    Sign-in (bcrypt), campaign creation (file writes) and the full campaign
+    listing each get their own limit, so a burst on one can't occupy every
+    threadpool thread and stall the rest of the API. Over-rate clients get a
+    429 and requests that would queue past the latency budget get a 503, both
+    with Retry-After, before any of the request is read. Clients are keyed on
+    the peer address; run uvicorn with --proxy-headers behind a proxy.
+    """
+
+    def __init__(self, app, classes: Optional[dict[tuple[str, str], RouteClass]] = None):
+        self.app = app
+        self.classes = route_classes if classes is None else classes
+
+    async def __call__(self, scope, receive, send):
+        route_class = None
+        if scope["type"] == "http":
+            route_class = self.classes.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if route_class.limiter is not None:
+            client = (scope.get("client") or ("unknown", 0))[0]
+            retry_after = route_class.limiter.take(client)
+            if retry_after:
+                route_class.rate_limited += 1
+                await self._reject(send, 429, retry_after, "Too many requests")
+                return
+
+        retry_after = await route_class.acquire()
+        if retry_after is not None:
+            await self._reject(send, 503, retry_after, "Server is busy, try again shortly")
+            return
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release(time.monotonic() - started)
+
+    @staticmethod
+    async def _reject(send, status: int, retry_after: float, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+route_classes = default_classes()
+
+
+def stats() -> list[dict]:
+    """Queue depth, in-flight and shed counts per route class, for metrics."""
+    seen = {}
+    for route_class in route_classes.values():
+        seen.setdefault(route_class.name, route_class)
+    return [
+        {
+            "class": route_class.name,
+            "in_flight": route_class.in_flight,
+            "queued": route_class.queued,
+            "shed": route_class.shed,
+            "rate_limited": route_class.rate_limited,
+            "service_seconds": route_class.service_seconds,
+        }
+        for route_class in seen.values()
+    ]
@@ -23,7 +23,8 @@ fake_users_db = {
     "user@example.com": {
         "email": "user@example.com",
         "full_name": "John Doe",
-        "hashed_password": pwd_context.hash("password"),
+        # bcrypt hash of "password", precomputed so importing this module doesn't run bcrypt
+        "hashed_password": "$2b$12$Th34e4IaeyjiQkXfBd5QOeajtwj87YN45NRhwL2wDJBo8VVEj7wOq",
         "disabled": False,
     }
 }
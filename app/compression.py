@@ -0,0 +1,150 @@
+import gzip
+import zlib
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from . import config
+from .static_files import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Only these are worth compressing; images, PDFs and archives already are, and
+# text/event-stream must reach the client event by event
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/javascript", "application/xml", "image/svg+xml",
+    "text/plain", "text/html", "text/css", "text/csv", "text/javascript", "text/xml",
+}
+# Bodies above this are compressed in the threadpool instead of on the event loop
+THREAD_MINIMUM_BYTES = 128 * 1024
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to answer with, or None for identity."""
+    for encoding in accepted_encodings(accept_encoding):
+        if encoding == "gzip" or brotli is not None:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """One-shot compression at COMPRESSION_LEVEL (gzip 1-9) / BROTLI_QUALITY (0-11) unless `level` is given."""
+    if encoding == "br":
+        return brotli.compress(data, quality=config.BROTLI_QUALITY if level is None else level)
+    return gzip.compress(data, compresslevel=config.COMPRESSION_LEVEL if level is None else level, mtime=0)
+
+
+class _Stream:
+    """Incremental compressor for streamed bodies; every chunk is flushed so clients see it promptly."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=config.BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(config.COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, chunk: bytes, last: bool) -> bytes:
+        if self._brotli is not None:
+            data = self._brotli.process(chunk)
+            return data + (self._brotli.finish() if last else self._brotli.flush())
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _add_vary(headers: MutableHeaders):
+    if "accept-encoding" not in [v.strip().lower() for v in headers.get("vary", "").split(",")]:
+        headers.add_vary_header("Accept-Encoding")
+
+
+def exempt(endpoint):
+    """Mark a route's endpoint so CompressionMiddleware leaves its responses alone."""
+    endpoint.compression_exempt = True
+    return endpoint
+
+
+class CompressionMiddleware:
+    """
+    gzip/brotli for responses of COMPRESSIBLE_TYPES, negotiated on
+    Accept-Encoding. Bodies under `minimum_size` go out as they are, as do
+    responses that already carry a Content-Encoding (precompressed files,
+    the cached /campaigns body), partial content, and routes marked with
+    @exempt.
+    """
+
+    def __init__(self, app, minimum_size: int = config.COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+        # None until the first body message decides; then False (pass through) or a _Stream
+        stream = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                endpoint = getattr(scope.get("route"), "endpoint", None)
+                passthrough = (
+                    media_type not in COMPRESSIBLE_TYPES
+                    or "content-encoding" in headers
+                    or message["status"] in (204, 206, 304)
+                    or getattr(endpoint, "compression_exempt", False)
+                )
+                if passthrough:
+                    await send(message)
+                elif encoding is None:
+                    # Another client may be sent a compressed copy, so caches must key on the header
+                    _add_vary(MutableHeaders(raw=message["headers"]))
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None:
+                headers = MutableHeaders(raw=start["headers"])
+                _add_vary(headers)
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers["content-encoding"] = encoding
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    # The compressed bytes differ from the ones the strong ETag names
+                    headers["etag"] = "W/" + headers["etag"]
+                if not more_body:
+                    if len(body) >= THREAD_MINIMUM_BYTES:
+                        body = await run_in_threadpool(compress, body, encoding)
+                    else:
+                        body = compress(body, encoding)
+                    headers["content-length"] = str(len(body))
+                    passthrough = True
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                del headers["content-length"]
+                stream = _Stream(encoding)
+                await send(start)
+            await send({
+                "type": "http.response.body",
+                "body": stream.process(body, last=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,8 +1,18 @@
-from sqlalchemy import create_engine
+import sqlite3
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, declarative_base
-from .config import DATABASE_URL
+from .config import (
+    DATABASE_URL, SQL_ECHO, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE_BYTES,
+    SQLITE_BUSY_TIMEOUT_SECONDS,
+)
 
-engine = create_engine(DATABASE_URL, echo=True)
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, echo=SQL_ECHO, connect_args={"timeout": SQLITE_BUSY_TIMEOUT_SECONDS})
+else:
+    engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -13,3 +23,55 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def dialect_insert(db, table):
+    """An INSERT for `table` with the session's dialect, so ON CONFLICT clauses are available."""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+# ------------------------------------------------------------------
+#  SQLite
+# ------------------------------------------------------------------
+# SQLite takes one writer at a time. The driver only opens a transaction at
+# the first INSERT/UPDATE/DELETE, so reads never hold a snapshot a later
+# write would have to upgrade (the upgrade fails with "database is locked"
+# instead of waiting). Write transactions in this process then queue on
+# _writer_lock, held until the connection goes back to the pool after its
+# commit or rollback; other workers wait on the busy timeout.
+_writer_lock = threading.Lock()
+_WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _on_sqlite_connect(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    # Negative sizes are KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # Off by default in SQLite; Postgres always enforces them
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _before_sqlite_write(conn, cursor, statement, parameters, context, executemany):
+    if conn.info.get("writer") or not statement.lstrip().upper().startswith(_WRITES):
+        return
+    if not _writer_lock.acquire(timeout=SQLITE_BUSY_TIMEOUT_SECONDS):
+        raise sqlite3.OperationalError("database is locked (timed out waiting for the writer lock)")
+    conn.info["writer"] = True
+
+
+def _release_writer(dbapi_connection, connection_record, *args):
+    if connection_record is not None and connection_record.info.pop("writer", False):
+        _writer_lock.release()
+
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _on_sqlite_connect)
+    event.listen(engine, "before_cursor_execute", _before_sqlite_write)
+    event.listen(engine.pool, "checkin", _release_writer)
+    event.listen(engine.pool, "invalidate", _release_writer)
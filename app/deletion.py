@@ -0,0 +1,131 @@
+"""
+Deleting founders, campaigns and investors together with the rows that
+reference them.
+
+Children are removed leaves first with one DELETE ... WHERE <key> IN (...)
+per table, so no investment, update or timeline entry is loaded into the
+session and the number of statements doesn't grow with them. Files of the
+deleted campaigns and uploads are removed afterwards by a remove_files job
+(app/uploads.py) queued in the same transaction: nothing is unlinked if the
+delete rolls back, and the request doesn't wait on the filesystem.
+
+The callers commit, then drop the deleted campaigns from the in-process
+indexes (matching, rankings, the /campaigns feed).
+"""
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import events, jobs, models, series, uploads
+from .webhooks import UNCOUNTED_STATUSES
+
+# Rows fetched per round trip while reading an investor's investments
+STREAM_BATCH_SIZE = 1000
+
+# Tables holding a project_id, in the order their rows have to go
+_PROJECT_CHILDREN = (models.TimelineEntry, models.FundingRollup, models.Investment, models.Update)
+
+
+def _remove_files_later(db: Session, paths):
+    paths = sorted({path for path in paths if path})
+    if paths:
+        jobs.enqueue(db, "remove_files", {"paths": paths})
+
+
+def _delete_projects(db: Session, project_ids: list[int]):
+    for model in _PROJECT_CHILDREN:
+        db.query(model).filter(model.project_id.in_(project_ids)).delete(synchronize_session=False)
+    db.query(models.Project).filter(models.Project.id.in_(project_ids)).delete(synchronize_session=False)
+
+
+def delete_project(db: Session, project_id: int, files: tuple[str, ...]):
+    """Delete a campaign and everything under it; `files` are its stored image and proof document."""
+    _delete_projects(db, [project_id])
+    files = [path for path in files if path]
+    if files:
+        # Uploads the campaign claimed point at the same files
+        db.query(models.Upload).filter(models.Upload.path.in_(files)).delete(synchronize_session=False)
+    _remove_files_later(db, files)
+
+
+def delete_founder(db: Session, founder_id: int) -> list[int]:
+    """
+    Delete a founder, their campaigns with everything under them, and their
+    uploads. Returns the deleted campaign ids.
+    """
+    projects = db.execute(
+        select(models.Project.id, models.Project.image_url, models.Project.pdf_document_path)
+        .where(models.Project.founder_id == founder_id)
+    ).all()
+    project_ids = [row.id for row in projects]
+    if project_ids:
+        _delete_projects(db, project_ids)
+
+    founder_uploads = db.execute(
+        select(models.Upload.id, models.Upload.path).where(models.Upload.founder_id == founder_id)
+    ).all()
+    db.query(models.Upload).filter(models.Upload.founder_id == founder_id).delete(synchronize_session=False)
+    db.query(models.Founder).filter(models.Founder.id == founder_id).delete(synchronize_session=False)
+
+    _remove_files_later(db, [
+        *(path for row in projects for path in (row.image_url, row.pdf_document_path)),
+        *(row.path for row in founder_uploads),
+        *(uploads.partial_path(row.id) for row in founder_uploads),
+    ])
+    return project_ids
+
+
+def delete_investor(db: Session, investor_id: int):
+    """
+    Delete an investor and their investments and timeline entries, taking
+    the investments that still count out of the campaigns' fundsRaised and
+    funding rollups.
+    """
+    investment = models.Investment
+    counted = (
+        investment.investor_id == investor_id,
+        or_(investment.payment_status.is_(None), investment.payment_status.notin_(UNCOUNTED_STATUSES)),
+    )
+
+    # Rollups: summed per bucket while the investments stream past
+    rows = db.execute(
+        select(investment.project_id, investment.created_at, investment.amount)
+        .where(*counted)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    series.record_funding_many(db, (
+        (row.project_id, row.created_at, -row.amount, -1) for row in rows
+    ))
+
+    totals = {
+        row.project_id: row for row in db.execute(
+            select(investment.project_id, func.sum(investment.amount).label("amount"), func.count().label("count"))
+            .where(*counted)
+            .group_by(investment.project_id)
+        )
+    }
+    if totals:
+        held = (
+            select(func.sum(investment.amount))
+            .where(*counted, investment.project_id == models.Project.id)
+            .scalar_subquery()
+        )
+        projects = db.execute(
+            update(models.Project)
+            .where(models.Project.id.in_(list(totals)))
+            .values(fundsRaised=func.coalesce(models.Project.fundsRaised, 0.0) - held)
+            .returning(models.Project.id, models.Project.fundsRaised, models.Project.target_amount),
+            execution_options={"synchronize_session": False},
+        ).all()
+        events.publish_funding_many(db, [
+            events.funding_snapshot(
+                project, delta=-totals[project.id].amount, count=-totals[project.id].count,
+                investor_id=investor_id,
+            )
+            for project in projects
+        ])
+
+    db.query(models.TimelineEntry).filter(
+        models.TimelineEntry.investor_id == investor_id
+    ).delete(synchronize_session=False)
+    db.query(investment).filter(investment.investor_id == investor_id).delete(synchronize_session=False)
+    db.query(models.Investor).filter(models.Investor.id == investor_id).delete(synchronize_session=False)
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal, engine
+from .config import FUNDING_STREAM_MAX_RATE
+
+logger = logging.getLogger(__name__)
+
+FUNDING_CHANNEL = "funding"
+_PENDING_KEY = "pending_funding_events"
+# Backoff between attempts to re-establish a dropped LISTEN connection
+LISTEN_RETRY_SECONDS = (0.5, 30.0)
+
+
+class Subscription:
+    """Latest funding snapshot for one listener. Older unsent snapshots are simply overwritten."""
+
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.latest: Optional[dict] = None
+        self.ready = asyncio.Event()
+
+    def push(self, payload: dict):
+        self.latest = payload
+        self.ready.set()
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        payload, self.latest = self.latest, None
+        return payload
+
+
+class FundingBroker:
+    """
+    In-process pub/sub for campaign funding totals.
+
+    Publishes for the same campaign are coalesced so subscribers see at most
+    FUNDING_STREAM_MAX_RATE messages per second, always carrying the newest
+    totals. With Postgres, each worker LISTENs on FUNDING_CHANNEL so changes
+    committed by any worker reach every worker's subscribers.
+    """
+
+    def __init__(self, max_rate: float = FUNDING_STREAM_MAX_RATE):
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers: dict[int, set[Subscription]] = {}
+        self.listeners: list[Callable[[dict], None]] = []
+        self._pending: dict[int, dict] = {}
+        self._last_sent: dict[int, float] = {}
+        self._listen_conn = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Bind to the running loop and, on Postgres, start listening for notifications."""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        if engine.dialect.name == "postgresql":
+            self._listen(self._open_listen_connection())
+
+    def stop(self):
+        """Detach from the loop and drop listeners, so a later start() begins clean."""
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        self._close_listen_connection()
+        self.loop = None
+        self.listeners.clear()
+        self._pending.clear()
+        self._last_sent.clear()
+
+    @staticmethod
+    def _open_listen_connection():
+        raw = engine.raw_connection()
+        conn = raw.driver_connection
+        conn.set_session(autocommit=True)
+        conn.cursor().execute(f"LISTEN {FUNDING_CHANNEL}")
+        return raw
+
+    def _listen(self, raw):
+        conn = raw.driver_connection
+        self._listen_conn = raw
+
+        def on_readable():
+            try:
+                conn.poll()
+            except Exception:
+                logger.warning("Lost the %s LISTEN connection; reconnecting", FUNDING_CHANNEL, exc_info=True)
+                self._close_listen_connection()
+                self._reconnect_task = self.loop.create_task(self._reconnect())
+                return
+            while conn.notifies:
+                self._publish(json.loads(conn.notifies.pop(0).payload))
+
+        self.loop.add_reader(conn.fileno(), on_readable)
+
+    def _close_listen_connection(self):
+        raw, self._listen_conn = self._listen_conn, None
+        if raw is None:
+            return
+        try:
+            self.loop.remove_reader(raw.driver_connection.fileno())
+        except Exception:
+            # A closed connection has no descriptor left to unregister
+            pass
+        # Never hand a broken connection back to the pool
+        raw.invalidate()
+
+    async def _reconnect(self):
+        delay, max_delay = LISTEN_RETRY_SECONDS
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                raw = await self.loop.run_in_executor(None, self._open_listen_connection)
+            except Exception:
+                logger.warning("LISTEN reconnect failed; retrying in %.1fs", min(delay * 2, max_delay))
+                delay = min(delay * 2, max_delay)
+                continue
+            self._listen(raw)
+            self._reconnect_task = None
+            logger.warning("Listening on %s again; changes committed while disconnected were not delivered",
+                           FUNDING_CHANNEL)
+            return
+
+    def subscribe(self, project_id: int) -> Subscription:
+        sub = Subscription(project_id)
+        self.subscribers.setdefault(project_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self.subscribers.get(sub.project_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                # Nobody left to rate-limit for; a pending flush finds nothing and returns
+                del self.subscribers[sub.project_id]
+                self._pending.pop(sub.project_id, None)
+                self._last_sent.pop(sub.project_id, None)
+
+    def add_listener(self, callback: Callable[[dict], None]):
+        """Call `callback` on the loop for every funding event, before coalescing."""
+        self.listeners.append(callback)
+
+    def publish(self, payload: dict):
+        """Thread-safe entry point; request handlers call this from the threadpool."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._publish, payload)
+
+    def _publish(self, payload: dict):
+        for listener in self.listeners:
+            listener(payload)
+        project_id = payload["project_id"]
+        if project_id not in self.subscribers:
+            return
+        scheduled = project_id in self._pending
+        self._pending[project_id] = payload
+        if scheduled:
+            return
+        delay = self._last_sent.get(project_id, 0.0) + self.interval - time.monotonic()
+        if delay > 0:
+            self.loop.call_later(delay, self._flush, project_id)
+        else:
+            self._flush(project_id)
+
+    def _flush(self, project_id: int):
+        payload = self._pending.pop(project_id, None)
+        if payload is None:
+            return
+        self._last_sent[project_id] = time.monotonic()
+        for sub in self.subscribers.get(project_id, ()):
+            sub.push(payload)
+
+
+broker = FundingBroker()
+
+
+def funding_snapshot(project, delta: float = 0.0, count: int = 0, investor_id: Optional[int] = None) -> dict:
+    funds = project.fundsRaised or 0.0
+    return {
+        "project_id": project.id,
+        "investor_id": investor_id,
+        "delta": delta,
+        "count": count,
+        "fundsRaised": funds,
+        "targetAmount": project.target_amount,
+        "progress": (funds / project.target_amount) * 100 if project.target_amount else 0.0,
+    }
+
+
+def publish_funding(db: Session, project, delta: float = 0.0, count: int = 0, investor_id: Optional[int] = None):
+    """
+    Queue a funding change for delivery once the session commits.
+
+    `delta` is the change in fundsRaised and `count` the change in the number
+    of investments, for listeners that track velocity rather than totals.
+    `investor_id` names whose holdings changed, for per-investor caches.
+
+    On Postgres this is a pg_notify inside the caller's transaction, so it is
+    only delivered if the transaction commits. Other backends hand the event
+    to the local broker from the after_commit hook.
+    """
+    payload = funding_snapshot(project, delta, count, investor_id)
+    if engine.dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": FUNDING_CHANNEL, "payload": json.dumps(payload)},
+        )
+    else:
+        db.info.setdefault(_PENDING_KEY, []).append(payload)
+
+
+def publish_funding_many(db: Session, payloads: list[dict]):
+    """publish_funding for several funding_snapshot payloads; one pg_notify statement on Postgres."""
+    if not payloads:
+        return
+    if engine.dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {"channel": FUNDING_CHANNEL, "payloads": [json.dumps(payload) for payload in payloads]},
+        )
+    else:
+        db.info.setdefault(_PENDING_KEY, []).extend(payloads)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _dispatch_pending(session):
+    for payload in session.info.pop(_PENDING_KEY, []):
+        broker.publish(payload)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
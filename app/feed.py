@@ -0,0 +1,134 @@
+from typing import Optional
+
+from sqlalchemy import delete, exists, select, insert, func, literal, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import FANOUT_MAX_INVESTORS
+from .database import dialect_insert
+
+
+def _project_investors(project_id: int):
+    return (
+        select(models.Investment.investor_id)
+        .where(models.Investment.project_id == project_id)
+        .distinct()
+    )
+
+
+def fan_out_update(db: Session, project: models.Project, update: models.Update):
+    """
+    Copy a new update into the timeline of every investor of its project.
+
+    The rows are written with a single INSERT ... SELECT, so the number of
+    statements does not grow with the number of investors. Projects above
+    FANOUT_MAX_INVESTORS are switched to fan-out on read instead.
+    """
+    if project.fanout_on_read:
+        return
+    investors = _project_investors(project.id).subquery()
+    count = db.scalar(select(func.count()).select_from(investors))
+    if count > FANOUT_MAX_INVESTORS:
+        project.fanout_on_read = True
+        return
+    db.execute(
+        insert(models.TimelineEntry).from_select(
+            ["investor_id", "update_id", "project_id"],
+            select(
+                investors.c.investor_id,
+                literal(update.id),
+                literal(project.id),
+            ),
+        )
+    )
+
+
+def add_investor(db: Session, investor_id: int, project: models.Project):
+    """
+    Copy the updates a project posted so far into the timeline of an
+    investor who just backed it, as get_project_updates shows them all.
+    Already copied updates are skipped, so repeat investments are harmless.
+    """
+    if project.fanout_on_read:
+        return
+    db.execute(
+        dialect_insert(db, models.TimelineEntry.__table__)
+        .from_select(
+            ["investor_id", "update_id", "project_id"],
+            select(literal(investor_id), models.Update.id, models.Update.project_id)
+            .where(models.Update.project_id == project.id),
+        )
+        .on_conflict_do_nothing(index_elements=["investor_id", "update_id"])
+    )
+
+
+def remove_investor(db: Session, investor_id: int, project_id: int):
+    """
+    Drop a project's updates from an investor's timeline once they hold no
+    investment in it any more, as get_project_updates stops showing them
+    then. Call it after the investment was deleted or moved and flushed.
+    """
+    db.execute(
+        delete(models.TimelineEntry)
+        .where(
+            models.TimelineEntry.investor_id == investor_id,
+            models.TimelineEntry.project_id == project_id,
+            ~exists().where(
+                models.Investment.investor_id == investor_id,
+                models.Investment.project_id == project_id,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_investor_feed(db: Session, investor_id: int, before: Optional[int] = None, limit: int = 20):
+    """
+    Newest-first updates for an investor, keyset-paginated on the update id.
+
+    Fanned-out updates come from the investor's timeline rows; updates of
+    fan-out-on-read projects are pulled from the projects they invested in.
+    Each source is its own ordered, limited read along an index
+    (timeline_entries by investor and update, updates by project and id),
+    and only the newest `limit` of the two are loaded. A project switched to
+    fan-out on read is skipped in the timeline, so no update shows twice.
+    """
+    pushed = (
+        select(models.TimelineEntry.update_id.label("id"))
+        .join(models.Project, models.Project.id == models.TimelineEntry.project_id)
+        .where(
+            models.TimelineEntry.investor_id == investor_id,
+            models.Project.fanout_on_read.is_(False),
+        )
+        .order_by(models.TimelineEntry.update_id.desc())
+        .limit(limit)
+    )
+    pulled_projects = (
+        select(models.Investment.project_id)
+        .join(models.Project, models.Project.id == models.Investment.project_id)
+        .where(
+            models.Investment.investor_id == investor_id,
+            models.Project.fanout_on_read.is_(True),
+        )
+    )
+    pulled = (
+        select(models.Update.id)
+        .where(models.Update.project_id.in_(pulled_projects))
+        .order_by(models.Update.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        pushed = pushed.where(models.TimelineEntry.update_id < before)
+        pulled = pulled.where(models.Update.id < before)
+    # Wrapped so each branch keeps its ORDER BY / LIMIT inside the UNION ALL
+    newest = union_all(
+        select(pushed.subquery().c.id),
+        select(pulled.subquery().c.id),
+    ).subquery()
+    return (
+        db.query(models.Update)
+        .join(newest, models.Update.id == newest.c.id)
+        .order_by(models.Update.id.desc())
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, update
+from starlette.datastructures import Headers
+
+from . import models, config
+from .database import SessionLocal, dialect_insert
+from .jobs import job_handler, enqueue
+
+IN_PROGRESS, COMPLETED = "in_progress", "completed"
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.1
+
+
+def _begin(principal: str, key: str) -> Optional[dict]:
+    """
+    Claim the key for this request. Returns None when the caller now owns it,
+    otherwise the state of the existing record.
+    """
+    now = datetime.utcnow()
+    lock_until = now + timedelta(seconds=config.IDEMPOTENCY_LOCK_SECONDS)
+    table = models.IdempotencyRecord.__table__
+    with SessionLocal() as db:
+        inserted = db.execute(
+            dialect_insert(db, table)
+            .values(principal=principal, key=key, state=IN_PROGRESS, expires_at=lock_until)
+            .on_conflict_do_nothing(index_elements=["principal", "key"])
+            .returning(table.c.key)
+        ).first()
+        if inserted is None:
+            # Expired record (finished long ago, or its owner died): take it over
+            inserted = db.execute(
+                update(table)
+                .where(table.c.principal == principal, table.c.key == key, table.c.expires_at < now)
+                .values(state=IN_PROGRESS, expires_at=lock_until, status_code=None, headers=None, body=None)
+                .returning(table.c.key)
+            ).first()
+        db.commit()
+        if inserted is not None:
+            return None
+        record = db.get(models.IdempotencyRecord, (principal, key))
+        if record is None:
+            return {"state": IN_PROGRESS}
+        return {
+            "state": record.state,
+            "status_code": record.status_code,
+            "headers": record.headers,
+            "body": record.body,
+        }
+
+
+def _complete(principal: str, key: str, status_code: int, headers: list, body: bytes):
+    with SessionLocal() as db:
+        db.execute(
+            update(models.IdempotencyRecord)
+            .where(models.IdempotencyRecord.principal == principal, models.IdempotencyRecord.key == key)
+            .values(
+                state=COMPLETED,
+                status_code=status_code,
+                headers=json.dumps(headers),
+                body=body,
+                expires_at=datetime.utcnow() + timedelta(seconds=config.IDEMPOTENCY_TTL_SECONDS),
+            )
+        )
+        db.commit()
+
+
+def _abandon(principal: str, key: str):
+    with SessionLocal() as db:
+        db.execute(
+            delete(models.IdempotencyRecord)
+            .where(models.IdempotencyRecord.principal == principal, models.IdempotencyRecord.key == key)
+        )
+        db.commit()
+
+
+class IdempotencyMiddleware:
+    """
+    Idempotency-Key support for selected POST routes.
+
+    The first request with a given key runs normally and its response is
+    stored for IDEMPOTENCY_TTL_SECONDS. Retries with the same key get that
+    response back before the request body is read, so a retried upload is
+    never parsed or written again. A retry that arrives while the original
+    is still running waits for it instead of running in parallel. Keys are
+    scoped to the route and the caller: the Authorization header, or the
+    query string that carries investor_id/founder_id today.
+    """
+
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = set(paths)
+        self._done: dict[tuple[str, str], asyncio.Event] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await self._send(send, 400, [], json.dumps({"detail": "Invalid Idempotency-Key"}).encode())
+            return
+
+        caller = headers.get("authorization", "") + "|" + scope.get("query_string", b"").decode("latin-1")
+        principal = scope["path"] + ":" + hashlib.sha256(caller.encode()).hexdigest()
+        deadline = time.monotonic() + config.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record = await run_in_threadpool(_begin, principal, key)
+            if record is None:
+                await self._run(scope, receive, send, principal, key)
+                return
+            if record["state"] == COMPLETED:
+                await self._send(send, record["status_code"], json.loads(record["headers"]), record["body"],
+                                 replayed=True)
+                return
+            if time.monotonic() > deadline:
+                await self._send(send, 409, [["retry-after", "1"]],
+                                 json.dumps({"detail": "A request with this Idempotency-Key is in progress"}).encode())
+                return
+            done = self._done.get((principal, key))
+            try:
+                if done is not None:
+                    await asyncio.wait_for(done.wait(), POLL_SECONDS)
+                else:
+                    await asyncio.sleep(POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, scope, receive, send, principal: str, key: str):
+        done = self._done[(principal, key)] = asyncio.Event()
+        response = {"status": 500, "headers": [], "body": bytearray()}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [[k.decode("latin-1"), v.decode("latin-1")] for k, v in message["headers"]]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except BaseException:
+            await run_in_threadpool(_abandon, principal, key)
+            raise
+        else:
+            if response["status"] >= 500:
+                # Server errors aren't a result worth replaying; let the retry run again
+                await run_in_threadpool(_abandon, principal, key)
+            else:
+                await run_in_threadpool(
+                    _complete, principal, key, response["status"], response["headers"], bytes(response["body"])
+                )
+        finally:
+            done.set()
+            self._done.pop((principal, key), None)
+
+    @staticmethod
+    async def _send(send, status: int, headers: list, body: bytes, replayed: bool = False):
+        raw = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers
+               if k.lower() not in ("content-length", "content-type")]
+        content_type = next((v for k, v in headers if k.lower() == "content-type"), "application/json")
+        raw.append((b"content-type", content_type.encode("latin-1")))
+        raw.append((b"content-length", str(len(body)).encode()))
+        if replayed:
+            raw.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status, "headers": raw})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _purge_expired():
+    with SessionLocal() as db:
+        db.execute(delete(models.IdempotencyRecord).where(
+            models.IdempotencyRecord.expires_at < datetime.utcnow()
+        ))
+        next_run = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        schedule_purge(db, next_run)
+        db.commit()
+
+
+def schedule_purge(db, run_at: datetime):
+    """Queue the hourly cleanup; the key keeps workers from queueing it twice."""
+    enqueue(db, "purge_idempotency_records", {}, run_at=run_at,
+            idempotency_key=f"purge-idempotency:{run_at:%Y%m%d%H}")
+
+
+@job_handler("purge_idempotency_records")
+async def purge_idempotency_records(payload: dict):
+    await run_in_threadpool(_purge_expired)
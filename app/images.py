@@ -0,0 +1,114 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+from . import config
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Feeds then only carry the original image_url
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Derivative name -> width in pixels. Originals narrower than a width are
+# never upscaled; that size is then just the original re-encoded.
+SIZES = {"thumb": 160, "card": 480, "hero": 1600}
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+
+_DERIVATIVE = re.compile(r"^(?P<original>.+)\.(?P<size>[a-z]+)\.(?P<format>[a-z0-9]+)$")
+# One lock per derivative path, so concurrent first requests resize once per process
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def is_image(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def derivative_path(original: str, size: str) -> str:
+    """Stored next to the original: image_x.png -> image_x.png.card.webp."""
+    return f"{original}.{size}.{config.IMAGE_DERIVATIVE_FORMAT}"
+
+
+def parse_derivative(path: str) -> Optional[tuple[str, str]]:
+    """(original path, size) if `path` names a derivative, else None."""
+    match = _DERIVATIVE.match(path)
+    if (match is None or match["size"] not in SIZES or match["format"] != config.IMAGE_DERIVATIVE_FORMAT
+            or not is_image(match["original"])):
+        return None
+    return match["original"], match["size"]
+
+
+def _render(original: str, size: str, target: str):
+    with Image.open(original) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        width = SIZES[size]
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        # Readers may be serving the file right now, so write aside and swap it in whole.
+        # The name is unique: other processes may be rendering the same derivative.
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target), prefix=os.path.basename(target) + ".",
+                                         suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, format=config.IMAGE_DERIVATIVE_FORMAT.upper(),
+                           quality=config.IMAGE_DERIVATIVE_QUALITY, method=4)
+            # mkstemp creates it owner-only
+            shutil.copymode(original, temporary)
+            os.replace(temporary, target)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+
+def ensure_derivative(original: str, size: str) -> Optional[str]:
+    """Path of the derivative, rendering it first if it doesn't exist yet; None if it can't be made."""
+    if not available() or not is_image(original) or size not in SIZES:
+        return None
+    target = derivative_path(original, size)
+    with _locks_guard:
+        lock = _locks.setdefault(target, threading.Lock())
+    with lock:
+        try:
+            if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(original):
+                return target
+            _render(original, size, target)
+        except (OSError, Image.DecompressionBombError) as exc:
+            logger.warning("Could not render %s derivative of %s: %s", size, original, exc)
+            return None
+        finally:
+            with _locks_guard:
+                _locks.pop(target, None)
+    return target
+
+
+def generate_derivatives(path: str):
+    for size in SIZES:
+        ensure_derivative(path, size)
+
+
+def srcset(image_url: str) -> dict:
+    """
+    Size name -> URL and width of each derivative of a stored image, for
+    feed cards to pick from. URLs work before the derivative exists; the
+    /static mount renders a missing one on its first request.
+    """
+    if not available() or not image_url or not is_image(image_url):
+        return {}
+    name = os.path.basename(image_url)
+    return {
+        size: {"url": f"{config.HOST_ADDRESS}/static/{derivative_path(name, size)}", "width": width}
+        for size, width in SIZES.items()
+    }
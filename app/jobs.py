@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+from .config import JOB_POLL_SECONDS, JOB_BATCH_SIZE, JOB_LOCK_TIMEOUT_SECONDS, JOB_RETENTION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+# Rows per DELETE when purging finished jobs, so the purge never holds the writer for long
+PURGE_BATCH_SIZE = 1000
+
+handlers: dict[str, Callable[[dict], Awaitable[None]]] = {}
+
+
+def job_handler(kind: str):
+    """Register an async function as the handler for jobs of `kind`."""
+    def register(func):
+        handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: dict, run_at: Optional[datetime] = None,
+            max_attempts: int = 5, idempotency_key: Optional[str] = None) -> models.Job:
+    """
+    Add a job to the caller's session. It becomes visible to workers when the
+    caller commits, so a request that rolls back never leaves work behind.
+
+    A job with the same `idempotency_key` is only ever created once; later
+    calls return the existing job instead.
+    """
+    job = models.Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        run_at=run_at or datetime.utcnow(),
+        max_attempts=max_attempts,
+        idempotency_key=idempotency_key,
+    )
+    if idempotency_key is None:
+        db.add(job)
+        return job
+    existing = db.query(models.Job).filter(models.Job.idempotency_key == idempotency_key).first()
+    if existing is not None:
+        return existing
+    try:
+        # A savepoint, so losing a race to a concurrent enqueue doesn't abort the caller's transaction
+        with db.begin_nested():
+            db.add(job)
+    except IntegrityError:
+        return db.query(models.Job).filter(models.Job.idempotency_key == idempotency_key).one()
+    return job
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts * 5, 3600))
+
+
+def claim(limit: int) -> list[tuple[int, str, dict]]:
+    """
+    Mark up to `limit` due jobs as running and return them.
+
+    Postgres claims with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    workers can poll the same table without handing out a job twice. Jobs
+    left running longer than JOB_LOCK_TIMEOUT_SECONDS by a dead worker are
+    picked up again. SQLite has no row locks, so the UPDATE repeats the
+    "job is due" condition and only the rows it actually changed are
+    returned: of two workers that selected the same job, one claims it.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=JOB_LOCK_TIMEOUT_SECONDS)
+    is_due = or_(
+        and_(models.Job.status == QUEUED, models.Job.run_at <= now),
+        and_(models.Job.status == RUNNING, models.Job.locked_at < stale),
+    )
+    due = (
+        select(models.Job.id)
+        .where(is_due)
+        .order_by(models.Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    with SessionLocal() as db:
+        ids = db.scalars(due).all()
+        if not ids:
+            return []
+        rows = db.execute(
+            update(models.Job)
+            .where(models.Job.id.in_(ids), is_due)
+            .values(status=RUNNING, locked_at=now, attempts=models.Job.attempts + 1)
+            .returning(models.Job.id, models.Job.kind, models.Job.payload),
+            execution_options={"synchronize_session": False},
+        ).all()
+        db.commit()
+    return [(row.id, row.kind, json.loads(row.payload)) for row in rows]
+
+
+def finish(job_id: int, error: Optional[str] = None, payload: Optional[dict] = None):
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        if payload is not None:
+            job.payload = json.dumps(payload)
+        if error is None:
+            job.status = DONE
+        elif job.attempts >= job.max_attempts:
+            job.status = FAILED
+        else:
+            job.status = QUEUED
+            job.run_at = datetime.utcnow() + backoff(job.attempts)
+        job.last_error = error
+        job.locked_at = None
+        db.commit()
+
+
+async def run_job(job_id: int, kind: str, payload: dict):
+    """
+    Run one claimed job. Handlers may narrow `payload` in place before
+    raising, so the retry only redoes the work that is still outstanding.
+    """
+    handler = handlers.get(kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind {kind!r}")
+        await handler(payload)
+    except Exception:
+        logger.exception("Job %s (%s) failed", job_id, kind)
+        await run_in_threadpool(finish, job_id, traceback.format_exc(), payload)
+    else:
+        await run_in_threadpool(finish, job_id)
+
+
+def _purge_finished() -> int:
+    """
+    Delete done and failed jobs due more than JOB_RETENTION_SECONDS ago, a
+    batch per transaction, and queue the next hourly purge.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_RETENTION_SECONDS)
+    finished = (
+        select(models.Job.id)
+        .where(models.Job.status.in_((DONE, FAILED)), models.Job.run_at < cutoff)
+        .limit(PURGE_BATCH_SIZE)
+    )
+    purged = 0
+    with SessionLocal() as db:
+        while True:
+            ids = db.scalars(finished).all()
+            if ids:
+                db.execute(delete(models.Job).where(models.Job.id.in_(ids)),
+                           execution_options={"synchronize_session": False})
+                purged += len(ids)
+            if len(ids) < PURGE_BATCH_SIZE:
+                break
+            db.commit()
+        next_run = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        schedule_purge(db, next_run)
+        db.commit()
+    if purged:
+        logger.info("Purged %d finished jobs", purged)
+    return purged
+
+
+def schedule_purge(db: Session, run_at: datetime):
+    """Queue the hourly cleanup of finished jobs; the key keeps workers from queueing it twice."""
+    enqueue(db, "purge_finished_jobs", {}, run_at=run_at,
+            idempotency_key=f"purge-jobs:{run_at:%Y%m%d%H}")
+
+
+@job_handler("purge_finished_jobs")
+async def purge_finished_jobs(payload: dict):
+    await run_in_threadpool(_purge_finished)
+
+
+class JobRunner:
+    """Polls the jobs table from the event loop and runs claimed jobs concurrently."""
+
+    def __init__(self, batch_size: int = JOB_BATCH_SIZE, poll_seconds: float = JOB_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.running: set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.running:
+            await asyncio.gather(*self.running, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            free = self.batch_size - len(self.running)
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await run_in_threadpool(claim, free)
+                except Exception:
+                    logger.exception("Claiming jobs failed")
+            for job in claimed:
+                task = asyncio.create_task(run_job(*job))
+                self.running.add(task)
+                task.add_done_callback(self.running.discard)
+            if len(claimed) < free or free <= 0:
+                await asyncio.sleep(self.poll_seconds)
+
+
+runner = JobRunner()
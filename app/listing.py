@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, selectinload
+
+from . import compression, config, models, snapshot
+from .database import SessionLocal
+
+# Paid once per feed version, so higher than the per-response levels. Brotli's
+# 10-11 cost seconds on a megabyte feed for ~15% fewer bytes.
+CACHED_LEVELS = {"br": 9, "gzip": 9}
+
+
+def build(db: Session) -> bytes:
+    """The GET /campaigns body, serialized."""
+    # get_dict counts each project's investments; load them all in one query, not one per project
+    projects = db.query(models.Project).options(selectinload(models.Project.investors)).all()
+    return JSONResponse(jsonable_encoder([p.get_dict() for p in projects])).body
+
+
+def encode(body: bytes, encoding: str) -> bytes:
+    return compression.compress(body, encoding, level=CACHED_LEVELS[encoding])
+
+
+def build_snapshot() -> dict[str, bytes]:
+    """Every encoding of a fresh body, for the shared snapshot (app/snapshot.py)."""
+    db = SessionLocal()
+    try:
+        body = build(db)
+    finally:
+        db.close()
+    bodies = {"identity": body, "gzip": encode(body, "gzip")}
+    if compression.brotli is not None:
+        bodies["br"] = encode(body, "br")
+    return bodies
+
+
+class ListingCache:
+    """
+    The serialized GET /campaigns body for the current feed version, plus
+    its gzip/brotli encodings, built once and reused until the version moves.
+
+    The version is per worker. It moves on this worker's campaign writes and
+    on funding events, which on Postgres arrive from every worker. Campaign
+    edits made through another worker, and the daily tick of
+    daysRemaining, show up once an entry is LISTING_CACHE_SECONDS old.
+
+    With LISTING_SNAPSHOT_PATH set, workers serve the shared snapshot and
+    this cache only covers for it while there is none; a bump then also
+    tells the snapshot publisher to rebuild.
+    """
+
+    def __init__(self, ttl: float = config.LISTING_CACHE_SECONDS):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entry: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+            self._entry = None
+        if snapshot.enabled():
+            snapshot.mark_dirty()
+
+    def get(self, encoding: Optional[str], build: Callable[[], bytes]) -> bytes:
+        """The body in `encoding` (None for identity); `build` serializes it on a miss."""
+        key = encoding or "identity"
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry["expires"] < time.monotonic():
+                entry = self._entry = None
+            if entry is not None and key in entry["bodies"]:
+                self.hits += 1
+                return entry["bodies"][key]
+            self.misses += 1
+            version = self.version
+        if entry is None:
+            # Built outside the lock; a bump meanwhile means this body may predate it, so it isn't kept
+            entry = {"version": version, "expires": time.monotonic() + self.ttl, "bodies": {"identity": build()}}
+        body = entry["bodies"]["identity"]
+        if encoding is not None:
+            body = encode(body, encoding)
+        with self._lock:
+            if self.version == version and (self._entry is None or self._entry is entry):
+                entry["bodies"][key] = body
+                self._entry = entry
+        return body
+
+
+cache = ListingCache()
+
+
+def on_funding(payload: dict):
+    """Funding-broker listener: fundsRaised, progress and backer counts in the listing just changed."""
+    cache.bump()
@@ -1,8 +1,8 @@
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, status
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Depends, HTTPException, Request, UploadFile, File, Form, Query, Header, status
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 
@@ -12,26 +12,114 @@ from .auth import (
     get_current_active_user,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse, Response
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, selectinload
 import os
 import shutil
-import stripe
 import json
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 
-from .database import Base, engine, get_db
-from .config import ADMIN_CREATION_TOKEN, STRIPE_SECRET_KEY, STATIC_FILES_DIR
-from . import models, schema, utils, auth
-
-# Create DB tables at startup (For dev/demo. In production, use migrations.)
-Base.metadata.create_all(bind=engine)
+from .database import engine, get_db, SessionLocal
+from .config import (
+    ADMIN_CREATION_TOKEN, STATIC_FILES_DIR, RANKINGS_REFRESH_SECONDS, MATCHING_REFRESH_SECONDS,
+    RUN_JOBS_IN_APP, PROFILE_SECRET, DB_POOL_WARM_CONNECTIONS, LISTING_CACHE_SECONDS, LISTING_SNAPSHOT_PATH,
+    LISTING_SNAPSHOT_INTERVAL_SECONDS, UPLOAD_MAX_BYTES, UPLOAD_CHUNK_MAX_BYTES,
+)
+from . import models, schema, utils, auth, feed, events, matching, rankings, series, portfolio, jobs, webhooks, idempotency, admission, metrics, profiling, static_files
+from . import compression, deletion, listing, snapshot
+from . import notifications, payments, uploads  # noqa: F401  (register job handlers)
+
+# Tables are created and migrated by Alembic (`alembic upgrade head`), not at import.
+# The Stripe SDK is imported on first use by app/payments.py.
+
+def _rebuild_rankings():
+    with SessionLocal() as db:
+        rankings.leaderboard.rebuild(db)
+
+async def _refresh_rankings():
+    while True:
+        await asyncio.sleep(RANKINGS_REFRESH_SECONDS)
+        await run_in_threadpool(_rebuild_rankings)
+
+def _rebuild_matching():
+    with SessionLocal() as db:
+        matching.index.rebuild(db)
+
+async def _refresh_matching():
+    # Picks up campaign changes made by other workers
+    while True:
+        await asyncio.sleep(MATCHING_REFRESH_SECONDS)
+        await run_in_threadpool(_rebuild_matching)
+
+def _schedule_maintenance():
+    with SessionLocal() as db:
+        idempotency.schedule_purge(db, datetime.utcnow())
+        uploads.schedule_purge(db, datetime.utcnow())
+        jobs.schedule_purge(db, datetime.utcnow())
+        db.commit()
+
+def _open_connection():
+    connection = engine.connect()
+    connection.exec_driver_sql("SELECT 1")
+    return connection
+
+async def _warm_pool(size: int):
+    """Open `size` pooled connections at once so the first requests don't pay for connecting."""
+    connections = await asyncio.gather(*[run_in_threadpool(_open_connection) for _ in range(size)])
+    for connection in connections:
+        connection.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    app.state.ready = False
+    await _warm_pool(DB_POOL_WARM_CONNECTIONS)
+    # Funding events from every worker keep the rankings current between rebuilds
+    events.broker.start()
+    events.broker.add_listener(rankings.leaderboard.on_funding)
+    events.broker.add_listener(portfolio.on_funding)
+    events.broker.add_listener(listing.on_funding)
+    await run_in_threadpool(_rebuild_rankings)
+    refresh = asyncio.create_task(_refresh_rankings())
+    await run_in_threadpool(_rebuild_matching)
+    refresh_matching = asyncio.create_task(_refresh_matching())
+    await run_in_threadpool(_schedule_maintenance)
+    if RUN_JOBS_IN_APP:
+        jobs.runner.start()
+        webhooks.reconciler.start()
+    publisher = None
+    if snapshot.enabled():
+        publisher = snapshot.SnapshotPublisher(
+            LISTING_SNAPSHOT_PATH, listing.build_snapshot, LISTING_SNAPSHOT_INTERVAL_SECONDS)
+        publisher.start()
+    app.state.startup_seconds = time.perf_counter() - started
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        refresh.cancel()
+        refresh_matching.cancel()
+        if publisher is not None:
+            await publisher.stop()
+        await webhooks.reconciler.stop()
+        await jobs.runner.stop()
+        events.broker.stop()
 
 # FastAPI init
-app = FastAPI(title="Startup Fundraising Platform - MVP")
-
-# Configure Stripe (dummy for demonstration)
-stripe.api_key = STRIPE_SECRET_KEY
+app = FastAPI(title="Startup Fundraising Platform - MVP", lifespan=lifespan)
+app.state.ready = False
+
+# Middleware added last runs first: metrics, profiling, compression, CORS, admission control, idempotency
+# Retried creates replay the first response instead of running again
+app.add_middleware(idempotency.IdempotencyMiddleware, paths=["/investments", "/campaigns"])
+# Shed load on sign-in, uploads and the full listing before it reaches the threadpool
+app.add_middleware(admission.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],          # Domains allowed to make requests
@@ -39,12 +127,90 @@ app.add_middleware(
     allow_methods=["*"],            # HTTP methods allowed (e.g., GET, POST)
     allow_headers=["*"],            # Headers allowed in requests
 )
+app.add_middleware(compression.CompressionMiddleware)
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware, routes=app.router.routes)
+
+def _pool_stats():
+    pool = engine.pool
+    return {
+        (stat,): getattr(pool, stat)()
+        for stat in ("size", "checkedin", "checkedout", "overflow")
+        if hasattr(pool, stat)
+    }
+
+def _admission_stat(stat):
+    return lambda: {(row["class"],): row[stat] for row in admission.stats()}
+
+metrics.registry.gauge("db_pool_connections", "Connection pool state.", ("state",), fn=_pool_stats)
+metrics.registry.counter("cache_hits_total", "Cache hits.", ("cache",),
+                         fn=lambda: {("portfolio",): portfolio.portfolio_cache.hits})
+metrics.registry.counter("cache_misses_total", "Cache misses.", ("cache",),
+                         fn=lambda: {("portfolio",): portfolio.portfolio_cache.misses})
+metrics.registry.gauge("cache_hit_ratio", "Hits over lookups since start.", ("cache",),
+                       fn=lambda: {("portfolio",): portfolio.portfolio_cache.hit_ratio()})
+metrics.registry.gauge("admission_in_flight", "Admitted requests per route class.", ("class",),
+                       fn=_admission_stat("in_flight"))
+metrics.registry.gauge("admission_queue_depth", "Requests waiting per route class.", ("class",),
+                       fn=_admission_stat("queued"))
+metrics.registry.counter("admission_shed_total", "Requests shed with 503 per route class.", ("class",),
+                         fn=_admission_stat("shed"))
+metrics.registry.counter("admission_rate_limited_total", "Requests refused with 429 per route class.", ("class",),
+                         fn=_admission_stat("rate_limited"))
+
+@app.get("/ready", include_in_schema=False)
+async def readiness():
+    """Readiness probe: 503 until the pool is warm and startup work has finished."""
+    if not app.state.ready:
+        raise HTTPException(status_code=503, detail="Starting up")
+    return {"status": "ready", "startupSeconds": app.state.startup_seconds}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Rendered on the event loop, where the request metrics are updated
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# ------------------------------------------------------------------
+#  Profiling (admin only)
+# ------------------------------------------------------------------
+@app.post("/admin/profiles/sign")
+def sign_profile_header(token: str, ttl: int = Query(600, ge=1, le=86400)):
+    """X-Profile header value that profiles any request carrying it for `ttl` seconds."""
+    if token != ADMIN_CREATION_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if not PROFILE_SECRET:
+        raise HTTPException(status_code=409, detail="PROFILE_SECRET is not configured")
+    return {"header": "X-Profile", "value": profiling.sign(int(time.time()) + ttl)}
+
+@app.get("/admin/profiles")
+def list_profiles(token: str):
+    if token != ADMIN_CREATION_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return profiling.recorded_routes()
+
+@app.get("/admin/profiles/flamegraph")
+def download_profile(route: str, token: str):
+    """Collapsed stacks for a route template (e.g. /campaigns), for flamegraph.pl or speedscope."""
+    if token != ADMIN_CREATION_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    stacks = profiling.load(route)
+    if not stacks:
+        raise HTTPException(status_code=404, detail="No samples recorded for this route")
+    filename = route.strip("/").replace("/", "_") or "root"
+    return PlainTextResponse(stacks, headers={"Content-Disposition": f'attachment; filename="{filename}.folded"'})
+
+@app.delete("/admin/profiles", status_code=status.HTTP_204_NO_CONTENT)
+def clear_profile(route: str, token: str):
+    if token != ADMIN_CREATION_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    profiling.clear(route)
 
 #------------------------------------------------------
 # Authentication
 #------------------------
 @app.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = authenticate_user(form_data.username, form_data.password, form_data.client_id)
     if not user:
         raise HTTPException(
@@ -57,7 +223,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/signin")
-async def signin(data: schema.SignInSchema, db: Session = Depends(get_db)):
+def signin(data: schema.SignInSchema, db: Session = Depends(get_db)):
     user_models = ["founder", "investor", "admin"]
     for u in user_models:
         if user:= auth.authenticate_user(email=data.email, password=data.password, user_type=u):
@@ -135,11 +301,19 @@ def update_founder(founder_id: int, founder_data: schema.FounderUpdate, db: Sess
 
 @app.delete("/founders/{founder_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_founder(founder_id: int, db: Session = Depends(get_db)):
-    founder = db.query(models.Founder).filter(models.Founder.id == founder_id).first()
+    founder = db.query(models.Founder.id).filter(models.Founder.id == founder_id).first()
     if not founder:
         raise HTTPException(status_code=404, detail="Founder not found")
-    db.delete(founder)
+    # Set-based, so a founder with thousands of investments isn't loaded row by row
+    project_ids = deletion.delete_founder(db, founder_id)
     db.commit()
+    for project_id in project_ids:
+        matching.index.remove(project_id)
+        rankings.leaderboard.remove(project_id)
+    if project_ids:
+        listing.cache.bump()
+        # Every investor in those campaigns lost holdings
+        portfolio.portfolio_cache.clear()
     return None
 
 # ------------------------------------------------------------------
@@ -181,8 +355,8 @@ def update_investor(investor_id: int, investor_data: schema.InvestorUpdate, db:
     if not investor:
         raise HTTPException(status_code=404, detail="Investor not found")
 
-    if investor_data.name is not None:
-        investor.name = investor_data.name
+    if investor_data.fullName is not None:
+        investor.name = investor_data.fullName
     if investor_data.email is not None:
         # Check for duplicate email
         if (db.query(models.Investor)
@@ -199,25 +373,45 @@ def update_investor(investor_id: int, investor_data: schema.InvestorUpdate, db:
 
 @app.delete("/investors/{investor_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_investor(investor_id: int, db: Session = Depends(get_db)):
-    investor = db.query(models.Investor).filter(models.Investor.id == investor_id).first()
+    investor = db.query(models.Investor.id).filter(models.Investor.id == investor_id).first()
     if not investor:
         raise HTTPException(status_code=404, detail="Investor not found")
-    db.delete(investor)
+    deletion.delete_investor(db, investor_id)
     db.commit()
+    portfolio.portfolio_cache.invalidate(investor_id)
     return None
 
 # ------------------------------------------------------------------
 #  CRUD for Project
 # ------------------------------------------------------------------
 @app.get("/campaigns")
-def get_projects(db: Session = Depends(get_db)):
+def get_projects(request: Request, db: Session = Depends(get_db)):
     """List all projects (for feed)."""
-    projects = db.query(models.Project).all()
-    response_data = []
-    for p in list(projects):
-        response_data.append(p.get_dict())
-
-    return response_data
+    # Serialized and compressed once per feed version rather than per request
+    encoding = compression.negotiate(request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    body = None
+    if snapshot.enabled():
+        # Shared by every worker and sent straight from the mapping
+        body = snapshot.reader.read(encoding, max_age=3 * LISTING_CACHE_SECONDS)
+    if body is None:
+        body = listing.cache.get(encoding, lambda: listing.build(db))
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/campaigns/trending")
+def get_trending_projects(limit: int = Query(10, ge=1, le=100)):
+    """Live campaigns with the most recent investment, served from memory."""
+    return rankings.leaderboard.top_trending(limit)
+
+@app.get("/campaigns/most-funded")
+def get_most_funded_projects(limit: int = Query(10, ge=1, le=100)):
+    return rankings.leaderboard.top_funded(limit)
+
+@app.get("/campaigns/closing-soon")
+def get_closing_soon_projects(limit: int = Query(10, ge=1, le=100)):
+    return rankings.leaderboard.top_closing(limit)
 
 @app.get("/campaigns/{project_id}")
 def get_project_details(project_id: int, db: Session = Depends(get_db)):
@@ -235,6 +429,107 @@ def get_project_details(project_id: int, db: Session = Depends(get_db)):
 
     return response_data
 
+def _funding_snapshot(project_id: int):
+    with SessionLocal() as db:
+        project = db.query(models.Project).filter(models.Project.id == project_id).first()
+        return events.funding_snapshot(project) if project else None
+
+@app.get("/campaigns/{project_id}/stream")
+@compression.exempt
+async def stream_project_funding(project_id: int):
+    """Server-Sent Events stream of a campaign's fundsRaised/progress."""
+    # No session is held while the stream is open; the broker is started by the lifespan
+    initial = await run_in_threadpool(_funding_snapshot, project_id)
+    if initial is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    subscription = events.broker.subscribe(project_id)
+
+    async def event_source():
+        try:
+            yield f"event: funding\ndata: {json.dumps(initial)}\n\n"
+            while True:
+                payload = await subscription.next(timeout=15)
+                if payload is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: funding\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/campaigns/{project_id}/funding-series")
+def get_project_funding_series(
+    project_id: int,
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    founder_id: int = 1,  # from auth
+    db: Session = Depends(get_db),
+):
+    """Funding over time for the project's founder, read from the hourly/daily rollups."""
+    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project.founder_id != founder_id:
+        raise HTTPException(status_code=403, detail="Not the project founder.")
+    return series.get_series(db, project_id, granularity, project.fundsRaised)
+
+
+def _claim_upload(db: Session, field: str, upload_id: str, founder_id: int) -> str:
+    """Path of a finalized resumable upload of the founder's, marked as attached to the new campaign."""
+    claimed = db.execute(
+        update(models.Upload)
+        .where(models.Upload.id == upload_id, models.Upload.founder_id == founder_id,
+               models.Upload.status == models.COMPLETE_STATUS)
+        .values(status=models.ATTACHED_STATUS, updated_at=datetime.utcnow())
+        .returning(models.Upload.path)
+    ).first()
+    if claimed is None:
+        raise HTTPException(status_code=409, detail=f"{field}: upload {upload_id} is not a finalized upload of yours.")
+    return claimed.path
+
+
+def _save_form_file(prefix: str, file: UploadFile) -> str:
+    path = os.path.join(STATIC_FILES_DIR, f"{prefix}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    return path
+
+
+def _discard_files(paths: list[str]):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _campaign_files(db: Session, founder_id: int, files: dict) -> tuple[dict, list[str]]:
+    """
+    Paths of a campaign's files, by field, and the ones this request wrote.
+    `files` maps each field to (file name prefix, form file, resumable upload
+    id). Form files are written before any upload id is claimed, so the
+    claims' write lock is held only until the campaign commits; a rejected
+    claim removes the files already written.
+    """
+    for field, (_, file, upload_id) in files.items():
+        if not upload_id and file is None:
+            raise HTTPException(status_code=422, detail=f"{field} or {field}UploadId is required.")
+    paths, written = {}, []
+    try:
+        for field, (prefix, file, upload_id) in files.items():
+            if not upload_id:
+                paths[field] = _save_form_file(prefix, file)
+                written.append(paths[field])
+        for field, (_, _, upload_id) in files.items():
+            if upload_id:
+                paths[field] = _claim_upload(db, field, upload_id, founder_id)
+    except BaseException:
+        _discard_files(written)
+        raise
+    return paths, written
 
 @app.post("/campaigns", status_code=status.HTTP_201_CREATED)
 def create_project(
@@ -243,15 +538,18 @@ def create_project(
     campaignCategory: str = Form(...),
     targetAmount: float = Form(...),
     fundingType: str = Form(...),
-    deadline: str = Form(...),
+    deadline: datetime = Form(...),
     minInvestment: float = Form(...),
     email: str = Form(...),
     address: str = Form(...),
     phone: str = Form(...),
     personalizedMessage: str = Form(None),
     motivationLetter: str = Form(None),
-    proofOfEligibility: UploadFile = File(...),
-    campaignImage: UploadFile = File(...),
+    proofOfEligibility: UploadFile = File(None),
+    campaignImage: UploadFile = File(None),
+    # Ids of finalized resumable uploads (/uploads), instead of the files themselves
+    proofOfEligibilityUploadId: str = Form(None),
+    campaignImageUploadId: str = Form(None),
     founder_id: int = 1,  # Replace with authentication logic
     db: Session = Depends(get_db),
 ):
@@ -263,19 +561,14 @@ def create_project(
     if not os.path.exists(STATIC_FILES_DIR):
         os.makedirs(STATIC_FILES_DIR)
 
-    # Save the proof_of_eligibility file
-    proof_file_path = os.path.join(
-        STATIC_FILES_DIR, f"proof_{datetime.now().strftime('%Y%m%d%H%M%S')}_{proofOfEligibility.filename}"
-    )
-    with open(proof_file_path, "wb") as buffer:
-        shutil.copyfileobj(proofOfEligibility.file, buffer)
-
-    # Save the campaign_image file
-    image_file_path = os.path.join(
-        STATIC_FILES_DIR, f"image_{datetime.now().strftime('%Y%m%d%H%M%S')}_{campaignImage.filename}"
-    )
-    with open(image_file_path, "wb") as buffer:
-        shutil.copyfileobj(campaignImage.file, buffer)
+    upload_started = time.perf_counter()
+    paths, written = _campaign_files(db, founder_id, {
+        "proofOfEligibility": ("proof", proofOfEligibility, proofOfEligibilityUploadId),
+        "campaignImage": ("image", campaignImage, campaignImageUploadId),
+    })
+    proof_file_path, image_file_path = paths["proofOfEligibility"], paths["campaignImage"]
+    metrics.upload_bytes.inc(sum(os.path.getsize(path) for path in written))
+    metrics.upload_seconds.inc(time.perf_counter() - upload_started)
 
     # Create a new project instance
     new_project = models.Project(
@@ -300,8 +593,18 @@ def create_project(
 
     # Save the project to the database
     db.add(new_project)
-    db.commit()
+    for path in (proof_file_path, image_file_path):
+        jobs.enqueue(db, "process_upload", {"path": path})
+    try:
+        db.commit()
+    except BaseException:
+        # Nothing refers to the files this request wrote
+        _discard_files(written)
+        raise
     db.refresh(new_project)
+    matching.index.upsert(new_project)
+    rankings.leaderboard.upsert(new_project)
+    listing.cache.bump()
     
 
 
@@ -317,6 +620,8 @@ def update_project(
     project = db.query(models.Project).filter(models.Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
+    # Investors' portfolios show these
+    shown = (project.target_amount, project.image_url, project.status)
 
     if project_data.name is not None:
         project.name = project_data.name
@@ -329,21 +634,226 @@ def update_project(
     if project_data.status is not None:
         project.status = project_data.status
 
+    investor_ids = []
+    if (project.target_amount, project.image_url, project.status) != shown:
+        investor_ids = db.scalars(
+            select(models.Investment.investor_id)
+            .where(models.Investment.project_id == project_id)
+            .distinct()
+        ).all()
     db.commit()
     db.refresh(project)
+    matching.index.upsert(project)
+    rankings.leaderboard.upsert(project)
+    listing.cache.bump()
+    portfolio.portfolio_cache.invalidate_many(investor_ids)
     return project
 
 @app.delete("/campaigns/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_project(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = (
+        db.query(models.Project.image_url, models.Project.pdf_document_path)
+        .filter(models.Project.id == project_id)
+        .first()
+    )
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    db.delete(project)
+    deletion.delete_project(db, project_id, tuple(project))
+    db.commit()
+    matching.index.remove(project_id)
+    rankings.leaderboard.remove(project_id)
+    listing.cache.bump()
+    portfolio.portfolio_cache.clear()
+    return None
+
+# ------------------------------------------------------------------
+#  Resumable uploads (campaign files sent in chunks; see app/uploads.py)
+# ------------------------------------------------------------------
+def _get_upload(db: Session, upload_id: str, founder_id: int) -> models.Upload:
+    upload = db.query(models.Upload).filter(models.Upload.id == upload_id).first()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if upload.founder_id != founder_id:
+        raise HTTPException(status_code=403, detail="Not your upload.")
+    return upload
+
+def _upload_out(upload: models.Upload, offset: int = None) -> schema.UploadOut:
+    if offset is None:
+        offset = uploads.received(upload.id) if upload.status == models.UPLOADING_STATUS else upload.size
+    return schema.UploadOut(
+        id=upload.id, filename=upload.filename, size=upload.size, offset=offset, status=upload.status)
+
+@app.post("/uploads", response_model=schema.UploadOut, status_code=status.HTTP_201_CREATED)
+def create_upload(
+    upload_data: schema.UploadCreate,
+    response: Response,
+    founder_id: int = 1,  # Replace with authentication logic
+    db: Session = Depends(get_db),
+):
+    """Start a resumable upload; send its bytes with PATCH /uploads/{id}, then finalize it."""
+    if upload_data.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Uploads are limited to {UPLOAD_MAX_BYTES} bytes.")
+    if not db.query(models.Founder.id).filter(models.Founder.id == founder_id).first():
+        raise HTTPException(status_code=404, detail="Founder not found")
+    upload = models.Upload(
+        id=uuid.uuid4().hex,
+        founder_id=founder_id,
+        filename=upload_data.filename,
+        size=upload_data.size,
+        sha256=upload_data.sha256.lower() if upload_data.sha256 else None,
+        status=models.UPLOADING_STATUS,
+    )
+    out = _upload_out(upload, offset=0)
+    db.add(upload)
+    db.commit()
+    response.headers["Location"] = f"/uploads/{out.id}"
+    return out
+
+@app.get("/uploads/{upload_id}", response_model=schema.UploadOut)
+def get_upload(upload_id: str, founder_id: int = 1, db: Session = Depends(get_db)):
+    """Where to resume: `offset` is the number of bytes received."""
+    return _upload_out(_get_upload(db, upload_id, founder_id))
+
+@app.patch("/uploads/{upload_id}", response_model=schema.UploadOut)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0),
+    upload_checksum: str = Header(None, alias="Upload-Checksum"),
+    founder_id: int = 1,  # Replace with authentication logic
+    db: Session = Depends(get_db),
+):
+    """
+    Append the request body at Upload-Offset, which must equal the current
+    offset. An optional Upload-Checksum ("sha256 <base64 digest>") is
+    checked before the chunk is kept.
+    """
+    upload = await run_in_threadpool(_get_upload, db, upload_id, founder_id)
+    if upload.status != models.UPLOADING_STATUS:
+        raise HTTPException(status_code=409, detail="Upload is already finalized.")
+    try:
+        checksum = uploads.parse_checksum(upload_checksum)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Bad Upload-Checksum: {exc}")
+    started = time.perf_counter()
+    data = bytearray()
+    async for chunk in request.stream():
+        data += chunk
+        if len(data) > UPLOAD_CHUNK_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Chunks are limited to {UPLOAD_CHUNK_MAX_BYTES} bytes.")
+    if upload_offset + len(data) > upload.size:
+        raise HTTPException(status_code=400, detail="Chunk runs past the declared upload size.")
+    try:
+        offset = await run_in_threadpool(uploads.append_chunk, upload.id, upload_offset, bytes(data), checksum)
+    except uploads.OffsetConflict as exc:
+        raise HTTPException(status_code=409, detail=f"Upload is at offset {exc.offset}.",
+                            headers={"Upload-Offset": str(exc.offset)})
+    except uploads.ChecksumMismatch:
+        raise HTTPException(status_code=400, detail="Chunk checksum mismatch; resend it.")
+    metrics.upload_bytes.inc(len(data))
+    metrics.upload_seconds.inc(time.perf_counter() - started)
+    upload.updated_at = datetime.utcnow()
+    out = _upload_out(upload, offset=offset)
+    await run_in_threadpool(db.commit)
+    response.headers["Upload-Offset"] = str(offset)
+    return out
+
+@app.post("/uploads/{upload_id}/finalize", response_model=schema.UploadOut)
+def finalize_upload(upload_id: str, founder_id: int = 1, db: Session = Depends(get_db)):
+    """Check the received file against its size and sha256; its id can then be given to POST /campaigns."""
+    upload = _get_upload(db, upload_id, founder_id)
+    if upload.status != models.UPLOADING_STATUS:
+        return _upload_out(upload)
+    try:
+        path = uploads.finalize(upload)
+    except uploads.OffsetConflict as exc:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete: {exc.offset} of {upload.size} bytes received.")
+    except uploads.ChecksumMismatch:
+        # Which chunk is bad can't be told, so start over
+        uploads.discard(upload)
+        raise HTTPException(status_code=400, detail="File checksum mismatch; upload it again from offset 0.")
+    upload.path = path
+    upload.status = models.COMPLETE_STATUS
+    upload.updated_at = datetime.utcnow()
+    out = _upload_out(upload)
+    try:
+        db.commit()
+    except BaseException:
+        # Still unfinalized in the database; put the bytes back so finalizing can be retried
+        uploads.unfinalize(upload_id, path)
+        raise
+    return out
+
+@app.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_upload(upload_id: str, founder_id: int = 1, db: Session = Depends(get_db)):
+    upload = _get_upload(db, upload_id, founder_id)
+    if upload.status == models.ATTACHED_STATUS:
+        raise HTTPException(status_code=409, detail="Upload belongs to a campaign.")
+    uploads.discard(upload)
+    db.delete(upload)
     db.commit()
     return None
 
+# ------------------------------------------------------------------
+#  Moderation
+# ------------------------------------------------------------------
+@app.get("/moderation/campaigns")
+def get_moderation_queue(
+    token: str,
+    after: int | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    """Pending campaigns, oldest first. Pass the last id as `after` for the next page."""
+    if token != ADMIN_CREATION_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    query = db.query(models.Project).filter(models.Project.is_pending())
+    if after is not None:
+        query = query.filter(models.Project.id > after)
+    projects = (
+        query.options(selectinload(models.Project.investors))
+        .order_by(models.Project.id)
+        .limit(limit)
+        .all()
+    )
+    return [p.get_dict() for p in projects]
+
+@app.post("/moderation/campaigns/transition", response_model=schema.ModerationResult)
+def transition_campaigns(data: schema.ModerationTransition, token: str, db: Session = Depends(get_db)):
+    """Approve or reject many pending campaigns with a single UPDATE."""
+    if token != ADMIN_CREATION_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    new_status = models.LIVE_STATUS if data.action == "approve" else models.REJECTED_STATUS
+    updated = db.scalars(
+        update(models.Project)
+        .where(models.Project.id.in_(data.ids), models.Project.is_pending())
+        .values(status=new_status)
+        .returning(models.Project),
+        execution_options={"synchronize_session": False},
+    ).all()
+    updated_ids = {p.id for p in updated}
+    investor_ids = []
+    if updated_ids:
+        # Their portfolios show each campaign's status
+        investor_ids = db.scalars(
+            select(models.Investment.investor_id)
+            .where(models.Investment.project_id.in_(updated_ids))
+            .distinct()
+        ).all()
+    db.commit()
+
+    matching.index.upsert_many(updated)
+    rankings.leaderboard.upsert_many(updated)
+    listing.cache.bump()
+    portfolio.portfolio_cache.invalidate_many(investor_ids)
+    return {
+        "updated": sorted(updated_ids),
+        "skipped": [i for i in data.ids if i not in updated_ids],
+    }
+
 @app.get("/campaigns/{project_id}/pdf", response_class=FileResponse)
-def get_project_pdf(project_id: int, db: Session = Depends(get_db)):
+def get_project_pdf(project_id: int, request: Request, db: Session = Depends(get_db)):
     """
     Endpoint to download/view the PDF document for a project.
     """
@@ -352,7 +862,7 @@ def get_project_pdf(project_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Project not found")
     if not project.pdf_document_path or not os.path.exists(project.pdf_document_path):
         raise HTTPException(status_code=404, detail="PDF not found")
-    return FileResponse(project.pdf_document_path, media_type='application/pdf')
+    return static_files.file_response(project.pdf_document_path, request.headers, media_type='application/pdf')
 
 # ------------------------------------------------------------------
 #  CRUD for Investment
@@ -375,20 +885,29 @@ def create_investment(
     db: Session = Depends(get_db)
 ):
     """
-    Demonstration only. Full Stripe integration would handle PaymentIntents, etc.
+    Record an investment and queue creation of its Stripe PaymentIntent.
     """
     project = db.query(models.Project).filter(models.Project.id == investment_data.project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    project.fundsRaised = project.fundsRaised + investment_data.amount
+    project.fundsRaised = (project.fundsRaised or 0.0) + investment_data.amount
     new_investment = models.Investment(
         amount=investment_data.amount,
         investor_id=investor_id,
-        project_id=investment_data.project_id
+        project_id=investment_data.project_id,
+        created_at=datetime.utcnow(),
     )
     db.add(new_investment)
+    db.flush()
+    series.record_funding(db, project.id, new_investment.created_at, investment_data.amount, 1)
+    feed.add_investor(db, investor_id, project)
+    # The Stripe call happens in a worker, not on the request path. A new
+    # investment id can't have a job yet, so no idempotency key is needed
+    jobs.enqueue(db, "create_payment_intent", {"investment_id": new_investment.id})
+    events.publish_funding(db, project, delta=investment_data.amount, count=1, investor_id=investor_id)
     db.commit()
     db.refresh(new_investment)
+    portfolio.portfolio_cache.invalidate(investor_id)
     return new_investment
 
 @app.put("/investments/{investment_id}", response_model=schema.InvestmentOut)
@@ -397,18 +916,42 @@ def update_investment(investment_id: int, investment_data: schema.InvestmentUpda
     if not investment:
         raise HTTPException(status_code=404, detail="Investment not found")
 
+    old_project = db.query(models.Project).filter(models.Project.id == investment.project_id).first()
+    project = old_project
     if investment_data.project_id is not None:
         # Check if project exists
         project = db.query(models.Project).filter(models.Project.id == investment_data.project_id).first()
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         investment.project_id = investment_data.project_id
-
-    if investment_data.amount is not None:
-        investment.amount = investment_data.amount
-
+        feed.add_investor(db, investment.investor_id, project)
+
+    old_amount = investment.amount
+    new_amount = old_amount if investment_data.amount is None else investment_data.amount
+    investment.amount = new_amount
+
+    # Failed, canceled and refunded investments were already taken out of the totals
+    if investment.payment_status not in webhooks.UNCOUNTED_STATUSES:
+        # Move the old amount out and the new amount in, so totals stay right when either changes
+        old_project.fundsRaised = (old_project.fundsRaised or 0.0) - old_amount
+        project.fundsRaised = (project.fundsRaised or 0.0) + new_amount
+
+        # Corrections land in the bucket of the original investment
+        created_at = investment.created_at
+        if project is old_project:
+            series.record_funding(db, project.id, created_at, new_amount - old_amount, 0)
+            events.publish_funding(db, project, delta=new_amount - old_amount, investor_id=investment.investor_id)
+        else:
+            series.record_funding(db, old_project.id, created_at, -old_amount, -1)
+            series.record_funding(db, project.id, created_at, new_amount, 1)
+            events.publish_funding(db, old_project, delta=-old_amount, count=-1, investor_id=investment.investor_id)
+            events.publish_funding(db, project, delta=new_amount, count=1, investor_id=investment.investor_id)
+    if project is not old_project:
+        db.flush()
+        feed.remove_investor(db, investment.investor_id, old_project.id)
     db.commit()
     db.refresh(investment)
+    portfolio.portfolio_cache.invalidate(investment.investor_id)
     return investment
 
 @app.delete("/investments/{investment_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -416,8 +959,19 @@ def delete_investment(investment_id: int, db: Session = Depends(get_db)):
     investment = db.query(models.Investment).filter(models.Investment.id == investment_id).first()
     if not investment:
         raise HTTPException(status_code=404, detail="Investment not found")
+    investor_id = investment.investor_id
+    # Failed, canceled and refunded investments were already taken out of the totals
+    if investment.payment_status not in webhooks.UNCOUNTED_STATUSES:
+        project = db.query(models.Project).filter(models.Project.id == investment.project_id).first()
+        project.fundsRaised = (project.fundsRaised or 0.0) - investment.amount
+        series.record_funding(db, project.id, investment.created_at, -investment.amount, -1)
+        events.publish_funding(db, project, delta=-investment.amount, count=-1, investor_id=investor_id)
+    project_id = investment.project_id
     db.delete(investment)
+    db.flush()
+    feed.remove_investor(db, investor_id, project_id)
     db.commit()
+    portfolio.portfolio_cache.invalidate(investor_id)
     return None
 
 @app.get("/investor/investments", response_model=list[schema.InvestmentOut])
@@ -426,6 +980,20 @@ def get_investor_investments(investor_id: int = 1, db: Session = Depends(get_db)
     investments = db.query(models.Investment).filter(models.Investment.investor_id == investor_id).all()
     return investments
 
+@app.post("/webhooks/stripe")
+async def stripe_webhook(request: Request):
+    """Verify, dedupe and store a Stripe event; the reconciler applies it to investments later."""
+    payload = await request.body()
+    if not webhooks.verify_signature(payload, request.headers.get("Stripe-Signature", "")):
+        raise HTTPException(status_code=400, detail="Invalid signature")
+    try:
+        event = json.loads(payload)
+        event_id, event_type = event["id"], event["type"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Malformed event")
+    await run_in_threadpool(webhooks.store_event, event_id, event_type, payload.decode())
+    return {"received": True}
+
 # ------------------------------------------------------------------
 #  CRUD for Project Updates
 # ------------------------------------------------------------------
@@ -453,10 +1021,16 @@ def create_project_update(
         raise HTTPException(status_code=403, detail="Not the project founder.")
 
     new_update = models.Update(
+        title=update_data.title,
         content=update_data.content,
         project_id=update_data.project_id
     )
     db.add(new_update)
+    db.flush()
+    feed.fan_out_update(db, project, new_update)
+    if notifications.enabled():
+        # One row in the same transaction; the runner does the mailing
+        jobs.enqueue(db, "notify_update", {"update_id": new_update.id})
     db.commit()
     db.refresh(new_update)
     return new_update
@@ -468,13 +1042,18 @@ def update_project_update(
     founder_id: int = 1,  # from auth
     db: Session = Depends(get_db)
 ):
-    existing_update = db.query(models.Update).filter(models.Update.id == update_id).first()
-    if not existing_update:
+    row = (
+        db.query(models.Update, models.Project.founder_id)
+        .join(models.Project, models.Project.id == models.Update.project_id)
+        .filter(models.Update.id == update_id)
+        .first()
+    )
+    if not row:
         raise HTTPException(status_code=404, detail="Update not found")
+    existing_update, project_founder_id = row
 
     # Must be the project's founder to edit
-    project = db.query(models.Project).filter(models.Project.id == existing_update.project_id).first()
-    if project.founder_id != founder_id:
+    if project_founder_id != founder_id:
         raise HTTPException(status_code=403, detail="Not the project founder.")
 
     if update_data.content is not None:
@@ -490,14 +1069,22 @@ def delete_project_update(
     founder_id: int = 1,  # from auth
     db: Session = Depends(get_db)
 ):
-    existing_update = db.query(models.Update).filter(models.Update.id == update_id).first()
-    if not existing_update:
+    row = (
+        db.query(models.Update, models.Project.founder_id)
+        .join(models.Project, models.Project.id == models.Update.project_id)
+        .filter(models.Update.id == update_id)
+        .first()
+    )
+    if not row:
         raise HTTPException(status_code=404, detail="Update not found")
+    existing_update, project_founder_id = row
 
-    project = db.query(models.Project).filter(models.Project.id == existing_update.project_id).first()
-    if project.founder_id != founder_id:
+    if project_founder_id != founder_id:
         raise HTTPException(status_code=403, detail="Not the project founder.")
 
+    db.query(models.TimelineEntry).filter(
+        models.TimelineEntry.update_id == update_id
+    ).delete(synchronize_session=False)
     db.delete(existing_update)
     db.commit()
     return None
@@ -505,21 +1092,59 @@ def delete_project_update(
 @app.get("/project/{project_id}/updates", response_model=list[schema.UpdateOut])
 def get_project_updates(project_id: int, investor_id: int = 1, db: Session = Depends(get_db)):
     """Investors who have invested in that project can see updates."""
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    # Check if investor has invested
-    investment = db.query(models.Investment).filter(
+    # Check if investor has invested; an investment implies the project exists
+    investment = db.query(models.Investment.id).filter(
         models.Investment.project_id == project_id,
         models.Investment.investor_id == investor_id
     ).first()
     if not investment:
+        if not db.query(models.Project.id).filter(models.Project.id == project_id).first():
+            raise HTTPException(status_code=404, detail="Project not found")
         raise HTTPException(status_code=403, detail="You have not invested in this project.")
     
     updates = db.query(models.Update).filter(models.Update.project_id == project_id).all()
     return updates
 
+@app.get("/investor/portfolio")
+def get_investor_portfolio(investor_id: int = 1, db: Session = Depends(get_db)):  # investor_id from auth
+    """Holdings with their campaign summary and totals, so the client needs no per-campaign calls."""
+    return portfolio.get_portfolio(db, investor_id)
+
+@app.get("/investor/recommendations")
+def get_investor_recommendations(
+    investor_id: int = 1,  # from auth
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Live campaigns ranked by sector match, budget fit and deadline urgency for this investor."""
+    investor = db.query(models.Investor).filter(models.Investor.id == investor_id).first()
+    if not investor:
+        raise HTTPException(status_code=404, detail="Investor not found")
+    ranked = matching.index.top_k(investor, limit)
+    if not ranked:
+        return []
+    projects = db.query(models.Project).options(selectinload(models.Project.investors)).filter(
+        models.Project.id.in_([project_id for project_id, _ in ranked])
+    ).all()
+    by_id = {p.id: p for p in projects}
+    response_data = []
+    for project_id, score in ranked:
+        if project_id in by_id:
+            item = by_id[project_id].get_dict()
+            item["matchScore"] = score
+            response_data.append(item)
+    return response_data
+
+@app.get("/investor/feed", response_model=list[schema.UpdateOut])
+def get_investor_feed(
+    investor_id: int = 1,  # from auth
+    before: int | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Updates from every project the investor backs, newest first. Pass the last id as `before` for the next page."""
+    return feed.get_investor_feed(db, investor_id, before=before, limit=limit)
+
 # ------------------------------------------------------------------
 #  CRUD for Admin
 # ------------------------------------------------------------------
@@ -576,4 +1201,4 @@ def delete_admin(admin_id: int, db: Session = Depends(get_db)):
     return None
 
 
-app.mount("/static", StaticFiles(directory=STATIC_FILES_DIR), name="static")
+app.mount("/static", static_files.UploadStaticFiles(directory=STATIC_FILES_DIR), name="static")
@@ -0,0 +1,219 @@
+import re
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Relative weight of each feature in the final score
+SECTOR_WEIGHT = 3.0
+BUDGET_WEIGHT = 2.0
+URGENCY_WEIGHT = 1.0
+URGENCY_HORIZON_DAYS = 30.0
+
+
+# The Project columns a row is built from; rebuilds select only these
+FEATURE_COLUMNS = (
+    models.Project.id,
+    models.Project.status,
+    models.Project.campaignCategory,
+    models.Project.minInvestment,
+    models.Project.deadline,
+)
+Features = namedtuple("Features", [column.key for column in FEATURE_COLUMNS])
+
+
+def _features(project: models.Project) -> Features:
+    return Features(*(getattr(project, column.key) for column in FEATURE_COLUMNS))
+
+
+def _tokens(*values: Optional[str]) -> set[str]:
+    tokens = set()
+    for value in values:
+        if value:
+            tokens.update(t.strip().lower() for t in value.split(",") if t.strip())
+    return tokens
+
+
+def parse_budget(budget: Optional[str]) -> Optional[float]:
+    """Upper bound of a free-text budget such as "$10,000 - $50,000" or "25k"."""
+    if not budget:
+        return None
+    amounts = []
+    for number, suffix in re.findall(r"(\d[\d,]*(?:\.\d+)?)\s*([kKmM]?)", budget):
+        amount = float(number.replace(",", ""))
+        amount *= {"k": 1e3, "m": 1e6}.get(suffix.lower(), 1)
+        amounts.append(amount)
+    return max(amounts) if amounts else None
+
+
+class CampaignIndex:
+    """
+    Feature matrix of live campaigns, one row per campaign.
+
+    Rows are updated in place when a campaign changes, so scoring an investor
+    is a handful of array operations over the whole matrix instead of a
+    Python loop over projects.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.lock = threading.Lock()
+        self.size = 0
+        self.row_of: dict[int, int] = {}
+        self.category_col: dict[str, int] = {}
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.categories = np.zeros((capacity, 16), dtype=np.float32)
+        self.min_investment = np.zeros(capacity, dtype=np.float64)
+        self.deadline = np.zeros(capacity, dtype=np.float64)
+        self.loaded_at = 0.0
+        # While a rebuild runs, changes are applied here and recorded to replay onto the new matrix
+        self._building = False
+        self._changes: list[tuple[str, object]] = []
+
+    def _grow(self, rows: int, cols: int):
+        cap_rows, cap_cols = self.categories.shape
+        if rows > cap_rows:
+            new_rows = max(rows, cap_rows * 2)
+            self.ids = np.resize(self.ids, new_rows)
+            self.min_investment = np.resize(self.min_investment, new_rows)
+            self.deadline = np.resize(self.deadline, new_rows)
+        else:
+            new_rows = cap_rows
+        new_cols = max(cols, cap_cols * 2) if cols > cap_cols else cap_cols
+        if (new_rows, new_cols) != (cap_rows, cap_cols):
+            categories = np.zeros((new_rows, new_cols), dtype=np.float32)
+            categories[:cap_rows, :cap_cols] = self.categories
+            self.categories = categories
+
+    def _column(self, category: str) -> int:
+        col = self.category_col.get(category)
+        if col is None:
+            col = self.category_col[category] = len(self.category_col)
+            self._grow(self.size, col + 1)
+        return col
+
+    def _upsert(self, project: models.Project):
+        if project.status != models.LIVE_STATUS or project.deadline is None:
+            self._remove(project.id)
+            return
+        row = self.row_of.get(project.id)
+        if row is None:
+            row = self.size
+            self._grow(row + 1, len(self.category_col))
+            self.row_of[project.id] = row
+            self.size += 1
+        self.ids[row] = project.id
+        self.categories[row] = 0.0
+        for category in _tokens(project.campaignCategory):
+            self.categories[row, self._column(category)] = 1.0
+        self.min_investment[row] = project.minInvestment or 0.0
+        self.deadline[row] = project.deadline.timestamp()
+
+    def _remove(self, project_id: int):
+        row = self.row_of.pop(project_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            # Move the last row into the hole to keep the live rows contiguous
+            self.ids[row] = self.ids[last]
+            self.categories[row] = self.categories[last]
+            self.min_investment[row] = self.min_investment[last]
+            self.deadline[row] = self.deadline[last]
+            self.row_of[int(self.ids[row])] = row
+        self.size = last
+
+    def _record(self, op: str, value):
+        if self._building:
+            self._changes.append((op, value))
+
+    def upsert(self, project: models.Project):
+        with self.lock:
+            self._upsert(project)
+            self._record("upsert", _features(project))
+
+    def remove(self, project_id: int):
+        with self.lock:
+            self._remove(project_id)
+            self._record("remove", project_id)
+
+    def upsert_many(self, projects: list[models.Project]):
+        with self.lock:
+            for project in projects:
+                self._upsert(project)
+                self._record("upsert", _features(project))
+
+    def rebuild(self, db: Session):
+        """
+        Build a new matrix from the database and swap it in. Readers keep
+        scoring against the current one meanwhile; changes made during the
+        build are replayed onto the new one before the swap.
+        """
+        with self.lock:
+            self._building = True
+            self._changes = []
+        try:
+            rows = db.execute(
+                select(*FEATURE_COLUMNS).where(models.Project.status == models.LIVE_STATUS)
+            ).all()
+            fresh = CampaignIndex(capacity=max(len(rows), 1024))
+            for row in rows:
+                fresh._upsert(row)
+        except BaseException:
+            with self.lock:
+                self._building = False
+                self._changes = []
+            raise
+        with self.lock:
+            for op, value in self._changes:
+                if op == "upsert":
+                    fresh._upsert(value)
+                else:
+                    fresh._remove(value)
+            self.size, self.row_of, self.category_col = fresh.size, fresh.row_of, fresh.category_col
+            self.ids, self.categories = fresh.ids, fresh.categories
+            self.min_investment, self.deadline = fresh.min_investment, fresh.deadline
+            self.loaded_at = time.monotonic()
+            self._building = False
+            self._changes = []
+
+    def top_k(self, investor: models.Investor, k: int = 10) -> list[tuple[int, float]]:
+        """Best k (project_id, score) pairs for the investor, highest score first."""
+        budget = parse_budget(investor.investmentBudget)
+        with self.lock:
+            n = self.size
+            if n == 0:
+                return []
+            interests = np.zeros(self.categories.shape[1], dtype=np.float32)
+            for token in _tokens(investor.investmentSector, investor.investmentFocus):
+                col = self.category_col.get(token)
+                if col is not None:
+                    interests[col] = 1.0
+            sector = self.categories[:n] @ interests
+
+            if budget is None:
+                fit = np.full(n, 0.5)
+            else:
+                fit = np.clip(budget / np.maximum(self.min_investment[:n], 1.0), 0.0, 1.0)
+
+            days_left = (self.deadline[:n] - datetime.utcnow().timestamp()) / 86400.0
+            urgency = np.exp(-np.maximum(days_left, 0.0) / URGENCY_HORIZON_DAYS)
+
+            scores = SECTOR_WEIGHT * sector + BUDGET_WEIGHT * fit + URGENCY_WEIGHT * urgency
+            scores[days_left < 0] = -np.inf
+            ids = self.ids[:n].copy()
+
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+index = CampaignIndex()
+
@@ -0,0 +1,235 @@
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Optional, Sequence
+
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 fn: Optional[Callable[[], object]] = None, threadsafe: bool = True):
+        """
+        `fn`, when given, is called at scrape time instead of keeping state:
+        it returns the value, or a dict of label-value tuples to values.
+
+        Metrics only ever updated from the event loop can pass
+        threadsafe=False to skip the lock on the hot path.
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.fn = fn
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock() if threadsafe else None
+
+    def _add(self, labels: tuple, amount: float):
+        if self._lock is None:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        if self.fn is None:
+            return list(self._values.items())
+        value = self.fn()
+        if isinstance(value, dict):
+            return list(value.items())
+        return [((), value)]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.samples():
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        self._add(labels, amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        self._add(labels, amount)
+
+    def dec(self, amount: float = 1.0, *labels: str):
+        self.inc(-amount, *labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, threadsafe: bool = True):
+        super().__init__(name, help, labels, threadsafe=threadsafe)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (non-cumulative), +Inf count, sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        if self._lock is None:
+            self._observe(value, labels)
+            return
+        with self._lock:
+            self._observe(value, labels)
+
+    def _observe(self, value: float, labels: tuple):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        series = [(labels, list(counts), total) for labels, (counts, total) in list(self._series.items())]
+        names = self.labels + ("le",)
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}"
+                )
+            label_text = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = (), fn=None,
+                threadsafe: bool = True) -> Counter:
+        return self.register(Counter(name, help, labels, fn, threadsafe))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), fn=None,
+              threadsafe: bool = True) -> Gauge:
+        return self.register(Gauge(name, help, labels, fn, threadsafe))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS, threadsafe: bool = True) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets, threadsafe))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Updated by MetricsMiddleware on the event loop only
+requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"),
+    threadsafe=False)
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to the end of the response body.", ("method", "route"),
+    threadsafe=False)
+response_size = registry.histogram(
+    "http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS, threadsafe=False)
+upload_bytes = registry.counter("upload_bytes_total", "Bytes written to disk by campaign uploads.")
+upload_seconds = registry.counter(
+    "upload_seconds_total", "Time spent writing campaign uploads; upload_bytes_total over this is bytes/sec.")
+
+UNMATCHED = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and response size for every HTTP request.
+
+    Requests are labelled with the route template ("/campaigns/{project_id}")
+    rather than the raw path, so label cardinality stays fixed. Requests
+    answered before routing (e.g. shed by admission control) are matched
+    against `routes` afterwards.
+    """
+
+    in_flight = 0
+
+    def __init__(self, app, routes: Sequence = ()):
+        self.app = app
+        self.routes = routes
+
+    def _route_template(self, scope, path: str, root_path: str) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        # Mounts rewrite the path in scope, so match on the one we were called with
+        original = {"type": "http", "method": scope["method"], "path": path, "root_path": root_path}
+        for route in self.routes:
+            match, _ = route.matches(original)
+            if match == Match.FULL:
+                return route.path
+        return UNMATCHED
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        path, root_path = scope["path"], scope.get("root_path", "")
+        response = [500, 0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                response[1] += len(message.get("body", b""))
+            await send(message)
+
+        MetricsMiddleware.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            MetricsMiddleware.in_flight -= 1
+            method, route = scope["method"], self._route_template(scope, path, root_path)
+            request_duration.observe(time.perf_counter() - started, method, route)
+            response_size.observe(response[1], method, route)
+            requests_total.inc(1.0, method, route, str(response[0]))
+
+
+registry.gauge("http_requests_in_flight", "Requests currently being served.",
+               fn=lambda: MetricsMiddleware.in_flight)
+
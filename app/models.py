@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Text, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, ForeignKey, Text, DateTime, Index, LargeBinary, or_, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from datetime import timedelta, timezone
 from .database import Base
-from . import config
+from . import config, images
+
+# Project.status of campaigns that passed moderation and are shown to investors
+LIVE_STATUS = "approved"
+REJECTED_STATUS = "rejected"
+PENDING_STATUS = "pending"
+
 class Founder(Base):
     __tablename__ = 'founders'
     id = Column(Integer, primary_key=True, index=True)
@@ -38,8 +44,9 @@ class Project(Base):
     campaignCategory = Column(String)
     campaignDescription = Column(String)
     campaignTitle = Column(String)
-    status = Column(String, default="pending", nullable=True)
+    status = Column(String, default=PENDING_STATUS, nullable=True)
     fundsRaised = Column(Float, default=0.0, nullable=True)
+    fanout_on_read = Column(Boolean, default=False, nullable=False)
     other_details = Column(Text, nullable=True)
 
     def get_dict(self):
@@ -47,6 +54,7 @@ class Project(Base):
         funds = 0.0 if not self.fundsRaised else self.fundsRaised
         rsp_obj = {
         "image_url": f"{config.HOST_ADDRESS}/static/" + self.image_url.split("/")[-1],
+        "image_srcset": images.srcset(self.image_url),
         "proof_file_url": f"{config.HOST_ADDRESS}/static/" + self.pdf_document_path.split("/")[-1],
         "investors": len(self.investors),
         "daysRemaining" : (self.deadline - datetime.utcnow()).days,
@@ -66,6 +74,17 @@ class Project(Base):
     investors = relationship("Investment", back_populates="project")
     updates = relationship("Update", back_populates="project")
 
+    __table_args__ = (
+        # Moderation queue: only pending rows are indexed, in creation order
+        Index("ix_projects_pending", "id",
+              postgresql_where=text("status = 'pending' OR status IS NULL"),
+              sqlite_where=text("status = 'pending' OR status IS NULL")),
+    )
+
+    @classmethod
+    def is_pending(cls):
+        return or_(cls.status == PENDING_STATUS, cls.status.is_(None))
+
 class Investor(Base):
     __tablename__ = 'investors'
     id = Column(Integer, primary_key=True, index=True)
@@ -88,11 +107,31 @@ class Investment(Base):
     amount = Column(Float, nullable=False)
     investor_id = Column(Integer, ForeignKey("investors.id"), nullable=False)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    payment_intent_id = Column(String, nullable=True, unique=True)
+    payment_status = Column(String, nullable=True)
+    # Stripe `created` of the event payment_status came from; older events are ignored
+    payment_status_at = Column(BigInteger, nullable=True)
     other_details = Column(Text, nullable=True)
 
     investor = relationship("Investor", back_populates="investments")
     project = relationship("Project", back_populates="investors")
 
+    __table_args__ = (
+        # Covers portfolio lookups: amount is carried in the index on Postgres
+        Index("ix_investments_investor_project", "investor_id", "project_id",
+              postgresql_include=["amount"]),
+    )
+
+class FundingRollup(Base):
+    """Net amount and number of investments per project per hour or day bucket."""
+    __tablename__ = 'funding_rollups'
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    granularity = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    amount = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
 class Update(Base):
     __tablename__ = 'updates'
     id = Column(Integer, primary_key=True, index=True)
@@ -104,9 +143,98 @@ class Update(Base):
 
     project = relationship("Project", back_populates="updates")
 
+    __table_args__ = (
+        Index("ix_updates_project_id_id", "project_id", "id"),
+    )
+
+class TimelineEntry(Base):
+    """One row per (investor, update) written when an update is fanned out."""
+    __tablename__ = 'timeline_entries'
+    id = Column(Integer, primary_key=True)
+    investor_id = Column(Integer, ForeignKey("investors.id"), nullable=False)
+    update_id = Column(Integer, ForeignKey("updates.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_timeline_entries_investor_update", "investor_id", "update_id", unique=True),
+    )
+
 class Admin(Base):
     __tablename__ = 'admins'
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     password = Column(String, nullable=False)
     other_details = Column(Text, nullable=True)
+
+class Job(Base):
+    """A unit of background work; see app/jobs.py for how rows are claimed and retried."""
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    idempotency_key = Column(String, nullable=True, unique=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_jobs_queued_run_at", "run_at",
+              postgresql_where=text("status = 'queued'"),
+              sqlite_where=text("status = 'queued'")),
+    )
+
+class StripeEvent(Base):
+    """Raw Stripe webhook events, stored once per event id and applied later in batches."""
+    __tablename__ = 'stripe_events'
+    id = Column(Integer, primary_key=True)
+    event_id = Column(String, nullable=False, unique=True)
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    received_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_stripe_events_unprocessed", "id",
+              postgresql_where=text("processed_at IS NULL"),
+              sqlite_where=text("processed_at IS NULL")),
+    )
+
+class IdempotencyRecord(Base):
+    """The stored outcome of a POST made with an Idempotency-Key header; see app/idempotency.py."""
+    __tablename__ = 'idempotency_records'
+    principal = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    state = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)
+    headers = Column(Text, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# Upload.status: receiving chunks, all bytes in and checked, referenced by a campaign
+UPLOADING_STATUS = "uploading"
+COMPLETE_STATUS = "complete"
+ATTACHED_STATUS = "attached"
+
+class Upload(Base):
+    """A resumable upload; the bytes received so far are the partial file's size. See app/uploads.py."""
+    __tablename__ = 'uploads'
+    id = Column(String, primary_key=True)
+    founder_id = Column(Integer, ForeignKey("founders.id"), nullable=False)
+    filename = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String, nullable=True)
+    status = Column(String, nullable=False, default=UPLOADING_STATUS)
+    path = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Garbage collection only looks at uploads no campaign has claimed
+        Index("ix_uploads_unattached_updated_at", "updated_at",
+              postgresql_where=text("status != 'attached'"),
+              sqlite_where=text("status != 'attached'")),
+    )
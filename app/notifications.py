@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import smtplib
+import ssl
+import time
+from email.message import EmailMessage
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from . import models, config
+from .database import SessionLocal
+from .jobs import job_handler, enqueue
+
+logger = logging.getLogger(__name__)
+
+SEND_ATTEMPTS = 3
+
+# Shared by every send job in this process, so a burst of updates can't open
+# more than SMTP_MAX_CONCURRENCY connections to the mail server. Each job
+# holds one slot and one connection for its whole batch.
+_smtp_slots = asyncio.Semaphore(config.SMTP_MAX_CONCURRENCY)
+
+
+def enabled() -> bool:
+    return bool(config.SMTP_HOST)
+
+
+def _split_into_batches(update_id: int):
+    with SessionLocal() as db:
+        update = db.get(models.Update, update_id)
+        if update is None:
+            return
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(models.Investor.id, models.Investor.email)
+                .join(models.Investment, models.Investment.investor_id == models.Investor.id)
+                .where(models.Investment.project_id == update.project_id, models.Investor.id > last_id)
+                .distinct()
+                .order_by(models.Investor.id)
+                .limit(config.NOTIFICATION_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            enqueue(db, "send_update_emails", {
+                "update_id": update_id,
+                "recipients": [row.email for row in rows],
+            })
+            last_id = rows[-1].id
+        db.commit()
+
+
+@job_handler("notify_update")
+async def notify_update(payload: dict):
+    """Split an update's investors into send jobs of NOTIFICATION_BATCH_SIZE recipients."""
+    await run_in_threadpool(_split_into_batches, payload["update_id"])
+
+
+def _load_message(update_id: int):
+    with SessionLocal() as db:
+        update = db.get(models.Update, update_id)
+        if update is None:
+            return None
+        project = update.project
+        return (
+            f"{project.campaignTitle or project.name}: {update.title}",
+            update.content,
+        )
+
+
+def _message(recipient: str, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = config.SMTP_SENDER
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+def _connect() -> smtplib.SMTP:
+    smtp = smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT, timeout=30)
+    try:
+        smtp.ehlo()
+        if config.SMTP_STARTTLS or smtp.has_extn("starttls"):
+            # Raises SMTPNotSupportedError rather than carry on in the clear
+            smtp.starttls(context=ssl.create_default_context())
+            smtp.ehlo()
+        if config.SMTP_USER:
+            smtp.login(config.SMTP_USER, config.SMTP_PASSWORD)
+    except BaseException:
+        smtp.close()
+        raise
+    return smtp
+
+
+def _send_batch(recipients: list[str], subject: str, body: str) -> list[str]:
+    """
+    Mail every recipient over one connection and return those that still
+    failed after SEND_ATTEMPTS tries. A refused recipient leaves the
+    connection usable; a dropped one is reopened for the next try.
+    """
+    failed = []
+    smtp = None
+    try:
+        for recipient in recipients:
+            for attempt in range(SEND_ATTEMPTS):
+                try:
+                    if smtp is None:
+                        smtp = _connect()
+                    smtp.send_message(_message(recipient, subject, body))
+                    break
+                except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as exc:
+                    # The server answered; the session is still usable
+                    error = exc
+                except OSError as exc:  # smtplib's connection errors included
+                    error = exc
+                    if smtp is not None:
+                        smtp.close()
+                        smtp = None
+                if attempt == SEND_ATTEMPTS - 1:
+                    logger.warning("Update email to %s failed: %s", recipient, error)
+                    failed.append(recipient)
+                else:
+                    time.sleep(0.5 * 2 ** attempt)
+    finally:
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+    return failed
+
+
+@job_handler("send_update_emails")
+async def send_update_emails(payload: dict):
+    """
+    Mail one batch of investors. Recipients that still fail after the quick
+    retries are left in the payload, so the job-level retry (with its longer
+    backoff) only resends to them.
+    """
+    message = await run_in_threadpool(_load_message, payload["update_id"])
+    if message is None:
+        return
+    subject, body = message
+    recipients = payload["recipients"]
+    async with _smtp_slots:
+        failed = await run_in_threadpool(_send_batch, recipients, subject, body)
+    if failed:
+        payload["recipients"] = failed
+        raise RuntimeError(f"{len(failed)} of {len(recipients)} update emails failed")
@@ -0,0 +1,329 @@
+"""
+Helpers for migrations that must not hold locks on busy tables: concurrent
+index builds, nullable-add-then-backfill in keyset batches, and constraints
+added NOT VALID and validated afterwards. Call them from a migration's
+upgrade() instead of the plain op.* directive.
+
+Each helper commits the migration's transaction so far (through Alembic's
+autocommit_block) before its long-running part, so a migration using them
+is not atomic. Write it so that re-running it after a failure is safe;
+backfills resume from their last committed batch.
+
+    alembic -x dry_run=true upgrade head
+
+runs the other directives in a transaction that is rolled back, and has the
+helpers log an estimate of their duration from table statistics instead of
+running. The other directives' locks are held until that rollback, so point
+it at a restored copy or a quiet moment. Postgres only, as SQLite would
+apply its DDL outside the transaction.
+"""
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import context, op
+from sqlalchemy.exc import OperationalError
+
+# Under alembic's logger, so alembic.ini's INFO level applies
+logger = logging.getLogger("alembic.online_migrations")
+
+# Resume points of backfills interrupted part-way; rows are removed once a backfill completes
+CHECKPOINT_TABLE = "online_migration_checkpoints"
+# DDL that needs a brief exclusive lock gives up after this and retries, rather
+# than queueing every read and write of the table behind a long transaction
+LOCK_TIMEOUT = "5s"
+LOCK_ATTEMPTS = 5
+# What dry-run estimates assume. Measure yours with a small backfill on a copy.
+DRY_RUN_BACKFILL_ROWS_PER_SECOND = 20000
+DRY_RUN_SCAN_BYTES_PER_SECOND = 100 * 1024 * 1024
+
+# Sum of the dry-run estimates so far; env.py reports it
+estimated_seconds = 0.0
+
+_checkpoints = sa.Table(
+    CHECKPOINT_TABLE, sa.MetaData(),
+    sa.Column("name", sa.String(), primary_key=True),
+    sa.Column("last_key", sa.BigInteger(), nullable=False),
+    sa.Column("updated_at", sa.DateTime(), nullable=False),
+)
+
+
+def dry_run() -> bool:
+    return context.get_x_argument(as_dictionary=True).get("dry_run", "").lower() in ("1", "true", "yes")
+
+
+def _postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _quote(name: str) -> str:
+    return op.get_bind().dialect.identifier_preparer.quote(name)
+
+
+def table_stats(table: str) -> tuple[int, int]:
+    """(rows, bytes including indexes) from the planner's statistics, as of the last ANALYZE."""
+    row = op.get_bind().execute(
+        sa.text("SELECT greatest(reltuples, 0)::bigint, pg_total_relation_size(oid) "
+                "FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table},
+    ).first()
+    return (row[0], row[1]) if row is not None else (0, 0)
+
+
+def _report(action: str, table: str, seconds: float, detail: str = ""):
+    global estimated_seconds
+    estimated_seconds += seconds
+    rows, size = table_stats(table)
+    logger.info("[dry run] %s: %s has ~%d rows, %.0f MiB%s; ~%.0fs",
+                action, table, rows, size / 1024 / 1024, detail, seconds)
+
+
+def _scan_seconds(table: str, scans: int = 1) -> float:
+    return scans * table_stats(table)[1] / DRY_RUN_SCAN_BYTES_PER_SECOND
+
+
+def _brief_lock(statement):
+    """Run `statement()` in its own transaction with a lock timeout, retrying when the lock isn't granted."""
+    if dry_run():
+        # Skipped: the lock would be held until the dry run's rollback
+        return
+    if not _postgres():
+        statement()
+        return
+    with context.get_context().autocommit_block():
+        for attempt in range(1, LOCK_ATTEMPTS + 1):
+            op.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+            try:
+                statement()
+                break
+            except OperationalError as exc:
+                if getattr(exc.orig, "pgcode", None) != "55P03" or attempt == LOCK_ATTEMPTS:
+                    raise
+                logger.info("Lock on table not granted within %s, retrying (%d/%d)",
+                            LOCK_TIMEOUT, attempt, LOCK_ATTEMPTS)
+                time.sleep(attempt)
+            finally:
+                op.execute("RESET lock_timeout")
+
+
+# ------------------------------------------------------------------
+#  Indexes
+# ------------------------------------------------------------------
+def create_index_concurrently(index_name: str, table: str, columns: Sequence[str], unique: bool = False,
+                              where: Optional[str] = None, **kw):
+    """
+    CREATE INDEX CONCURRENTLY on Postgres, which doesn't block writes while
+    it builds. `where` makes a partial index. Other databases get a plain
+    CREATE INDEX.
+    """
+    if dry_run():
+        # A concurrent build makes two passes over the table
+        _report(f"create index {index_name}", table, _scan_seconds(table, scans=2))
+        return
+    where_clause = sa.text(where) if where is not None else None
+    if not _postgres():
+        op.create_index(index_name, table, columns, unique=unique, sqlite_where=where_clause, **kw)
+        return
+    with context.get_context().autocommit_block():
+        # An interrupted concurrent build leaves an INVALID index behind; drop it so this run can rebuild
+        invalid = op.get_bind().execute(
+            sa.text("SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"),
+            {"name": index_name},
+        ).first()
+        if invalid is not None:
+            op.drop_index(index_name, table_name=table, postgresql_concurrently=True)
+        op.create_index(index_name, table, columns, unique=unique, if_not_exists=True,
+                        postgresql_concurrently=True, postgresql_where=where_clause, **kw)
+
+
+def drop_index_concurrently(index_name: str, table: str):
+    if dry_run():
+        _report(f"drop index {index_name}", table, 0.0)
+        return
+    if not _postgres():
+        op.drop_index(index_name, table_name=table)
+        return
+    with context.get_context().autocommit_block():
+        op.drop_index(index_name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+# ------------------------------------------------------------------
+#  Backfills
+# ------------------------------------------------------------------
+def _load_checkpoint(conn, name: str) -> Optional[int]:
+    _checkpoints.create(conn, checkfirst=True)
+    return conn.execute(sa.select(_checkpoints.c.last_key).where(_checkpoints.c.name == name)).scalar()
+
+
+def _save_checkpoint(conn, name: str, last_key: int):
+    now = datetime.utcnow()
+    updated = conn.execute(
+        _checkpoints.update().where(_checkpoints.c.name == name).values(last_key=last_key, updated_at=now))
+    if updated.rowcount == 0:
+        conn.execute(_checkpoints.insert().values(name=name, last_key=last_key, updated_at=now))
+
+
+def backfill(table: str, values: dict[str, str], where: Optional[str] = None, params: Optional[dict] = None,
+             name: Optional[str] = None, batch_size: int = 5000, pause_seconds: float = 0.0, key: str = "id"):
+    """
+    UPDATE `table` SET column = expression for each of `values`, in batches
+    of `batch_size` rows walked along the integer `key` column. Each batch
+    commits with its checkpoint, so the rows it locks are held only briefly
+    and a rerun after a failure carries on from the last batch.
+    `pause_seconds` between batches leaves room for replicas and other
+    writers. `where` narrows the rows; expressions and `where` are SQL and
+    may use :bound `params`. `name` identifies the checkpoint; it defaults
+    to the table and columns.
+    """
+    name = name or f"{table}:{','.join(values)}"
+    quoted_table, quoted_key = _quote(table), _quote(key)
+    assignments = ", ".join(f"{_quote(column)} = {expression}" for column, expression in values.items())
+    condition = f" AND ({where})" if where else ""
+    if dry_run():
+        rows = table_stats(table)[0]
+        batches = math.ceil(rows / batch_size)
+        _report(f"backfill {', '.join(values)}", table,
+                rows / DRY_RUN_BACKFILL_ROWS_PER_SECOND + batches * pause_seconds,
+                f", {batches} batches of {batch_size}")
+        return
+    if context.is_offline_mode():
+        # Emitting SQL for someone else to run: one statement
+        op.execute(sa.text(f"UPDATE {quoted_table} SET {assignments}"
+                           + (f" WHERE {where}" if where else "")).bindparams(**(params or {})))
+        return
+
+    update = sa.text(
+        f"UPDATE {quoted_table} SET {assignments} "
+        f"WHERE {quoted_key} > :last_key AND {quoted_key} <= :upto{condition}")
+    _in_batches(name, table, key, update, params, batch_size, pause_seconds, "updated")
+
+
+def backfill_insert(table: str, columns: Sequence[str], select: str, key_table: str, key: str = "id",
+                    params: Optional[dict] = None, name: Optional[str] = None, batch_size: int = 5000,
+                    pause_seconds: float = 0.0):
+    """
+    INSERT INTO `table` (columns) the rows of the SQL `select`, in batches
+    walked along the integer `key` column of `key_table`, like backfill.
+    `select` must bound that key with `> :last_key AND <= :upto`, and should
+    skip rows already inserted so a rerun of an interrupted batch is safe.
+    """
+    name = name or f"{table}:insert"
+    insert = sa.text(f"INSERT INTO {_quote(table)} ({', '.join(_quote(c) for c in columns)}) {select}")
+    if dry_run():
+        rows = table_stats(key_table)[0]
+        batches = math.ceil(rows / batch_size)
+        _report(f"insert into {table}", key_table,
+                rows / DRY_RUN_BACKFILL_ROWS_PER_SECOND + batches * pause_seconds,
+                f", {batches} batches of {batch_size}")
+        return
+    if context.is_offline_mode():
+        op.execute(insert.bindparams(**(params or {}), last_key=-2 ** 63, upto=2 ** 63 - 1))
+        return
+    _in_batches(name, key_table, key, insert, params, batch_size, pause_seconds, "inserted")
+
+
+def _in_batches(name: str, table: str, key: str, statement: sa.TextClause, params: Optional[dict],
+                batch_size: int, pause_seconds: float, verb: str):
+    """Run `statement` once per batch of `table`.`key` values, committing each with its checkpoint."""
+    quoted_table, quoted_key = _quote(table), _quote(key)
+    select_upto = sa.text(
+        f"SELECT max(k) FROM (SELECT {quoted_key} AS k FROM {quoted_table} WHERE {quoted_key} > :last_key "
+        f"ORDER BY {quoted_key} LIMIT :batch) AS batch")
+    with context.get_context().autocommit_block():
+        # Batches commit on their own connection; the migration's stays idle meanwhile
+        with op.get_bind().engine.connect() as conn:
+            with conn.begin():
+                last_key = _load_checkpoint(conn, name)
+            if last_key is not None:
+                logger.info("Resuming backfill %s after %s %s", name, key, last_key)
+            else:
+                with conn.begin():
+                    last_key = conn.execute(sa.text(f"SELECT min({quoted_key}) - 1 FROM {quoted_table}")).scalar()
+            written, started, reported = 0, time.monotonic(), time.monotonic()
+            while last_key is not None:
+                with conn.begin():
+                    upto = conn.execute(select_upto, {"last_key": last_key, "batch": batch_size}).scalar()
+                    if upto is None:
+                        break
+                    written += conn.execute(statement, {**(params or {}), "last_key": last_key, "upto": upto}).rowcount
+                    _save_checkpoint(conn, name, upto)
+                last_key = upto
+                if time.monotonic() - reported > 10:
+                    logger.info("Backfill %s: %d rows %s, up to %s %s", name, written, verb, key, upto)
+                    reported = time.monotonic()
+                if pause_seconds:
+                    time.sleep(pause_seconds)
+            with conn.begin():
+                conn.execute(_checkpoints.delete().where(_checkpoints.c.name == name))
+            logger.info("Backfill %s: %d rows %s in %.1fs", name, written, verb, time.monotonic() - started)
+
+
+def add_column_with_backfill(table: str, column: sa.Column, value: str, not_null: bool = False, **backfill_kw):
+    """
+    Add `column` as nullable (no table rewrite), fill existing rows with the
+    SQL expression `value` in batches (see backfill), then, with `not_null`,
+    enforce NOT NULL without a long lock (see set_not_null). Give the column
+    a Python-side or server default so rows written meanwhile are filled too.
+    """
+    column.nullable = True
+    _brief_lock(lambda: op.add_column(table, column))
+    backfill(table, {column.name: value}, where=f"{_quote(column.name)} IS NULL",
+             name=f"{table}.{column.name}", **backfill_kw)
+    if not_null:
+        set_not_null(table, column.name)
+
+
+# ------------------------------------------------------------------
+#  Constraints
+# ------------------------------------------------------------------
+def validate_constraint(table: str, constraint_name: str):
+    """Check existing rows against a NOT VALID constraint; writes carry on meanwhile."""
+    if dry_run():
+        _report(f"validate {constraint_name}", table, _scan_seconds(table))
+        return
+    with context.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {_quote(table)} VALIDATE CONSTRAINT {_quote(constraint_name)}")
+
+
+def add_check_constraint(constraint_name: str, table: str, condition: str):
+    """
+    On Postgres, added NOT VALID (enforced on new writes straight away,
+    after only a brief lock) and then validated. SQLite rebuilds the table.
+    """
+    if not _postgres():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_check_constraint(constraint_name, condition)
+        return
+    _brief_lock(lambda: op.create_check_constraint(constraint_name, table, condition, postgresql_not_valid=True))
+    validate_constraint(table, constraint_name)
+
+
+def add_foreign_key(constraint_name: str, source_table: str, referent_table: str,
+                    local_cols: Sequence[str], remote_cols: Sequence[str], **kw):
+    """Like add_check_constraint, for a foreign key."""
+    if not _postgres():
+        with op.batch_alter_table(source_table) as batch_op:
+            batch_op.create_foreign_key(constraint_name, referent_table, local_cols, remote_cols, **kw)
+        return
+    _brief_lock(lambda: op.create_foreign_key(constraint_name, source_table, referent_table, local_cols,
+                                              remote_cols, postgresql_not_valid=True, **kw))
+    validate_constraint(source_table, constraint_name)
+
+
+def set_not_null(table: str, column: str):
+    """
+    SET NOT NULL scans the table under an exclusive lock, unless a valid
+    CHECK (column IS NOT NULL) already proves it (Postgres 12+). So add
+    and validate that check first, then drop it once the column is NOT NULL.
+    """
+    if not _postgres():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, nullable=False)
+        return
+    check = f"{table}_{column}_not_null"
+    add_check_constraint(check, table, f"{_quote(column)} IS NOT NULL")
+    _brief_lock(lambda: op.alter_column(table, column, nullable=False))
+    _brief_lock(lambda: op.drop_constraint(check, table, type_="check"))
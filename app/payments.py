@@ -0,0 +1,58 @@
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, update
+
+from . import models, config
+from .database import SessionLocal
+from .jobs import job_handler
+
+_client = None
+
+
+def get_stripe():
+    """The Stripe SDK, or the local stub. Imported on first use so app startup doesn't pay for it."""
+    global _client
+    if _client is None:
+        if config.STRIPE_STUB:
+            from . import stripe_stub as client
+        else:
+            import stripe as client
+            client.api_key = config.STRIPE_SECRET_KEY
+        _client = client
+    return _client
+
+
+def _create_payment_intent(investment_id: int):
+    with SessionLocal() as db:
+        investment = db.get(models.Investment, investment_id)
+        if investment is None or investment.payment_intent_id is not None:
+            return
+        amount, project_id = investment.amount, investment.project_id
+    # No connection is held while Stripe answers. Stripe dedupes on the
+    # idempotency key, so a retry after a crash between the API call and
+    # the write below reuses the same intent
+    intent = get_stripe().PaymentIntent.create(
+        amount=int(round(amount * 100)),
+        currency=config.PAYMENT_CURRENCY,
+        metadata={"investment_id": investment_id, "project_id": project_id},
+        idempotency_key=f"investment-{investment_id}",
+    )
+    with SessionLocal() as db:
+        db.execute(
+            update(models.Investment)
+            .where(models.Investment.id == investment_id, models.Investment.payment_intent_id.is_(None))
+            .values(
+                payment_intent_id=intent["id"],
+                # A webhook that arrived meanwhile already set the newer status
+                payment_status=case(
+                    (models.Investment.payment_status_at.is_(None), intent["status"]),
+                    else_=models.Investment.payment_status,
+                ),
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+
+
+@job_handler("create_payment_intent")
+async def create_payment_intent(payload: dict):
+    await run_in_threadpool(_create_payment_intent, payload["investment_id"])
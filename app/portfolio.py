@@ -0,0 +1,109 @@
+from datetime import datetime
+
+from sqlalchemy import select, func, literal, union_all
+from sqlalchemy.orm import Session
+
+from . import models, config, images
+from .cache import TTLCache
+
+portfolio_cache = TTLCache(ttl=config.PORTFOLIO_CACHE_SECONDS)
+
+TOTAL_DIMENSIONS = {
+    "byCategory": models.Project.campaignCategory,
+    "byFundingType": models.Project.fundingType,
+    "byStatus": func.coalesce(models.Project.status, models.PENDING_STATUS),
+}
+
+
+def _holdings(investor_id: int):
+    """Per-project totals for one investor; served from ix_investments_investor_project."""
+    return (
+        select(
+            models.Investment.project_id,
+            func.sum(models.Investment.amount).label("invested"),
+            func.count().label("investments"),
+        )
+        .where(models.Investment.investor_id == investor_id)
+        .group_by(models.Investment.project_id)
+        .cte("holdings")
+    )
+
+
+def build_portfolio(db: Session, investor_id: int) -> dict:
+    """
+    Holdings joined with their project summary, plus totals per category,
+    funding type and status. Two statements regardless of portfolio size.
+    """
+    holdings = _holdings(investor_id)
+    project = models.Project
+    rows = db.execute(
+        select(
+            project.id,
+            project.campaignTitle,
+            project.campaignCategory,
+            project.fundingType,
+            func.coalesce(project.status, models.PENDING_STATUS).label("status"),
+            project.image_url,
+            project.target_amount,
+            func.coalesce(project.fundsRaised, 0.0).label("fundsRaised"),
+            project.deadline,
+            holdings.c.invested,
+            holdings.c.investments,
+        )
+        .join(holdings, holdings.c.project_id == project.id)
+        .order_by(holdings.c.invested.desc())
+    ).all()
+
+    totals_query = union_all(*[
+        select(
+            literal(name).label("dimension"),
+            column.label("value"),
+            func.sum(holdings.c.invested).label("invested"),
+            func.count().label("projects"),
+        )
+        .join_from(holdings, project, holdings.c.project_id == project.id)
+        .group_by(column)
+        for name, column in TOTAL_DIMENSIONS.items()
+    ])
+    totals = {name: {} for name in TOTAL_DIMENSIONS}
+    for row in db.execute(totals_query):
+        totals[row.dimension][row.value or "unspecified"] = {
+            "invested": row.invested,
+            "projects": row.projects,
+        }
+
+    now = datetime.utcnow()
+    items = []
+    for row in rows:
+        items.append({
+            "project_id": row.id,
+            "campaignTitle": row.campaignTitle,
+            "campaignCategory": row.campaignCategory,
+            "fundingType": row.fundingType,
+            "status": row.status,
+            "image_url": f"{config.HOST_ADDRESS}/static/" + (row.image_url or "").split("/")[-1],
+            "image_srcset": images.srcset(row.image_url),
+            "targetAmount": row.target_amount,
+            "fundsRaised": row.fundsRaised,
+            "progress": (row.fundsRaised / row.target_amount) * 100 if row.target_amount else 0.0,
+            "daysRemaining": (row.deadline - now).days if row.deadline else None,
+            "invested": row.invested,
+            "investments": row.investments,
+        })
+    totals["invested"] = sum(item["invested"] for item in items)
+    return {"holdings": items, "totals": totals}
+
+
+def get_portfolio(db: Session, investor_id: int) -> dict:
+    portfolio = portfolio_cache.get(investor_id)
+    if portfolio is None:
+        portfolio = build_portfolio(db, investor_id)
+        portfolio_cache.set(investor_id, portfolio)
+    return portfolio
+
+
+def on_funding(payload: dict):
+    """Funding-broker listener: drop the cached portfolio of the investor who changed."""
+    investor_id = payload.get("investor_id")
+    if investor_id is not None:
+        portfolio_cache.invalidate(investor_id)
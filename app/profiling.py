@@ -0,0 +1,209 @@
+import hashlib
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import config
+
+HEADER = b"x-profile"
+MAX_STACK_DEPTH = 128
+
+
+def sign(expires: int, secret: str = config.PROFILE_SECRET) -> str:
+    """Value for the X-Profile header, valid until the `expires` unix timestamp."""
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify(value: str, secret: str = config.PROFILE_SECRET, now: Optional[float] = None) -> bool:
+    if not secret:
+        return False
+    expires, _, signature = value.partition(".")
+    try:
+        if int(expires) < (now or time.time()):
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(sign(int(expires), secret).partition(".")[2], signature)
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfiledRequest:
+    def __init__(self, scope):
+        self.scope = scope
+        self.stacks: Counter[str] = Counter()
+
+    @property
+    def code(self):
+        # Only known once the router has matched the request
+        route = self.scope.get("route")
+        endpoint = getattr(route, "endpoint", None)
+        return getattr(endpoint, "__code__", None)
+
+
+class Sampler:
+    """
+    Statistical profiler for request handlers.
+
+    While at least one profiled request is running, a background thread
+    reads every thread's stack each `interval` seconds. A stack that passes
+    through a profiled route's endpoint is recorded from the endpoint down,
+    in collapsed ("folded") form. That covers sync handlers in the
+    threadpool and async ones on the event loop alike. Other requests to the
+    same route that overlap the profiled one contribute samples too, which
+    is what a per-route profile wants. With nothing to profile the thread
+    exits, so there is no cost outside profiled requests.
+    """
+
+    def __init__(self, interval: float = config.PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.active: set[ProfiledRequest] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, request: ProfiledRequest):
+        with self._lock:
+            self.active.add(request)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, request: ProfiledRequest):
+        with self._lock:
+            self.active.discard(request)
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self.active:
+                    self._thread = None
+                    return
+                requests = list(self.active)
+            by_code = {}
+            for request in requests:
+                code = request.code
+                if code is not None:
+                    by_code.setdefault(code, []).append(request)
+            if by_code:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own:
+                        self._sample(frame, by_code)
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _sample(frame, by_code: dict):
+        names = []
+        while frame is not None and len(names) < MAX_STACK_DEPTH:
+            names.append(_frame_name(frame.f_code))
+            matched = by_code.get(frame.f_code)
+            if matched is not None:
+                stack = ";".join(reversed(names))
+                for request in matched:
+                    request.stacks[stack] += 1
+                return
+            frame = frame.f_back
+
+
+sampler = Sampler()
+
+
+def _profile_path(route: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    return os.path.join(config.PROFILE_DIR, f"{slug}.folded")
+
+
+def _save(route: str, method: str, stacks: Counter):
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    lines = "".join(f"{method} {route};{stack} {count}\n" for stack, count in stacks.items())
+    # One append per request, so concurrent workers don't interleave lines
+    with open(_profile_path(route), "a") as profile:
+        profile.write(lines)
+
+
+def load(route: str) -> str:
+    """Collapsed stacks recorded for `route` by every worker, merged, ready for flamegraph.pl or speedscope."""
+    try:
+        with open(_profile_path(route)) as profile:
+            lines = profile.read().splitlines()
+    except FileNotFoundError:
+        return ""
+    merged: Counter[str] = Counter()
+    for line in lines:
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            merged[stack] += int(count)
+    return "".join(f"{stack} {count}\n" for stack, count in merged.most_common())
+
+
+def recorded_routes() -> dict[str, int]:
+    """Sample counts per route template."""
+    if not os.path.isdir(config.PROFILE_DIR):
+        return {}
+    routes: Counter[str] = Counter()
+    for name in sorted(os.listdir(config.PROFILE_DIR)):
+        if not name.endswith(".folded"):
+            continue
+        with open(os.path.join(config.PROFILE_DIR, name)) as profile:
+            for line in profile:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    # Lines start with "<METHOD> <route>;"
+                    routes[stack.split(";", 1)[0].partition(" ")[2]] += int(count)
+    return dict(routes)
+
+
+def clear(route: str):
+    try:
+        os.remove(_profile_path(route))
+    except FileNotFoundError:
+        pass
+
+
+def enabled() -> bool:
+    return bool(config.PROFILE_SECRET) or config.PROFILE_SAMPLE_RATE > 0
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that carry a valid signed X-Profile header, plus a
+    random PROFILE_SAMPLE_RATE fraction of all requests. Only installed when
+    one of the two is configured.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope) -> bool:
+        if config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE:
+            return True
+        if config.PROFILE_SECRET:
+            for name, value in scope["headers"]:
+                if name == HEADER:
+                    return verify(value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        request = ProfiledRequest(scope)
+        sampler.add(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.remove(request)
+            route = scope.get("route")
+            if request.stacks and route is not None:
+                await run_in_threadpool(_save, route.path, scope["method"], request.stacks)
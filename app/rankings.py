@@ -0,0 +1,239 @@
+import bisect
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from . import models, config, images
+
+# Each investment adds its amount plus this many "dollars" to the trending
+# score, so many small backers can outrank a single large cheque.
+COUNT_WEIGHT = 100.0
+TRENDING_TAU = config.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+_EPOCH = time.time()
+
+
+def _logaddexp(a: float, b: float) -> float:
+    hi, lo = (a, b) if a >= b else (b, a)
+    return hi + math.log1p(math.exp(lo - hi))
+
+
+class SortedRanking:
+    """Keys kept in ascending order with a reverse map, so one entry can be moved without a re-sort."""
+
+    def __init__(self):
+        self.keys: list[tuple[float, int]] = []
+        self.key_of: dict[int, tuple[float, int]] = {}
+
+    def set(self, project_id: int, value: float):
+        self.discard(project_id)
+        key = (value, project_id)
+        bisect.insort(self.keys, key)
+        self.key_of[project_id] = key
+
+    def discard(self, project_id: int):
+        key = self.key_of.pop(project_id, None)
+        if key is not None:
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def get(self, project_id: int) -> Optional[float]:
+        key = self.key_of.get(project_id)
+        return None if key is None else key[0]
+
+    def first(self, n: int, skip=None) -> list[int]:
+        ids = []
+        for _, project_id in self.keys:
+            if skip is not None and skip(project_id):
+                continue
+            ids.append(project_id)
+            if len(ids) == n:
+                break
+        return ids
+
+
+class Rankings:
+    """
+    Trending, most-funded and closing-soon orderings of live campaigns.
+
+    Trending is an exponentially decayed sum of recent investment. Every
+    campaign decays at the same rate, so the score is stored as
+    log(sum of w * e^((t - epoch) / tau)): adding an investment only moves
+    that one campaign, and the order of the others never needs recomputing.
+    Scores are stored negated so the best entry sorts first.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.summaries: dict[int, dict] = {}
+        self.trending = SortedRanking()
+        self.most_funded = SortedRanking()
+        self.closing_soon = SortedRanking()
+        # While a rebuild runs, changes are applied here and recorded to replay onto the new rankings
+        self._building = False
+        self._changes: list[tuple[str, object]] = []
+
+    def _summary(self, project: models.Project) -> dict:
+        return {
+            "id": project.id,
+            "campaignTitle": project.campaignTitle,
+            "campaignCategory": project.campaignCategory,
+            "image_url": f"{config.HOST_ADDRESS}/static/" + (project.image_url or "").split("/")[-1],
+            "image_srcset": images.srcset(project.image_url),
+            "targetAmount": project.target_amount,
+            "fundsRaised": project.fundsRaised or 0.0,
+            "deadline": project.deadline,
+        }
+
+    def _entry(self, project: models.Project) -> tuple[int, Optional[dict]]:
+        """The project's id and summary, or no summary when it isn't ranked."""
+        if project.status != models.LIVE_STATUS or project.deadline is None:
+            return project.id, None
+        return project.id, self._summary(project)
+
+    def _upsert(self, project_id: int, summary: Optional[dict]):
+        if summary is None:
+            self._remove(project_id)
+            return
+        self.summaries[project_id] = summary
+        self.most_funded.set(project_id, -summary["fundsRaised"])
+        self.closing_soon.set(project_id, summary["deadline"].timestamp())
+        if self.trending.get(project_id) is None:
+            self.trending.set(project_id, math.inf)
+
+    def _remove(self, project_id: int):
+        self.summaries.pop(project_id, None)
+        self.trending.discard(project_id)
+        self.most_funded.discard(project_id)
+        self.closing_soon.discard(project_id)
+
+    def _add_velocity(self, project_id: int, amount: float, count: int, at: float):
+        weight = max(amount, 0.0) + COUNT_WEIGHT * max(count, 0)
+        if weight <= 0:
+            # Refunds and deletions don't un-trend a campaign; they just add nothing
+            return
+        log_weight = math.log(weight) + (at - _EPOCH) / TRENDING_TAU
+        current = self.trending.get(project_id)
+        if current is not None and current != math.inf:
+            log_weight = _logaddexp(-current, log_weight)
+        self.trending.set(project_id, -log_weight)
+
+    def _funding(self, payload: dict, at: float):
+        project_id = payload["project_id"]
+        summary = self.summaries.get(project_id)
+        if summary is None:
+            return
+        summary["fundsRaised"] = payload["fundsRaised"]
+        self.most_funded.set(project_id, -payload["fundsRaised"])
+        self._add_velocity(project_id, payload["delta"], payload["count"], at)
+
+    def _record(self, op: str, value):
+        if self._building:
+            self._changes.append((op, value))
+
+    def upsert(self, project: models.Project):
+        entry = self._entry(project)
+        with self.lock:
+            self._upsert(*entry)
+            self._record("upsert", entry)
+
+    def remove(self, project_id: int):
+        with self.lock:
+            self._remove(project_id)
+            self._record("remove", project_id)
+
+    def upsert_many(self, projects: list[models.Project]):
+        entries = [self._entry(project) for project in projects]
+        with self.lock:
+            for entry in entries:
+                self._upsert(*entry)
+                self._record("upsert", entry)
+
+    def on_funding(self, payload: dict):
+        """Funding-broker listener: refresh totals and add to trending velocity."""
+        at = time.time()
+        with self.lock:
+            self._funding(payload, at)
+            self._record("funding", (payload, at))
+
+    def rebuild(self, db: Session):
+        """
+        Load the rankings from the database and swap them in. Readers keep
+        the current ones meanwhile; changes and funding events that arrive
+        during the load are replayed onto the new ones before the swap. An
+        event for an investment the loaded rollups already hold adds its
+        velocity twice, which only investments made during the load risk.
+        """
+        with self.lock:
+            self._building = True
+            self._changes = []
+        try:
+            projects = db.query(models.Project).filter(models.Project.status == models.LIVE_STATUS).all()
+            # Hourly rollups older than this contribute less than 0.1% of a fresh investment
+            since = datetime.utcnow() - timedelta(hours=10 * config.TRENDING_HALF_LIFE_HOURS)
+            buckets = (
+                db.query(models.FundingRollup)
+                .filter(models.FundingRollup.granularity == "hour", models.FundingRollup.bucket >= since)
+                .all()
+            )
+            fresh = Rankings()
+            for project in projects:
+                fresh._upsert(*fresh._entry(project))
+            for bucket in buckets:
+                if bucket.project_id in fresh.summaries:
+                    at = bucket.bucket.replace(tzinfo=timezone.utc).timestamp()
+                    fresh._add_velocity(bucket.project_id, bucket.amount, bucket.count, at)
+        except BaseException:
+            with self.lock:
+                self._building = False
+                self._changes = []
+            raise
+        with self.lock:
+            for op, value in self._changes:
+                if op == "upsert":
+                    project_id, summary = value
+                    fresh._upsert(project_id, None if summary is None else dict(summary))
+                elif op == "remove":
+                    fresh._remove(value)
+                else:
+                    fresh._funding(*value)
+            self.summaries = fresh.summaries
+            self.trending, self.most_funded, self.closing_soon = (
+                fresh.trending, fresh.most_funded, fresh.closing_soon)
+            self._building = False
+            self._changes = []
+
+    def _items(self, ranking: SortedRanking, limit: int, skip=None) -> list[dict]:
+        now = datetime.utcnow()
+        items = []
+        for project_id in ranking.first(limit, skip):
+            item = dict(self.summaries[project_id])
+            funds = item["fundsRaised"]
+            item["progress"] = (funds / item["targetAmount"]) * 100 if item["targetAmount"] else 0.0
+            item["daysRemaining"] = (item["deadline"] - now).days
+            items.append(item)
+        return items
+
+    def top_trending(self, limit: int) -> list[dict]:
+        with self.lock:
+            return self._items(
+                self.trending, limit,
+                skip=lambda project_id: self.trending.get(project_id) == math.inf,
+            )
+
+    def top_funded(self, limit: int) -> list[dict]:
+        with self.lock:
+            return self._items(self.most_funded, limit)
+
+    def top_closing(self, limit: int) -> list[dict]:
+        now = datetime.utcnow().timestamp()
+        with self.lock:
+            return self._items(
+                self.closing_soon, limit,
+                skip=lambda project_id: self.closing_soon.get(project_id) < now,
+            )
+
+
+leaderboard = Rankings()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class User(BaseModel):
@@ -97,6 +97,14 @@ class ProjectOut(BaseModel):
     class Config:
         orm_mode = True
 
+class ModerationTransition(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+    action: Literal["approve", "reject"]
+
+class ModerationResult(BaseModel):
+    updated: List[int]
+    skipped: List[int]
+
 # =======================#
 #  Investment Schemas    #
 # =======================#
@@ -113,6 +121,8 @@ class InvestmentOut(BaseModel):
     amount: float
     project_id: int
     investor_id: int
+    payment_intent_id: Optional[str] = None
+    payment_status: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -155,3 +165,19 @@ class AdminOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+# =======================#
+#     Upload Schemas     #
+# =======================#
+class UploadCreate(BaseModel):
+    filename: str
+    size: int = Field(..., ge=1)
+    # Hex digest of the whole file, checked on finalize when given
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{64}$")
+
+class UploadOut(BaseModel):
+    id: str
+    filename: str
+    size: int
+    offset: int
+    status: str
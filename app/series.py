@@ -0,0 +1,111 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import dialect_insert
+
+GRANULARITIES = ("hour", "day")
+# Buckets per INSERT in record_funding_many; five parameters each keeps
+# a statement well under SQLite's 32766 bound parameters
+UPSERT_BATCH_SIZE = 1000
+
+
+def truncate(at: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def record_funding(db: Session, project_id: int, at: Optional[datetime], amount: float, count: int):
+    """
+    Add an investment change to the project's hourly and daily buckets.
+
+    Both buckets are written by one INSERT ... ON CONFLICT DO UPDATE, so the
+    rollups stay in step with investments in the same transaction. Changes
+    to investments made before created_at was recorded (`at` is None) are
+    skipped: those investments were never put in a bucket.
+    """
+    if at is None:
+        return
+    _upsert(db, [
+        {
+            "project_id": project_id,
+            "granularity": granularity,
+            "bucket": truncate(at, granularity),
+            "amount": amount,
+            "count": count,
+        }
+        for granularity in GRANULARITIES
+    ])
+
+
+def record_funding_many(db: Session, changes: Iterable[tuple[int, Optional[datetime], float, int]]):
+    """
+    record_funding for a stream of (project_id, at, amount, count) changes.
+
+    Changes are summed per bucket as they are read, so memory grows with the
+    number of buckets touched rather than the number of changes, and the
+    buckets are written UPSERT_BATCH_SIZE rows per statement.
+    """
+    buckets: dict[tuple, list] = defaultdict(lambda: [0.0, 0])
+    for project_id, at, amount, count in changes:
+        if at is None:
+            continue
+        for granularity in GRANULARITIES:
+            bucket = buckets[(project_id, granularity, truncate(at, granularity))]
+            bucket[0] += amount
+            bucket[1] += count
+    rows = [
+        {"project_id": project_id, "granularity": granularity, "bucket": bucket, "amount": amount, "count": count}
+        for (project_id, granularity, bucket), (amount, count) in buckets.items()
+    ]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        _upsert(db, rows[start:start + UPSERT_BATCH_SIZE])
+
+
+def _upsert(db: Session, rows: list[dict]):
+    # A row may appear once per statement: ON CONFLICT DO UPDATE can't touch the same bucket twice
+    rollup = models.FundingRollup.__table__
+    stmt = dialect_insert(db, rollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[rollup.c.project_id, rollup.c.granularity, rollup.c.bucket],
+        set_={
+            "amount": rollup.c.amount + stmt.excluded.amount,
+            "count": rollup.c.count + stmt.excluded.count,
+        },
+    )
+    db.execute(stmt)
+
+
+def get_series(db: Session, project_id: int, granularity: str, funds_raised: float = 0.0) -> list[dict]:
+    """
+    The project's buckets in order, each with the running total.
+
+    Investments from before created_at was recorded have no bucket, so the
+    running total opens at what they still add to fundsRaised: the part of
+    `funds_raised` the buckets don't account for. The last point's
+    cumulative is then the project's fundsRaised.
+    """
+    rows = (
+        db.query(models.FundingRollup)
+        .filter(
+            models.FundingRollup.project_id == project_id,
+            models.FundingRollup.granularity == granularity,
+        )
+        .order_by(models.FundingRollup.bucket)
+        .all()
+    )
+    cumulative = (funds_raised or 0.0) - sum(row.amount for row in rows)
+    series = []
+    for row in rows:
+        cumulative += row.amount
+        series.append({
+            "bucket": row.bucket,
+            "amount": row.amount,
+            "count": row.count,
+            "cumulative": cumulative,
+        })
+    return series
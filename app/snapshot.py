@@ -0,0 +1,182 @@
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FEEDSNP1"
+# Sections in file order; "identity" is the plain JSON
+SECTIONS = ("identity", "gzip", "br")
+# magic, version, built_at (unix time), then (offset, length) for each section
+HEADER = struct.Struct("<8sQd" + "QQ" * len(SECTIONS))
+
+
+def enabled() -> bool:
+    return bool(config.LISTING_SNAPSHOT_PATH)
+
+
+def _dirty_path() -> str:
+    return config.LISTING_SNAPSHOT_PATH + ".dirty"
+
+
+def mark_dirty():
+    """Tell the publisher, whichever worker it is, that the feed changed."""
+    path = _dirty_path()
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        open(path, "a").close()
+
+
+def write(path: str, version: int, bodies: dict[str, bytes]):
+    """Write a snapshot beside `path` and rename it into place, so readers never see a partial one."""
+    offsets, position = [], HEADER.size
+    for section in SECTIONS:
+        length = len(bodies.get(section, b""))
+        offsets += [position, length]
+        position += length
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, version, time.time(), *offsets))
+        for section in SECTIONS:
+            f.write(bodies.get(section, b""))
+    os.replace(tmp, path)
+
+
+class Snapshot:
+    """One mapped snapshot file. Slices handed out keep the mapping alive until they are released."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.inode = (stat.st_dev, stat.st_ino)
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.built_at, *offsets = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a feed snapshot")
+        view = memoryview(self.map)
+        self.sections = {
+            section: view[offsets[2 * i]:offsets[2 * i] + offsets[2 * i + 1]]
+            for i, section in enumerate(SECTIONS)
+            if offsets[2 * i + 1]
+        }
+
+
+class SnapshotReader:
+    def __init__(self, path: str):
+        self.path = path
+        self.current: Optional[Snapshot] = None
+
+    def read(self, encoding: Optional[str], max_age: float) -> Optional[memoryview]:
+        """
+        The feed body in `encoding` (None for identity) straight from the
+        mapping, or None when there is no snapshot younger than `max_age`
+        (no publisher yet, or it died), so the caller falls back to the
+        database.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        current = self.current
+        if current is None or current.inode != (stat.st_dev, stat.st_ino):
+            try:
+                # The previous mapping is unmapped once responses still sending from it are done
+                current = self.current = Snapshot(self.path)
+            except (OSError, ValueError) as exc:
+                logger.warning("Could not map feed snapshot: %s", exc)
+                return None
+        if time.time() - current.built_at > max_age:
+            return None
+        return current.sections.get(encoding or "identity")
+
+
+class SnapshotPublisher:
+    """
+    Keeps the snapshot current. Every worker runs one; the one holding an
+    exclusive lock on <path>.lock publishes, the rest keep trying so one of
+    them takes over within a tick if the publisher exits. It rebuilds after a
+    write anywhere (mark_dirty) and at least every LISTING_CACHE_SECONDS, and
+    at most once per tick however often the feed changes.
+    """
+
+    def __init__(self, path: str, build: Callable[[], dict[str, bytes]], interval: float):
+        self.path = path
+        self.build = build
+        self.interval = interval
+        self.leader = False
+        self._lock_file = None
+        self._built_dirty_ns = -1
+        self._built_at = 0.0
+        self._version = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _try_lead(self) -> bool:
+        if self._lock_file is None:
+            self._lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                # Carry on from the last publisher's version
+                self._version = HEADER.unpack(f.read(HEADER.size))[1]
+        except (OSError, struct.error):
+            self._version = 0
+        logger.info("Publishing the feed snapshot from pid %s", os.getpid())
+        return True
+
+    def _dirty_ns(self) -> int:
+        try:
+            return os.stat(_dirty_path()).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _publish(self, dirty_ns: int):
+        self._version += 1
+        write(self.path, self._version, self.build())
+        self._built_dirty_ns, self._built_at = dirty_ns, time.monotonic()
+
+    async def run(self):
+        while True:
+            try:
+                if not self.leader:
+                    self.leader = self._try_lead()
+                if self.leader:
+                    # Read before building, so a write during the build triggers another one
+                    dirty_ns = self._dirty_ns()
+                    if dirty_ns != self._built_dirty_ns or time.monotonic() - self._built_at > config.LISTING_CACHE_SECONDS:
+                        await run_in_threadpool(self._publish, dirty_ns)
+            except Exception:
+                logger.exception("Feed snapshot publishing failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_file is not None:
+            # Closing releases the lock for the next publisher
+            self._lock_file.close()
+            self._lock_file = None
+        self.leader = False
+
+
+reader = SnapshotReader(config.LISTING_SNAPSHOT_PATH)
@@ -0,0 +1,143 @@
+import os
+from email.utils import formatdate, parsedate
+from typing import Mapping, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from . import config, images
+
+# Content-Encoding -> suffix of the precompressed sibling written at upload
+# time (uploads.precompress), in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def sibling_path(path: str, encoding: str) -> str:
+    return path + ENCODINGS[encoding]
+
+
+def accepted_encodings(accept_encoding: str) -> list[str]:
+    """Encodings from an Accept-Encoding header we have siblings for, best first."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == "*":
+            for encoding in ENCODINGS:
+                weights.setdefault(encoding, q)
+        elif coding in ENCODINGS:
+            weights[coding] = q
+    preference = list(ENCODINGS)
+    return sorted((e for e, q in weights.items() if q > 0), key=lambda e: (-weights[e], preference.index(e)))
+
+
+def _content_hash(path: str) -> Optional[str]:
+    # Written by uploads.record_checksum; absent until the upload job has run
+    try:
+        with open(path + ".sha256") as sidecar:
+            return sidecar.read().strip()[:32] or None
+    except OSError:
+        return None
+
+
+def _not_modified(request_headers: Mapping[str, str], etag: str, last_modified: str) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since, and uses the weak comparison
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        since, modified = parsedate(if_modified_since), parsedate(last_modified)
+        return since is not None and modified is not None and since >= modified
+    return False
+
+
+def file_response(path: str, request_headers: Mapping[str, str], media_type: Optional[str] = None,
+                  stat_result: Optional[os.stat_result] = None) -> Response:
+    """
+    Serve an uploaded file with validators and precompressed variants.
+
+    The ETag is the upload's SHA-256 (falling back to mtime and size), so it
+    is strong and identical across workers; a matching If-None-Match or
+    If-Modified-Since gets a bodyless 304. Clients that accept br or gzip
+    get the sibling written at upload time, with its own ETag. Range
+    requests always get the identity bytes, so a resumed download lines up
+    with the original file. The body goes out through FileResponse, which
+    answers Range/If-Range itself and hands the path to the server for
+    sendfile when it supports the ASGI pathsend extension; behind nginx,
+    STATIC_ACCEL_REDIRECT has nginx send the file instead.
+    """
+    stat_result = stat_result or os.stat(path)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    content_hash = _content_hash(path)
+    headers = {
+        "cache-control": f"public, max-age={config.STATIC_MAX_AGE_SECONDS}",
+        "vary": "Accept-Encoding",
+        "last-modified": last_modified,
+    }
+
+    served, encoding = path, None
+    if "range" not in request_headers:
+        for candidate in accepted_encodings(request_headers.get("accept-encoding", "")):
+            try:
+                sibling_stat = os.stat(sibling_path(path, candidate))
+            except OSError:
+                continue
+            # A sibling older than its original is stale; never serve it
+            if sibling_stat.st_mtime >= stat_result.st_mtime:
+                served, encoding, stat_result = sibling_path(path, candidate), candidate, sibling_stat
+                break
+
+    if content_hash:
+        headers["etag"] = f'"{content_hash}-{encoding}"' if encoding else f'"{content_hash}"'
+    if encoding:
+        headers["content-encoding"] = encoding
+
+    # With no media_type, "proof.pdf.gz" is still guessed as application/pdf
+    response = FileResponse(served, media_type=media_type, headers=headers, stat_result=stat_result)
+    if _not_modified(request_headers, response.headers["etag"], last_modified):
+        return NotModifiedResponse(response.headers)
+    if config.STATIC_ACCEL_REDIRECT:
+        relative = os.path.relpath(served, config.STATIC_FILES_DIR)
+        accel_headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+        accel_headers["x-accel-redirect"] = config.STATIC_ACCEL_REDIRECT.rstrip("/") + "/" + relative
+        return Response(status_code=200, headers=accel_headers)
+    return response
+
+
+class UploadStaticFiles(StaticFiles):
+    """
+    The /static mount, serving every file through file_response. A resized
+    image the upload job hasn't produced yet is rendered on its first request.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as exc:
+            derivative = images.parse_derivative(path) if exc.status_code == 404 else None
+            if derivative is None:
+                raise
+            # lookup_path keeps the original inside the directory
+            original, _ = self.lookup_path(derivative[0])
+            if not original or await run_in_threadpool(images.ensure_derivative, original, derivative[1]) is None:
+                raise
+            return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        if status_code != 200:
+            # html=True 404 pages
+            return super().file_response(full_path, stat_result, scope, status_code)
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        return file_response(str(full_path), headers, stat_result=stat_result)
@@ -0,0 +1,39 @@
+"""
+Offline stand-in for the parts of the `stripe` SDK this app calls.
+
+It keeps no state beyond idempotency keys and answers after a configurable
+delay, so payment jobs can be exercised and benchmarked without network
+access or a Stripe account.
+"""
+import threading
+import time
+import uuid
+
+from .config import STRIPE_STUB_LATENCY_MS
+
+_lock = threading.Lock()
+_by_idempotency_key: dict[str, dict] = {}
+
+
+class PaymentIntent:
+    @staticmethod
+    def create(amount: int, currency: str, metadata=None, idempotency_key=None, **kwargs) -> dict:
+        if STRIPE_STUB_LATENCY_MS:
+            time.sleep(STRIPE_STUB_LATENCY_MS / 1000)
+        with _lock:
+            if idempotency_key in _by_idempotency_key:
+                return _by_idempotency_key[idempotency_key]
+            # Unique across worker processes and restarts, like real intent ids
+            intent_id = f"pi_stub_{uuid.uuid4().hex[:24]}"
+            intent = {
+                "id": intent_id,
+                "object": "payment_intent",
+                "amount": amount,
+                "currency": currency,
+                "metadata": metadata or {},
+                "status": "requires_payment_method",
+                "client_secret": f"{intent_id}_secret_stub",
+            }
+            if idempotency_key is not None:
+                _by_idempotency_key[idempotency_key] = intent
+        return intent
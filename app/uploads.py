@@ -0,0 +1,277 @@
+import base64
+import fcntl
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import config, images, models
+from .database import SessionLocal
+from .jobs import enqueue, job_handler
+from .static_files import ENCODINGS, sibling_path
+
+try:
+    import brotli
+except ImportError:  # gzip siblings only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Functions run, in order, on every file saved by create_project
+upload_processors: list[Callable[[str], None]] = []
+
+
+def upload_processor(func: Callable[[str], None]):
+    upload_processors.append(func)
+    return func
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@upload_processor
+def record_checksum(path: str):
+    """Write <file>.sha256 next to the upload for integrity checks and content-based validators."""
+    digest = file_sha256(path)
+    with open(path + ".sha256", "w") as f:
+        f.write(digest)
+
+
+# Formats that are already compressed; a second pass only costs CPU
+COMPRESSED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".zip", ".gz", ".br",
+    ".pptx", ".docx", ".xlsx", ".mp4", ".mov", ".mp3",
+}
+
+
+def _compress(path: str, target: str, encoding: str):
+    with open(path, "rb") as src, open(target, "wb") as dst:
+        if encoding == "gzip":
+            with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=9, mtime=0) as gz:
+                shutil.copyfileobj(src, gz, 1 << 20)
+            return
+        compressor = brotli.Compressor(quality=11)
+        for chunk in iter(lambda: src.read(1 << 20), b""):
+            dst.write(compressor.process(chunk))
+        dst.write(compressor.finish())
+
+
+@upload_processor
+def precompress(path: str):
+    """Write <file>.br / <file>.gz next to the upload for static_files to serve by Accept-Encoding."""
+    if os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return
+    size = os.path.getsize(path)
+    for encoding in ENCODINGS:
+        if encoding == "br" and brotli is None:
+            continue
+        target = sibling_path(path, encoding)
+        # Readers may be serving the sibling right now, so build it aside and swap it in whole.
+        # The name is unique: a retried job may be compressing the same file.
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target), prefix=os.path.basename(target) + ".",
+                                         suffix=".tmp")
+        os.close(fd)
+        try:
+            _compress(path, temporary, encoding)
+            if os.path.getsize(temporary) > size * (1 - config.PRECOMPRESS_MIN_SAVING):
+                # Not worth a second representation; drop it and any stale one
+                os.remove(temporary)
+                if os.path.exists(target):
+                    os.remove(target)
+                continue
+            shutil.copystat(path, temporary)
+            os.replace(temporary, target)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+
+@upload_processor
+def resize_images(path: str):
+    """Resize campaign images to the thumb/card/hero sizes feeds link to (images.SIZES)."""
+    if images.is_image(path):
+        images.generate_derivatives(path)
+
+
+def _process(path: str):
+    if not os.path.exists(path):
+        logger.warning("Upload %s is gone; skipping post-processing", path)
+        return
+    for processor in upload_processors:
+        processor(path)
+
+
+@job_handler("process_upload")
+async def process_upload(payload: dict):
+    await run_in_threadpool(_process, payload["path"])
+
+
+# ------------------------------------------------------------------
+#  Resumable uploads
+# ------------------------------------------------------------------
+# A client creates an upload with the file's name and size, PATCHes chunks
+# at the offset the server reports and finalizes it; POST /campaigns then
+# takes the upload id in place of the file. A dropped connection costs only
+# the chunk in flight: the client asks for the offset and carries on from it.
+# Chunks are appended to a partial file outside STATIC_FILES_DIR, and its
+# size is the offset.
+
+class OffsetConflict(Exception):
+    """The chunk doesn't start where the partial file ends."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"upload is at offset {offset}")
+        self.offset = offset
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def partial_path(upload_id: str) -> str:
+    return os.path.join(config.UPLOAD_PARTIAL_DIR, upload_id)
+
+
+def received(upload_id: str) -> int:
+    """Bytes received so far."""
+    try:
+        return os.path.getsize(partial_path(upload_id))
+    except FileNotFoundError:
+        return 0
+
+
+def parse_checksum(header: Optional[str]) -> Optional[bytes]:
+    """The digest from an Upload-Checksum header ("sha256 <base64 digest>", as in tus), or None."""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(" ")
+    if algorithm.lower() != "sha256":
+        raise ValueError(f"Unsupported checksum algorithm {algorithm!r}; use sha256")
+    return base64.b64decode(value.strip(), validate=True)
+
+
+def append_chunk(upload_id: str, offset: int, data: bytes, checksum: Optional[bytes] = None) -> int:
+    """
+    Append `data` at `offset`, which must be the bytes received so far, and
+    return the new offset. A chunk that doesn't match `checksum` is not
+    written. Appends to one upload are serialized on a file lock, so a retry
+    racing the original attempt gets OffsetConflict rather than a
+    duplicated chunk.
+    """
+    if checksum is not None and hashlib.sha256(data).digest() != checksum:
+        raise ChecksumMismatch("chunk checksum mismatch")
+    os.makedirs(config.UPLOAD_PARTIAL_DIR, exist_ok=True)
+    with open(partial_path(upload_id), "ab") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        current = os.fstat(f.fileno()).st_size
+        if current != offset:
+            raise OffsetConflict(current)
+        f.write(data)
+        f.flush()
+        # The offset reported back must survive a crash
+        os.fsync(f.fileno())
+        return current + len(data)
+
+
+def finalize(upload: models.Upload) -> str:
+    """
+    Check a fully received upload against its declared size and sha256 and
+    move it into STATIC_FILES_DIR. Returns the stored path.
+    """
+    source = partial_path(upload.id)
+    size = received(upload.id)
+    if size != upload.size:
+        raise OffsetConflict(size)
+    if upload.sha256 and file_sha256(source) != upload.sha256.lower():
+        raise ChecksumMismatch("file checksum mismatch")
+    os.makedirs(config.STATIC_FILES_DIR, exist_ok=True)
+    target = os.path.join(
+        config.STATIC_FILES_DIR,
+        f"upload_{datetime.now().strftime('%Y%m%d%H%M%S')}_{upload.id[:8]}_{os.path.basename(upload.filename)}",
+    )
+    # May cross filesystems, unlike os.replace
+    shutil.move(source, target)
+    return target
+
+
+def unfinalize(upload_id: str, path: str):
+    """Undo finalize's move when the upload's new state could not be committed."""
+    if os.path.exists(path):
+        shutil.move(path, partial_path(upload_id))
+
+
+def discard(upload: models.Upload):
+    """Remove an upload's bytes, partial or finalized."""
+    for path in (partial_path(upload.id), upload.path):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def stored_files(path: str) -> list[str]:
+    """A stored file and everything the upload processors wrote next to it."""
+    return [
+        path,
+        path + ".sha256",
+        *(sibling_path(path, encoding) for encoding in ENCODINGS),
+        *(images.derivative_path(path, size) for size in images.SIZES),
+    ]
+
+
+def _remove_files(paths: list[str]):
+    for path in paths:
+        for candidate in stored_files(path):
+            try:
+                os.remove(candidate)
+            except FileNotFoundError:
+                pass
+
+
+@job_handler("remove_files")
+async def remove_files(payload: dict):
+    """Delete files left behind by deleted campaigns and uploads (see app/deletion.py)."""
+    await run_in_threadpool(_remove_files, payload["paths"])
+
+
+def _purge_abandoned():
+    cutoff = datetime.utcnow() - timedelta(seconds=config.UPLOAD_ABANDON_SECONDS)
+    with SessionLocal() as db:
+        stale = db.query(models.Upload).filter(
+            models.Upload.status != models.ATTACHED_STATUS,
+            models.Upload.updated_at < cutoff,
+        ).all()
+        for upload in stale:
+            discard(upload)
+            db.delete(upload)
+        next_run = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        schedule_purge(db, next_run)
+        db.commit()
+    # Partial files whose row is already gone
+    if os.path.isdir(config.UPLOAD_PARTIAL_DIR):
+        for entry in os.scandir(config.UPLOAD_PARTIAL_DIR):
+            if entry.is_file() and datetime.utcfromtimestamp(entry.stat().st_mtime) < cutoff:
+                os.remove(entry.path)
+    if stale:
+        logger.info("Removed %d abandoned uploads", len(stale))
+
+
+def schedule_purge(db, run_at: datetime):
+    """Queue the hourly cleanup of abandoned uploads; the key keeps workers from queueing it twice."""
+    enqueue(db, "purge_abandoned_uploads", {}, run_at=run_at,
+            idempotency_key=f"purge-uploads:{run_at:%Y%m%d%H}")
+
+
+@job_handler("purge_abandoned_uploads")
+async def purge_abandoned_uploads(payload: dict):
+    await run_in_threadpool(_purge_abandoned)
@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, select, update
+
+from . import models, config, events, series, portfolio
+from .database import SessionLocal, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_TOLERANCE_SECONDS = 300
+
+# Investment.payment_status set by each event type we act on
+EVENT_STATUS = {
+    "payment_intent.succeeded": "succeeded",
+    "payment_intent.payment_failed": "failed",
+    "payment_intent.canceled": "canceled",
+    "charge.refunded": "refunded",
+}
+# Investments in these states don't count towards Project.fundsRaised
+UNCOUNTED_STATUSES = {"failed", "canceled", "refunded"}
+
+
+def verify_signature(payload: bytes, header: str, now: Optional[float] = None) -> bool:
+    """Check a Stripe-Signature header (t=...,v1=...) against STRIPE_WEBHOOK_SECRET."""
+    if not config.STRIPE_WEBHOOK_SECRET:
+        # Unsigned events are only accepted by an explicitly enabled offline stub
+        if not config.STRIPE_STUB:
+            logger.warning("Rejecting webhook: STRIPE_WEBHOOK_SECRET is not set")
+        return config.STRIPE_STUB
+    timestamp, signatures = None, []
+    for part in header.split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+    if timestamp is None or not signatures:
+        return False
+    try:
+        if abs((now or time.time()) - int(timestamp)) > SIGNATURE_TOLERANCE_SECONDS:
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(
+        config.STRIPE_WEBHOOK_SECRET.encode(),
+        timestamp.encode() + b"." + payload,
+        hashlib.sha256,
+    ).hexdigest()
+    return any(hmac.compare_digest(expected, signature) for signature in signatures)
+
+
+def store_event(event_id: str, event_type: str, payload: str):
+    """Append an event to the inbox. Redeliveries hit the unique event_id and are dropped."""
+    with SessionLocal() as db:
+        db.execute(
+            dialect_insert(db, models.StripeEvent.__table__)
+            .values(event_id=event_id, type=event_type, payload=payload, received_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["event_id"])
+        )
+        db.commit()
+
+
+def _latest_statuses(stripe_events: list[models.StripeEvent]):
+    """
+    Newest (created, inbox id, status) per investment id and per intent id;
+    redeliveries and reordering collapse here. Events created in the same
+    second are ordered by arrival.
+    """
+    by_investment: dict[int, tuple[int, int, str]] = {}
+    by_intent: dict[str, tuple[int, int, str]] = {}
+    for stripe_event in stripe_events:
+        status = EVENT_STATUS.get(stripe_event.type)
+        if status is None:
+            continue
+        data = json.loads(stripe_event.payload)
+        obj = data.get("data", {}).get("object", {})
+        created = data.get("created", 0)
+        if stripe_event.type.startswith("charge."):
+            intent_id, investment_id = obj.get("payment_intent"), None
+        else:
+            intent_id = obj.get("id")
+            investment_id = (obj.get("metadata") or {}).get("investment_id")
+        if investment_id is not None:
+            key, target = int(investment_id), by_investment
+        elif intent_id is not None:
+            key, target = intent_id, by_intent
+        else:
+            continue
+        entry = (created, stripe_event.id, status)
+        if key not in target or entry > target[key]:
+            target[key] = entry
+    return by_investment, by_intent
+
+
+def reconcile_batch(limit: int) -> int:
+    """
+    Apply up to `limit` unprocessed events in one transaction.
+
+    Status changes are applied to the matching investments. Project totals
+    are adjusted once per project for investments that moved into or out of
+    a failed/canceled/refunded state. Returns the number of events consumed.
+    """
+    with SessionLocal() as db:
+        ids = db.scalars(
+            select(models.StripeEvent.id)
+            .where(models.StripeEvent.processed_at.is_(None))
+            .order_by(models.StripeEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not ids:
+            return 0
+        # Without row locks (SQLite) another reconciler may have selected the
+        # same events: only the ones this UPDATE marks are ours to apply
+        claimed = db.scalars(
+            update(models.StripeEvent)
+            .where(models.StripeEvent.id.in_(ids), models.StripeEvent.processed_at.is_(None))
+            .values(processed_at=datetime.utcnow())
+            .returning(models.StripeEvent.id),
+            execution_options={"synchronize_session": False},
+        ).all()
+        stripe_events = (
+            db.query(models.StripeEvent)
+            .filter(models.StripeEvent.id.in_(claimed))
+            .order_by(models.StripeEvent.id)
+            .all()
+        )
+        if not stripe_events:
+            db.commit()
+            return 0
+
+        by_investment, by_intent = _latest_statuses(stripe_events)
+        deltas: dict[int, list] = defaultdict(lambda: [0.0, 0])
+        changed_investors = set()
+        if by_investment or by_intent:
+            investments = db.query(models.Investment).filter(or_(
+                models.Investment.id.in_(list(by_investment)),
+                models.Investment.payment_intent_id.in_(list(by_intent)),
+            )).all()
+            for investment in investments:
+                # An intent's events may be keyed either way (charge events carry no metadata)
+                latest = max(
+                    entry for entry in (by_investment.get(investment.id), by_intent.get(investment.payment_intent_id))
+                    if entry is not None
+                )
+                created, _, new_status = latest
+                if investment.payment_status_at is not None and created < investment.payment_status_at:
+                    # Older than the status already applied by an earlier batch
+                    continue
+                investment.payment_status_at = created
+                was_counted = investment.payment_status not in UNCOUNTED_STATUSES
+                now_counted = new_status not in UNCOUNTED_STATUSES
+                if was_counted != now_counted:
+                    sign = 1 if now_counted else -1
+                    deltas[investment.project_id][0] += sign * investment.amount
+                    deltas[investment.project_id][1] += sign
+                    series.record_funding(
+                        db, investment.project_id, investment.created_at, sign * investment.amount, sign,
+                    )
+                    changed_investors.add(investment.investor_id)
+                investment.payment_status = new_status
+
+        if deltas:
+            projects = db.query(models.Project).filter(models.Project.id.in_(list(deltas))).all()
+            for project in projects:
+                amount, count = deltas[project.id]
+                project.fundsRaised = (project.fundsRaised or 0.0) + amount
+                events.publish_funding(db, project, delta=amount, count=count)
+
+        db.commit()
+    portfolio.portfolio_cache.invalidate_many(changed_investors)
+    return len(stripe_events)
+
+
+class WebhookReconciler:
+    """Drains the event inbox in batches; several can run at once thanks to SKIP LOCKED."""
+
+    def __init__(self, batch_size: int = config.WEBHOOK_BATCH_SIZE,
+                 interval: float = config.WEBHOOK_RECONCILE_SECONDS):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                consumed = await run_in_threadpool(reconcile_batch, self.batch_size)
+            except Exception:
+                logger.exception("Reconciling Stripe events failed")
+                consumed = 0
+            if consumed < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+
+reconciler = WebhookReconciler()
@@ -0,0 +1,57 @@
+"""
+Dedicated job workers, for running background jobs outside the web processes:
+
+    python -m app.worker --processes 4
+
+Set RUN_JOBS_IN_APP=false on the web processes when these are running.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+
+from .database import engine
+from . import jobs, webhooks, notifications, payments, uploads, idempotency  # noqa: F401  (register job handlers)
+
+
+async def _serve():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    jobs.runner.start()
+    webhooks.reconciler.start()
+    await stop.wait()
+    await webhooks.reconciler.stop()
+    await jobs.runner.stop()
+
+
+def run():
+    # Never reuse pooled connections inherited across fork
+    engine.dispose(close=False)
+    asyncio.run(_serve())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    processes = [multiprocessing.Process(target=run, daemon=False) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    # Pass SIGTERM on to the children so each finishes its running jobs
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in processes])
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Ctrl-C reaches the whole process group; wait for the children to wind down
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks for the API. Run each module with `python -m benchmarks.<name>` from the repo root."""
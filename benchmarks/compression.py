@@ -0,0 +1,117 @@
+"""
+CPU cost against bytes saved for response compression, on the seeded
+database's real GET /campaigns body.
+
+Reports, as JSON:
+  levels    compressed size and compression time of the /campaigns body at
+            each gzip level and brotli quality
+  campaigns request latency and bytes for GET /campaigns with the listing
+            cache missing on every request (serialize + compress each time)
+            and hitting (the bytes are reused as they are), and served from
+            the shared snapshot when LISTING_SNAPSHOT_PATH is set
+  middleware  the same for a route compressed on the fly by
+            CompressionMiddleware (GET /investors)
+
+    python -m benchmarks.seed --projects 2000
+    python -m benchmarks.compression --requests 50
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("SQL_ECHO", "false")
+
+import httpx  # noqa: E402
+
+from app import config, listing, snapshot  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 5, 9, 11)}
+
+
+def _ms(samples: list[float]) -> float:
+    return statistics.median(samples) * 1000
+
+
+def level_table(body: bytes, repeat: int) -> dict:
+    table = {"identity": {"bytes": len(body)}}
+    for encoding, levels in LEVELS.items():
+        if encoding == "br" and brotli is None:
+            continue
+        for level in levels:
+            timings = []
+            for _ in range(repeat if level < 10 else 1):
+                started = time.perf_counter()
+                if encoding == "br":
+                    size = len(brotli.compress(body, quality=level))
+                else:
+                    size = len(gzip.compress(body, compresslevel=level, mtime=0))
+                timings.append(time.perf_counter() - started)
+            table[f"{encoding}-{level}"] = {
+                "bytes": size,
+                "ratio": round(size / len(body), 4),
+                "compress_ms": _ms(timings),
+            }
+    return table
+
+
+async def timed(client: httpx.AsyncClient, url: str, accept_encoding: str, requests: int,
+                before=None) -> dict:
+    timings, size, encoding = [], 0, None
+    for _ in range(requests):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        async with client.stream("GET", url, headers={"accept-encoding": accept_encoding}) as response:
+            size = sum([len(chunk) async for chunk in response.aiter_raw()])
+        timings.append(time.perf_counter() - started)
+        encoding = response.headers.get("content-encoding")
+    return {"content_encoding": encoding, "bytes": size, "p50_ms": _ms(timings), "max_ms": max(timings) * 1000}
+
+
+async def run(args) -> dict:
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        body = (await client.get("/campaigns", headers={"accept-encoding": "identity"})).content
+        report = {"campaigns_body_bytes": len(body), "levels": level_table(body, args.repeat)}
+        browser = "gzip, deflate, br" if brotli else "gzip, deflate"
+        report["campaigns"] = {
+            "uncached, identity": await timed(client, "/campaigns", "identity", args.requests, listing.cache.bump),
+            "uncached, compressed": await timed(client, "/campaigns", browser, args.requests, listing.cache.bump),
+            "cached, identity": await timed(client, "/campaigns", "identity", args.requests),
+            "cached, compressed": await timed(client, "/campaigns", browser, args.requests),
+        }
+        if snapshot.enabled():
+            # Published here rather than by the lifespan's publisher, which ASGITransport doesn't start
+            snapshot.write(config.LISTING_SNAPSHOT_PATH, 1, listing.build_snapshot())
+            report["campaigns"]["snapshot, identity"] = await timed(client, "/campaigns", "identity", args.requests)
+            report["campaigns"]["snapshot, compressed"] = await timed(client, "/campaigns", browser, args.requests)
+        report["middleware"] = {
+            "identity": await timed(client, "/investors", "identity", args.requests),
+            "gzip": await timed(client, "/investors", "gzip", args.requests),
+        }
+        if brotli:
+            report["middleware"]["br"] = await timed(client, "/investors", "br", args.requests)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions per compression level")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Drive the API with concurrent clients and report throughput and latency
+percentiles per endpoint as JSON.
+
+--target asgi calls the app in-process through httpx's ASGI transport:
+no sockets, so it measures the application alone. --target uvicorn starts
+`uvicorn app.main:app` on a local port and goes over HTTP. Seed the
+database first (python -m benchmarks.seed); ids and emails used by the
+requests are read from it.
+
+    python -m benchmarks.load --target asgi --requests 500 --concurrency 16 --output run.json
+    python -m benchmarks.load --target uvicorn --workers 4 --baseline run.json --max-regression 0.2
+
+With --baseline, each endpoint is compared against the stored run and the
+exit status is 1 if p95 latency grew, or throughput fell, by more than
+--max-regression.
+
+To compare backends, seed and run once per DATABASE_URL and diff the
+reports; with SQLite, build the schema with `alembic upgrade head` first:
+
+    DATABASE_URL=sqlite:///./bench.db alembic upgrade head
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.seed --projects 300
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.load --target uvicorn --workers 4 \
+        --baseline postgres.json
+
+One such comparison: PostgreSQL 16.2 on a local socket against a SQLite
+file with the default SQLITE_* settings. Both were seeded with `--projects
+300` and the other defaults, and run with `--target uvicorn --workers 2
+--requests 300 --concurrency 16`. Postgres, both workers and the client
+shared a single CPU, so the absolute numbers are low. Only the ratios
+carry over. Requests per second, then p95 in ms:
+
+    endpoint                      postgres        sqlite
+    GET /campaigns                40   1084       29    805
+    GET /campaigns/{project_id}   74    650       65    768
+    GET /campaigns/trending      124    349      124    341
+    GET /investor/portfolio       64    657       52    973
+    GET /investor/feed            65    718       61    807
+    POST /investments             26   1581       41    687
+    POST /campaigns               17   1565       16   1627
+
+Reads on SQLite ran 5-27% slower than on Postgres. The ranking served
+from memory (trending) ran at the same speed. Investments were faster on
+SQLite even with one writer at a time, likely because its WAL with
+synchronous=NORMAL doesn't fsync on commit and Postgres does. POST /signin
+is left out, because admission control shed most of its bcrypt-bound
+requests on both backends. Rerun the comparison on production-sized
+hardware before choosing a backend by these numbers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Settings for the app under test; set before app is imported, explicit env wins
+BENCH_ENV = {
+    "SQL_ECHO": "false",
+    "SIGNIN_RATE_PER_SECOND": "0",
+    "UPLOAD_RATE_PER_SECOND": "0",
+    "LISTING_RATE_PER_SECOND": "0",
+    "STRIPE_STUB": "true",
+}
+for _name, _value in BENCH_ENV.items():
+    os.environ.setdefault(_name, _value)
+
+import httpx  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from benchmarks.seed import PASSWORD  # noqa: E402
+
+
+def load_fixtures(sample: int = 1000) -> dict:
+    """Ids and emails to build requests from, sampled from the seeded database."""
+    with SessionLocal() as db:
+        fixtures = {
+            "project_ids": list(db.scalars(
+                select(models.Project.id).where(models.Project.status == models.LIVE_STATUS).limit(sample))),
+            "investor_ids": list(db.scalars(select(models.Investor.id).limit(sample))),
+            "founder_ids": list(db.scalars(select(models.Founder.id).limit(sample))),
+            "founder_emails": list(db.scalars(select(models.Founder.email).limit(sample))),
+        }
+    missing = [name for name, values in fixtures.items() if not values]
+    if missing:
+        raise SystemExit(f"No rows for {', '.join(missing)}; run python -m benchmarks.seed first")
+    return fixtures
+
+
+def _campaign_form(rng: random.Random) -> dict:
+    return {
+        "data": {
+            "campaignTitle": f"Bench campaign {rng.randint(0, 10**9)}",
+            "campaignDescription": "Created by the load benchmark.",
+            "campaignCategory": "tech",
+            "targetAmount": "50000",
+            "fundingType": "equity",
+            "deadline": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+            "minInvestment": "10",
+            "email": "bench@bench.example.com",
+            "address": "1 Bench Street",
+            "phone": "+15550000000",
+        },
+        "files": {
+            "proofOfEligibility": ("proof.pdf", b"%PDF-1.4\n" + b"0" * 65536, "application/pdf"),
+            "campaignImage": ("image.png", b"\x89PNG" + b"0" * 65536, "image/png"),
+        },
+    }
+
+
+# name -> function building the request arguments for httpx.AsyncClient.request
+ENDPOINTS = {
+    "GET /campaigns": lambda rng, f: ("GET", "/campaigns", {}),
+    "GET /campaigns/{project_id}": lambda rng, f: (
+        "GET", f"/campaigns/{rng.choice(f['project_ids'])}", {}),
+    "GET /campaigns/trending": lambda rng, f: ("GET", "/campaigns/trending", {}),
+    "POST /signin": lambda rng, f: (
+        "POST", "/signin", {"json": {"email": rng.choice(f["founder_emails"]), "password": PASSWORD}}),
+    "POST /investments": lambda rng, f: (
+        "POST", "/investments", {
+            "params": {"investor_id": rng.choice(f["investor_ids"])},
+            "json": {"project_id": rng.choice(f["project_ids"]), "amount": 50.0},
+        }),
+    "POST /campaigns": lambda rng, f: (
+        "POST", "/campaigns", {"params": {"founder_id": rng.choice(f["founder_ids"])}, **_campaign_form(rng)}),
+    "GET /investor/portfolio": lambda rng, f: (
+        "GET", "/investor/portfolio", {"params": {"investor_id": rng.choice(f["investor_ids"])}}),
+    "GET /investor/feed": lambda rng, f: (
+        "GET", "/investor/feed", {"params": {"investor_id": rng.choice(f["investor_ids"])}}),
+}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def run_endpoint(client: httpx.AsyncClient, name: str, fixtures: dict, requests: int,
+                       concurrency: int, warmup: int, seed: int) -> dict:
+    rng = random.Random(f"{seed}:{name}")
+    build = ENDPOINTS[name]
+    for _ in range(warmup):
+        method, url, kwargs = build(rng, fixtures)
+        await client.request(method, url, **kwargs)
+
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            method, url, kwargs = build(rng, fixtures)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 400)
+    return {
+        "requests": requests,
+        "ok": ok,
+        "statuses": statuses,
+        "seconds": elapsed,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0.0,
+        },
+    }
+
+
+async def run_all(client: httpx.AsyncClient, args, fixtures: dict) -> dict:
+    results = {}
+    for name in args.endpoints:
+        results[name] = await run_endpoint(
+            client, name, fixtures, args.requests, args.concurrency, args.warmup, args.seed)
+        print(f"{name}: {results[name]['throughput_rps']:.1f} req/s, "
+              f"p95 {results[name]['latency_ms']['p95']:.1f} ms", file=sys.stderr)
+    return results
+
+
+async def bench_asgi(args, fixtures: dict) -> dict:
+    from app.main import app
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits,
+                                     timeout=args.timeout) as client:
+            return await run_all(client, args, fixtures)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def bench_uvicorn(args, fixtures: dict) -> dict:
+    port = args.port or _free_port()
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ])
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                if server.poll() is not None:
+                    raise SystemExit(f"uvicorn exited with status {server.returncode}")
+                try:
+                    if (await client.get("/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise SystemExit("uvicorn did not become ready within 60s")
+                await asyncio.sleep(0.2)
+            return await run_all(client, args, fixtures)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(report: dict, baseline: dict, max_regression: float | None) -> tuple[dict, list[str]]:
+    comparison, failures = {}, []
+    for name, result in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        p95_ratio = result["latency_ms"]["p95"] / before["latency_ms"]["p95"] if before["latency_ms"]["p95"] else None
+        rps_ratio = result["throughput_rps"] / before["throughput_rps"] if before["throughput_rps"] else None
+        comparison[name] = {"p95_ratio": p95_ratio, "throughput_ratio": rps_ratio}
+        if max_regression is None:
+            continue
+        if p95_ratio is not None and p95_ratio > 1 + max_regression:
+            failures.append(f"{name}: p95 {p95_ratio:.2f}x baseline")
+        if rps_ratio is not None and rps_ratio < 1 / (1 + max_regression):
+            failures.append(f"{name}: throughput {rps_ratio:.2f}x baseline")
+    return comparison, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help="comma-separated subset of: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="fail when p95 or throughput is worse than the baseline by more than this fraction")
+    args = parser.parse_args()
+    args.endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in args.endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    fixtures = load_fixtures()
+    bench = bench_asgi if args.target == "asgi" else bench_uvicorn
+    report = {
+        "target": args.target,
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "concurrency": args.concurrency,
+        "workers": args.workers if args.target == "uvicorn" else None,
+        "endpoints": asyncio.run(bench(args, fixtures)),
+    }
+    failures = []
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            report["comparison"], failures = compare(report, json.load(baseline), args.max_regression)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    if failures:
+        print("Regressions against baseline:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
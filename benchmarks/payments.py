@@ -0,0 +1,156 @@
+"""
+Throughput of create_payment_intent jobs against the offline Stripe stub.
+
+Seeds campaigns and investments without payment intents, then for each
+--batch-sizes value queues a create_payment_intent job for --jobs of them
+and drains the queue with a JobRunner of that batch size, the way the web
+process and `python -m app.worker` do. The stub answers after
+STRIPE_STUB_LATENCY_MS (default here 50), standing in for Stripe's round
+trip, so the report shows how much of the ideal batch_size / latency each
+batch size reaches. Handlers run in the threadpool, whose 40 threads cap
+the concurrency of a single process whatever the batch size.
+
+The harness checks that every job finished as done and that every
+investment was given its own payment intent id.
+
+Needs an empty, migrated database; it writes to it freely:
+
+    DATABASE_URL=sqlite:///./payments.db alembic upgrade head
+    DATABASE_URL=sqlite:///./payments.db python -m benchmarks.payments --jobs 2000 --batch-sizes 1,10,40
+
+Prints a JSON report; the exit status is 1 if any check failed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Settings for the app under test; set before app is imported, explicit env wins
+PAYMENTS_ENV = {
+    "SQL_ECHO": "false",
+    "RUN_JOBS_IN_APP": "false",
+    "STRIPE_STUB": "true",
+    "STRIPE_STUB_LATENCY_MS": "50",
+}
+for _name, _value in PAYMENTS_ENV.items():
+    os.environ.setdefault(_name, _value)
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app import jobs, models, payments  # noqa: E402,F401  (registers the job handler)
+from app.config import STRIPE_STUB_LATENCY_MS  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from benchmarks import seed  # noqa: E402
+
+KIND = "create_payment_intent"
+
+
+def queue(investment_ids: list[int]):
+    with SessionLocal() as db:
+        for investment_id in investment_ids:
+            jobs.enqueue(db, KIND, {"investment_id": investment_id})
+        db.commit()
+
+
+def _outstanding() -> int:
+    with SessionLocal() as db:
+        return db.scalar(
+            select(func.count()).select_from(models.Job)
+            .where(models.Job.kind == KIND, models.Job.status.in_((jobs.QUEUED, jobs.RUNNING)))
+        )
+
+
+async def drain(batch_size: int, timeout: float) -> float:
+    runner = jobs.JobRunner(batch_size=batch_size, poll_seconds=0.01)
+    started = time.perf_counter()
+    runner.start()
+    try:
+        while await run_in_threadpool(_outstanding):
+            if time.perf_counter() - started > timeout:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await runner.stop()
+    return time.perf_counter() - started
+
+
+def verify(investment_ids: list[int]) -> list[str]:
+    failures = []
+    with SessionLocal() as db:
+        statuses = dict(db.execute(
+            select(models.Job.status, func.count()).where(models.Job.kind == KIND).group_by(models.Job.status)
+        ).all())
+        intents = db.scalars(
+            select(models.Investment.payment_intent_id).where(models.Investment.id.in_(investment_ids))
+        ).all()
+    unfinished = {status: count for status, count in statuses.items() if status != jobs.DONE}
+    if unfinished:
+        failures.append(f"jobs not done: {unfinished}")
+    missing = sum(1 for intent in intents if intent is None)
+    if missing:
+        failures.append(f"{missing} of {len(investment_ids)} investments have no payment intent")
+    given = [intent for intent in intents if intent is not None]
+    if len(set(given)) != len(given):
+        failures.append(f"{len(given) - len(set(given))} payment intent ids were given out twice")
+    return failures
+
+
+def run(jobs_per_round: int, batch_sizes: list[int], timeout: float, seed_value: int) -> tuple[dict, list[str]]:
+    seed.seed(founders=5, investors=100, projects=20, investments=jobs_per_round * len(batch_sizes), updates=0,
+              seed=seed_value)
+    with SessionLocal() as db:
+        pending = list(db.scalars(
+            select(models.Investment.id).where(models.Investment.payment_intent_id.is_(None))
+            .order_by(models.Investment.id)
+        ))
+    rounds, failures = [], []
+    for index, batch_size in enumerate(batch_sizes):
+        investment_ids = pending[index * jobs_per_round:(index + 1) * jobs_per_round]
+        queue(investment_ids)
+        elapsed = asyncio.run(drain(batch_size, timeout))
+        round_failures = verify(investment_ids)
+        failures.extend(f"batch size {batch_size}: {failure}" for failure in round_failures)
+        report = {"batch_size": batch_size, "jobs": len(investment_ids), "seconds": elapsed,
+                  "jobs_per_second": len(investment_ids) / elapsed if elapsed else 0.0}
+        if STRIPE_STUB_LATENCY_MS:
+            ideal = batch_size / (STRIPE_STUB_LATENCY_MS / 1000)
+            report["ideal_jobs_per_second"] = ideal
+            report["efficiency"] = report["jobs_per_second"] / ideal
+        rounds.append(report)
+    return {"stub_latency_ms": STRIPE_STUB_LATENCY_MS, "rounds": rounds}, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=2000, help="payment intents created per batch size")
+    parser.add_argument("--batch-sizes", default="1,10,40", help="comma-separated JobRunner batch sizes")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for one round to drain")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report here as well as to stdout")
+    parser.add_argument("--allow-existing", action="store_true",
+                        help="run against a database that already has campaigns")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if db.scalar(select(func.count()).select_from(models.Project)) and not args.allow_existing:
+            print("The database already has campaigns; point DATABASE_URL at an empty scratch database "
+                  "or pass --allow-existing.", file=sys.stderr)
+            sys.exit(2)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    report, failures = run(args.jobs, batch_sizes, args.timeout, args.seed)
+    report["failures"] = failures
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    if failures:
+        print(f"{len(failures)} payment check(s) failed:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""
+Per-route SQL statement budgets.
+
+Every route in app.main has an entry in BUDGETS: the most statements one
+request may issue. The harness seeds a scratch database, calls each route
+in-process and records every statement it issues. It then grows the
+dataset (more campaigns, and more investments and updates on the very
+rows the requests touch) and calls every route again. A route fails when
+it goes over its budget, or when its statement count changed with the
+data size, which is the signature of an N+1 such as a lazy relationship
+load per row. Failures list the statements that were issued.
+
+Needs an empty, migrated database; it writes to it freely:
+
+    DATABASE_URL=postgresql://.../budget_scratch alembic upgrade head
+    DATABASE_URL=postgresql://.../budget_scratch python -m benchmarks.query_budget
+
+A new route without a budget is reported as a failure, so budgets are
+declared alongside the route.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+os.environ.setdefault("SQL_ECHO", "false")
+os.environ.setdefault("RUN_JOBS_IN_APP", "false")
+os.environ.setdefault("RANKINGS_REFRESH_SECONDS", "86400")
+os.environ.setdefault("SIGNIN_RATE_PER_SECOND", "0")
+os.environ.setdefault("UPLOAD_RATE_PER_SECOND", "0")
+os.environ.setdefault("LISTING_RATE_PER_SECOND", "0")
+# Accept unsigned webhook events unless a real secret is configured
+os.environ.setdefault("STRIPE_STUB", "true")
+
+import httpx  # noqa: E402
+from sqlalchemy import event, func, insert, select  # noqa: E402
+from fastapi.routing import APIRoute  # noqa: E402
+
+from app import listing, models, portfolio, series  # noqa: E402
+from app.config import ADMIN_CREATION_TOKEN  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from benchmarks import seed  # noqa: E402
+
+SMALL = dict(founders=10, investors=40, projects=30, investments=300, updates=60)
+GROWTH = dict(founders=10, investors=40, projects=60, investments=600, updates=120)
+# Extra rows attached to the fixtures between the runs, so per-row loads show up
+FIXTURE_GROWTH = 25
+
+
+class StatementRecorder:
+    """Collects the SQL text of every statement the engine executes while recording."""
+
+    def __init__(self):
+        self.statements: Optional[list[str]] = None
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.statements is not None:
+            self.statements.append(" ".join(statement.split()))
+
+    def start(self):
+        self.statements = []
+
+    def stop(self) -> list[str]:
+        statements, self.statements = self.statements, None
+        return statements
+
+
+@dataclass
+class Budget:
+    max_statements: int
+    # Builds (method, url, httpx request kwargs) from the fixtures
+    request: Callable[[dict], tuple]
+    expect: tuple = (200,)
+    # Stores ids from the response for later cases
+    capture: Optional[Callable[[dict, httpx.Response], None]] = None
+    # Runs before the request, outside the recording, e.g. to insert a row to delete
+    setup: Optional[Callable[[dict], None]] = None
+    skip: Optional[str] = None
+
+
+def _insert_project(fx: dict, key: str, status: str = models.PENDING_STATUS):
+    with SessionLocal() as db:
+        fx[key] = db.scalar(insert(models.Project).values(
+            name="budget", description="budget", target_amount=1000.0,
+            image_url=fx["image_path"], pdf_document_path=fx["proof_path"],
+            founder_id=fx["founder_id"], deadline=datetime.utcnow() + timedelta(days=30),
+            status=status, fundsRaised=0.0, fanout_on_read=False,
+        ).returning(models.Project.id))
+        db.commit()
+
+
+def _attach_campaign(fx: dict):
+    """A campaign under the founder about to be deleted, backed by every investor, with an update."""
+    _insert_project(fx, "founder_project_id")
+    with SessionLocal() as db:
+        project_id = fx["founder_project_id"]
+        db.query(models.Project).filter(models.Project.id == project_id).update(
+            {models.Project.founder_id: fx["new_founder_id"]})
+        investor_ids = list(db.scalars(select(models.Investor.id)))
+        now = datetime.utcnow()
+        db.execute(insert(models.Investment), [
+            {"amount": 10.0, "investor_id": investor_id, "project_id": project_id,
+             "created_at": now, "payment_status": "succeeded"}
+            for investor_id in investor_ids
+        ])
+        series.record_funding(db, project_id, now, 10.0 * len(investor_ids), len(investor_ids))
+        update_id = db.scalar(insert(models.Update).values(
+            title="Budget", content="Budget", project_id=project_id, created_at=now,
+        ).returning(models.Update.id))
+        db.execute(insert(models.TimelineEntry), [
+            {"investor_id": investor_id, "update_id": update_id, "project_id": project_id}
+            for investor_id in investor_ids
+        ])
+        db.commit()
+
+
+def _back_campaigns(fx: dict):
+    """Investments by the investor about to be deleted in every live campaign, an hour apart."""
+    with SessionLocal() as db:
+        project_ids = list(db.scalars(select(models.Project.id).where(models.Project.status == models.LIVE_STATUS)))
+        now = datetime.utcnow()
+        db.execute(insert(models.Investment), [
+            {"amount": 10.0, "investor_id": fx["new_investor_id"], "project_id": project_id,
+             "created_at": now - timedelta(hours=i), "payment_status": "succeeded"}
+            for i, project_id in enumerate(project_ids)
+        ])
+        for i, project_id in enumerate(project_ids):
+            series.record_funding(db, project_id, now - timedelta(hours=i), 10.0, 1)
+        db.query(models.Project).filter(models.Project.id.in_(project_ids)).update(
+            {models.Project.fundsRaised: models.Project.fundsRaised + 10.0}, synchronize_session=False)
+        db.commit()
+
+
+def _capture_id(key: str):
+    def capture(fx: dict, response: httpx.Response):
+        fx[key] = response.json()["id"]
+    return capture
+
+
+def _campaign_form(fx: dict) -> dict:
+    return {
+        "params": {"founder_id": fx["founder_id"]},
+        "data": {
+            "campaignTitle": "Budget campaign", "campaignDescription": "d", "campaignCategory": "tech",
+            "targetAmount": "1000", "fundingType": "equity",
+            "deadline": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+            "minInvestment": "10", "email": "budget@bench.example.com", "address": "a", "phone": "1",
+        },
+        "files": {
+            "proofOfEligibility": ("proof.pdf", b"%PDF-1.4", "application/pdf"),
+            "campaignImage": ("image.png", seed.PNG_BYTES, "image/png"),
+        },
+    }
+
+
+def _unique_email(prefix: str) -> str:
+    return f"{prefix}-{datetime.utcnow().timestamp():.6f}@{seed.EMAIL_DOMAIN}"
+
+
+# Keyed on "METHOD /route/template", in the order they run
+BUDGETS: dict[str, Budget] = {
+    "POST /token": Budget(
+        1, lambda fx: ("POST", "/token", {"data": {
+            "username": fx["founder_email"], "password": "wrong", "client_id": "founder"}}),
+        expect=(400,)),
+    "POST /signin": Budget(
+        1, lambda fx: ("POST", "/signin", {"json": {"email": fx["founder_email"], "password": seed.PASSWORD}})),
+
+    "GET /founders": Budget(1, lambda fx: ("GET", "/founders", {})),
+    "GET /founders/{founder_id}": Budget(1, lambda fx: ("GET", f"/founders/{fx['founder_id']}", {})),
+    "POST /founders": Budget(
+        3, lambda fx: ("POST", "/founders", {"json": {
+            "fullName": "Budget", "email": _unique_email("founder"), "password": "password"}}),
+        expect=(201,), capture=_capture_id("new_founder_id")),
+    "PUT /founders/{founder_id}": Budget(
+        3, lambda fx: ("PUT", f"/founders/{fx['new_founder_id']}", {"json": {"name": "Renamed"}})),
+    "DELETE /founders/{founder_id}": Budget(
+        11, lambda fx: ("DELETE", f"/founders/{fx['new_founder_id']}", {}), expect=(204,),
+        setup=_attach_campaign),
+
+    "GET /investors": Budget(1, lambda fx: ("GET", "/investors", {})),
+    "GET /investors/{investor_id}": Budget(1, lambda fx: ("GET", f"/investors/{fx['investor_id']}", {})),
+    "POST /investors": Budget(
+        3, lambda fx: ("POST", "/investors", {"json": {
+            "fullName": "Budget", "email": _unique_email("investor"), "password": "password"}}),
+        expect=(201,), capture=_capture_id("new_investor_id")),
+    "PUT /investors/{investor_id}": Budget(
+        3, lambda fx: ("PUT", f"/investors/{fx['new_investor_id']}", {"json": {"fullName": "Renamed"}})),
+    "DELETE /investors/{investor_id}": Budget(
+        9, lambda fx: ("DELETE", f"/investors/{fx['new_investor_id']}", {}), expect=(204,),
+        setup=_back_campaigns),
+
+    "GET /campaigns": Budget(2, lambda fx: ("GET", "/campaigns", {})),
+    "GET /campaigns/trending": Budget(0, lambda fx: ("GET", "/campaigns/trending", {})),
+    "GET /campaigns/most-funded": Budget(0, lambda fx: ("GET", "/campaigns/most-funded", {})),
+    "GET /campaigns/closing-soon": Budget(0, lambda fx: ("GET", "/campaigns/closing-soon", {})),
+    "GET /campaigns/{project_id}": Budget(2, lambda fx: ("GET", f"/campaigns/{fx['project_id']}", {})),
+    "GET /campaigns/{project_id}/stream": Budget(
+        1, lambda fx: ("GET", f"/campaigns/{fx['project_id']}/stream", {}),
+        skip="never-ending SSE response; one SELECT for the initial snapshot"),
+    "GET /campaigns/{project_id}/funding-series": Budget(
+        2, lambda fx: ("GET", f"/campaigns/{fx['project_id']}/funding-series",
+                       {"params": {"founder_id": fx["founder_id"]}})),
+    "POST /campaigns": Budget(
+        5, lambda fx: ("POST", "/campaigns", _campaign_form(fx)), expect=(201,)),
+    "POST /uploads": Budget(
+        2, lambda fx: ("POST", "/uploads", {
+            "params": {"founder_id": fx["founder_id"]}, "json": {"filename": "budget.bin", "size": 4}}),
+        expect=(201,), capture=_capture_id("upload_id")),
+    "GET /uploads/{upload_id}": Budget(
+        1, lambda fx: ("GET", f"/uploads/{fx['upload_id']}", {"params": {"founder_id": fx["founder_id"]}})),
+    "PATCH /uploads/{upload_id}": Budget(
+        2, lambda fx: ("PATCH", f"/uploads/{fx['upload_id']}", {
+            "params": {"founder_id": fx["founder_id"]}, "content": b"data", "headers": {"Upload-Offset": "0"}})),
+    "POST /uploads/{upload_id}/finalize": Budget(
+        2, lambda fx: ("POST", f"/uploads/{fx['upload_id']}/finalize", {"params": {"founder_id": fx["founder_id"]}})),
+    "DELETE /uploads/{upload_id}": Budget(
+        2, lambda fx: ("DELETE", f"/uploads/{fx['upload_id']}", {"params": {"founder_id": fx["founder_id"]}}),
+        expect=(204,)),
+    "PUT /campaigns/{project_id}": Budget(
+        3, lambda fx: ("PUT", f"/campaigns/{fx['scratch_project_id']}", {"json": {"name": "Renamed"}}),
+        setup=lambda fx: _insert_project(fx, "scratch_project_id")),
+    "DELETE /campaigns/{project_id}": Budget(
+        8, lambda fx: ("DELETE", f"/campaigns/{fx['scratch_project_id']}", {}), expect=(204,)),
+    "GET /moderation/campaigns": Budget(
+        2, lambda fx: ("GET", "/moderation/campaigns", {"params": {"token": ADMIN_CREATION_TOKEN}})),
+    "POST /moderation/campaigns/transition": Budget(
+        3, lambda fx: ("POST", "/moderation/campaigns/transition",
+                       {"params": {"token": ADMIN_CREATION_TOKEN},
+                        "json": {"ids": [fx["pending_project_id"]], "action": "approve"}}),
+        setup=lambda fx: _insert_project(fx, "pending_project_id")),
+    "GET /campaigns/{project_id}/pdf": Budget(1, lambda fx: ("GET", f"/campaigns/{fx['project_id']}/pdf", {})),
+
+    "GET /investments": Budget(
+        1, lambda fx: ("GET", "/investments", {"params": {"investor_id": fx["investor_id"]}})),
+    "GET /investments/{investment_id}": Budget(
+        1, lambda fx: ("GET", f"/investments/{fx['investment_id']}", {})),
+    "POST /investments": Budget(
+        7, lambda fx: ("POST", "/investments", {
+            "params": {"investor_id": fx["investor_id"]},
+            "json": {"project_id": fx["project_id"], "amount": 10.0}}),
+        expect=(201,), capture=_capture_id("new_investment_id")),
+    "PUT /investments/{investment_id}": Budget(
+        6, lambda fx: ("PUT", f"/investments/{fx['new_investment_id']}", {"json": {"amount": 20.0}})),
+    "DELETE /investments/{investment_id}": Budget(
+        6, lambda fx: ("DELETE", f"/investments/{fx['new_investment_id']}", {}), expect=(204,)),
+    "GET /investor/investments": Budget(
+        1, lambda fx: ("GET", "/investor/investments", {"params": {"investor_id": fx["investor_id"]}})),
+    "POST /webhooks/stripe": Budget(
+        1, lambda fx: ("POST", "/webhooks/stripe", {"json": {
+            "id": f"evt_budget_{datetime.utcnow().timestamp()}", "type": "payment_intent.succeeded",
+            "created": 0, "data": {"object": {"id": "pi_budget", "metadata": {}}}}})),
+
+    "GET /updates": Budget(1, lambda fx: ("GET", "/updates", {})),
+    "GET /updates/{update_id}": Budget(1, lambda fx: ("GET", f"/updates/{fx['update_id']}", {})),
+    "POST /updates": Budget(
+        5, lambda fx: ("POST", "/updates", {
+            "params": {"founder_id": fx["founder_id"]},
+            "json": {"project_id": fx["project_id"], "title": "Budget", "content": "Budget update"}}),
+        expect=(201,), capture=_capture_id("new_update_id")),
+    "PUT /updates/{update_id}": Budget(
+        3, lambda fx: ("PUT", f"/updates/{fx['new_update_id']}", {
+            "params": {"founder_id": fx["founder_id"]}, "json": {"content": "Edited"}})),
+    "DELETE /updates/{update_id}": Budget(
+        3, lambda fx: ("DELETE", f"/updates/{fx['new_update_id']}", {"params": {"founder_id": fx["founder_id"]}}),
+        expect=(204,)),
+    "GET /project/{project_id}/updates": Budget(
+        2, lambda fx: ("GET", f"/project/{fx['project_id']}/updates", {"params": {"investor_id": fx["investor_id"]}})),
+
+    "GET /investor/portfolio": Budget(
+        2, lambda fx: ("GET", "/investor/portfolio", {"params": {"investor_id": fx["investor_id"]}})),
+    "GET /investor/recommendations": Budget(
+        3, lambda fx: ("GET", "/investor/recommendations", {"params": {"investor_id": fx["investor_id"]}})),
+    "GET /investor/feed": Budget(
+        1, lambda fx: ("GET", "/investor/feed", {"params": {"investor_id": fx["investor_id"]}})),
+
+    "POST /admins": Budget(
+        3, lambda fx: ("POST", "/admins", {
+            "params": {"token": ADMIN_CREATION_TOKEN},
+            "json": {"email": _unique_email("admin"), "password": "password"}}),
+        capture=_capture_id("admin_id")),
+    "GET /admins": Budget(1, lambda fx: ("GET", "/admins", {})),
+    "GET /admins/{admin_id}": Budget(1, lambda fx: ("GET", f"/admins/{fx['admin_id']}", {})),
+    "PUT /admins/{admin_id}": Budget(
+        4, lambda fx: ("PUT", f"/admins/{fx['admin_id']}", {"json": {"email": _unique_email("admin")}})),
+    "DELETE /admins/{admin_id}": Budget(
+        2, lambda fx: ("DELETE", f"/admins/{fx['admin_id']}", {}), expect=(204,)),
+
+    "GET /ready": Budget(0, lambda fx: ("GET", "/ready", {})),
+    "GET /metrics": Budget(0, lambda fx: ("GET", "/metrics", {})),
+    "POST /admin/profiles/sign": Budget(
+        0, lambda fx: ("POST", "/admin/profiles/sign", {"params": {"token": ADMIN_CREATION_TOKEN}}),
+        expect=(200, 409)),
+    "GET /admin/profiles": Budget(0, lambda fx: ("GET", "/admin/profiles", {"params": {"token": ADMIN_CREATION_TOKEN}})),
+    "GET /admin/profiles/flamegraph": Budget(
+        0, lambda fx: ("GET", "/admin/profiles/flamegraph", {"params": {"token": ADMIN_CREATION_TOKEN, "route": "/none"}}),
+        expect=(404,)),
+    "DELETE /admin/profiles": Budget(
+        0, lambda fx: ("DELETE", "/admin/profiles", {"params": {"token": ADMIN_CREATION_TOKEN, "route": "/none"}}),
+        expect=(204,)),
+}
+
+
+def route_keys(app) -> list[str]:
+    """"METHOD /template" for every endpoint; the docs pages and the /static mount are not APIRoutes."""
+    keys = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        for method in sorted(route.methods - {"HEAD"}):
+            keys.append(f"{method} {route.path}")
+    return keys
+
+
+def pick_fixtures() -> dict:
+    """A live campaign with an investment, its founder and investor, and one of its updates."""
+    with SessionLocal() as db:
+        investment = db.execute(
+            select(models.Investment)
+            .join(models.Project, models.Project.id == models.Investment.project_id)
+            .where(models.Project.status == models.LIVE_STATUS)
+            .order_by(models.Investment.id)
+            .limit(1)
+        ).scalar_one()
+        project = db.get(models.Project, investment.project_id)
+        update = db.scalar(select(models.Update).where(models.Update.project_id == project.id).limit(1))
+        if update is None:
+            update = models.Update(title="Budget", content="Budget", project_id=project.id)
+            db.add(update)
+            db.commit()
+        founder = db.get(models.Founder, project.founder_id)
+        return {
+            "project_id": project.id,
+            "founder_id": founder.id,
+            "founder_email": founder.email,
+            "investor_id": investment.investor_id,
+            "investment_id": investment.id,
+            "update_id": update.id,
+            "image_path": project.image_url,
+            "proof_path": project.pdf_document_path,
+        }
+
+
+def grow_fixtures(fx: dict, rows: int):
+    """More investments, updates and timeline entries on the fixture rows themselves."""
+    with SessionLocal() as db:
+        investor_ids = list(db.scalars(select(models.Investor.id).limit(rows)))
+        now = datetime.utcnow()
+        db.execute(insert(models.Investment), [
+            {"amount": 10.0, "investor_id": investor_id, "project_id": fx["project_id"],
+             "created_at": now - timedelta(hours=i), "payment_status": "succeeded"}
+            for i, investor_id in enumerate(investor_ids)
+        ] + [
+            {"amount": 10.0, "investor_id": fx["investor_id"], "project_id": project_id,
+             "created_at": now, "payment_status": "succeeded"}
+            for project_id in db.scalars(select(models.Project.id).where(
+                models.Project.status == models.LIVE_STATUS).limit(rows))
+        ])
+        update_ids = []
+        for i in range(rows):
+            update_ids.append(db.scalar(insert(models.Update).values(
+                title=f"Growth {i}", content="Growth", project_id=fx["project_id"], created_at=now,
+            ).returning(models.Update.id)))
+        db.execute(insert(models.TimelineEntry), [
+            {"investor_id": fx["investor_id"], "update_id": update_id, "project_id": fx["project_id"]}
+            for update_id in update_ids
+        ])
+        db.commit()
+
+
+async def run_cases(client: httpx.AsyncClient, recorder: StatementRecorder, fx: dict) -> dict[str, dict]:
+    results = {}
+    for key, budget in BUDGETS.items():
+        if budget.skip:
+            continue
+        if budget.setup is not None:
+            budget.setup(fx)
+        method, url, kwargs = budget.request(fx)
+        if method == "GET":
+            # Warm per-process caches, so the recorded request is the steady-state one
+            await client.request(method, url, **kwargs)
+        portfolio.portfolio_cache.clear()
+        listing.cache.bump()
+        recorder.start()
+        response = await client.request(method, url, **kwargs)
+        statements = recorder.stop()
+        if budget.capture is not None and response.status_code in budget.expect:
+            budget.capture(fx, response)
+        results[key] = {"status": response.status_code, "statements": statements}
+    return results
+
+
+def _format_statements(statements: list[str], width: int = 160) -> str:
+    lines = []
+    for statement, count in Counter(statements).most_common():
+        text = statement if len(statement) <= width else statement[:width - 3] + "..."
+        lines.append(f"      {count:>4} x {text}")
+    return "\n".join(lines)
+
+
+def check(app_keys: list[str], small: dict, large: dict) -> list[str]:
+    failures = []
+    for key in app_keys:
+        if key not in BUDGETS:
+            failures.append(f"{key}: no budget declared in benchmarks/query_budget.py")
+    for key, budget in BUDGETS.items():
+        if budget.skip:
+            continue
+        if key not in app_keys:
+            failures.append(f"{key}: budget declared for a route that no longer exists")
+            continue
+        for label, result in (("small", small[key]), ("large", large[key])):
+            if result["status"] not in budget.expect:
+                failures.append(
+                    f"{key}: status {result['status']} on the {label} dataset, expected {budget.expect}")
+            count = len(result["statements"])
+            if count > budget.max_statements:
+                failures.append(
+                    f"{key}: {count} statements on the {label} dataset, budget {budget.max_statements}\n"
+                    + _format_statements(result["statements"]))
+        small_count, large_count = len(small[key]["statements"]), len(large[key]["statements"])
+        if large_count != small_count:
+            failures.append(
+                f"{key}: statement count grew with the data ({small_count} -> {large_count})\n"
+                + _format_statements(large[key]["statements"]))
+    return failures
+
+
+async def main_async(args) -> int:
+    from app.main import app
+
+    with SessionLocal() as db:
+        if db.scalar(select(func.count()).select_from(models.Project)) and not args.allow_existing:
+            print("The database already has campaigns; point DATABASE_URL at an empty scratch database "
+                  "or pass --allow-existing.", file=sys.stderr)
+            return 2
+    recorder = StatementRecorder()
+    seed.seed(**SMALL, seed=args.seed)
+    fx = pick_fixtures()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+            small = await run_cases(client, recorder, fx)
+            seed.seed(**GROWTH, seed=args.seed + 1)
+            grow_fixtures(fx, FIXTURE_GROWTH)
+            large = await run_cases(client, recorder, fx)
+
+    failures = check(route_keys(app), small, large)
+    for key, budget in BUDGETS.items():
+        if budget.skip:
+            print(f"  skip  {key}: {budget.skip}")
+        elif key in small:
+            counts = f"{len(small[key]['statements'])}/{len(large[key]['statements'])}"
+            print(f"  {counts:>5}  {key} (budget {budget.max_statements})")
+    if failures:
+        print(f"\n{len(failures)} query budget failure(s):", file=sys.stderr)
+        for failure in failures:
+            print("  " + failure, file=sys.stderr)
+        return 1
+    print("\nAll routes within their query budgets.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--allow-existing", action="store_true",
+                        help="run even if the database already has data")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Fill the database at DATABASE_URL with synthetic founders, investors,
+campaigns, investments and updates for benchmarking.
+
+Rows go in through multi-row INSERTs in chunks, not the ORM, so a
+100k-investment dataset loads in seconds. Totals the API normally keeps in
+step (Project.fundsRaised, funding rollups, fanned-out timelines) are
+computed here and written alongside. The same --seed always produces the
+same data, and seeding an already seeded database adds to it. Every
+user's password is "password" and emails look like
+founder17@bench.example.com / investor42@bench.example.com.
+
+    alembic upgrade head
+    python -m benchmarks.seed --projects 2000 --investments 100000
+"""
+import argparse
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from app import models, series, utils
+from app.config import STATIC_FILES_DIR
+from app.database import SessionLocal, dialect_insert
+
+PASSWORD = "password"
+EMAIL_DOMAIN = "bench.example.com"
+IMAGE_NAME = "bench_image.png"
+PROOF_NAME = "bench_proof.pdf"
+CATEGORIES = ["tech", "health", "education", "energy", "finance", "food", "retail", "media"]
+FUNDING_TYPES = ["equity", "debt", "donation", "reward"]
+WORDS = (
+    "market growth team product launch customer revenue platform scale pilot "
+    "partner seed round traction impact community data mobile cloud supply"
+).split()
+
+# A 1x1 PNG, so /static serves a real image
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _insert(db, model, rows: list[dict], chunk: int) -> list[int]:
+    """Insert `rows` and return the new ids in insertion order."""
+    table = model.__table__
+    before = db.scalar(select(func.coalesce(func.max(table.c.id), 0)))
+    for start in range(0, len(rows), chunk):
+        db.execute(insert(table), rows[start:start + chunk])
+    return list(db.scalars(select(table.c.id).where(table.c.id > before).order_by(table.c.id)))
+
+
+def _placeholder_files() -> tuple[str, str]:
+    os.makedirs(STATIC_FILES_DIR, exist_ok=True)
+    image_path = os.path.join(STATIC_FILES_DIR, IMAGE_NAME)
+    proof_path = os.path.join(STATIC_FILES_DIR, PROOF_NAME)
+    with open(image_path, "wb") as image:
+        image.write(PNG_BYTES)
+    with open(proof_path, "wb") as proof:
+        proof.write(b"%PDF-1.4\n" + b"0" * 2048 + b"\n%%EOF\n")
+    return image_path, proof_path
+
+
+def seed(founders: int, investors: int, projects: int, investments: int, updates: int,
+         seed: int = 1, chunk: int = 5000) -> dict:
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    password = utils.hash_password(PASSWORD)
+    image_path, proof_path = _placeholder_files()
+    timings = {}
+
+    with SessionLocal() as db:
+        # Number past existing rows, so seeding again adds more data instead of clashing on emails
+        first_founder, first_investor, first_project = (
+            db.scalar(select(func.count()).select_from(model))
+            for model in (models.Founder, models.Investor, models.Project)
+        )
+        started = time.perf_counter()
+        founder_ids = _insert(db, models.Founder, [
+            {
+                "name": f"Founder {i}",
+                "email": f"founder{i}@{EMAIL_DOMAIN}",
+                "password": password,
+                "companyName": f"Company {i}",
+                "industry": rng.choice(CATEGORIES),
+                "role": "founder",
+            }
+            for i in range(first_founder, first_founder + founders)
+        ], chunk)
+        investor_ids = _insert(db, models.Investor, [
+            {
+                "name": f"Investor {i}",
+                "email": f"investor{i}@{EMAIL_DOMAIN}",
+                "password": password,
+                "investmentFocus": rng.choice(CATEGORIES),
+                "investmentBudget": str(rng.choice([1000, 10000, 100000])),
+                "investmentSector": rng.choice(CATEGORIES),
+                "investmentExperience": rng.choice(["none", "some", "expert"]),
+                "role": "investor",
+            }
+            for i in range(first_investor, first_investor + investors)
+        ], chunk)
+        timings["users"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        project_rows = []
+        for i in range(first_project, first_project + projects):
+            title = f"{_text(rng, 3)[:-1]} {i}"
+            project_rows.append({
+                "name": title,
+                "description": _text(rng, 150),
+                "target_amount": float(rng.choice([10000, 50000, 100000, 500000])),
+                "image_url": image_path,
+                "pdf_document_path": proof_path,
+                "founder_id": rng.choice(founder_ids),
+                "deadline": now + timedelta(days=rng.randint(1, 90)),
+                "fundingType": rng.choice(FUNDING_TYPES),
+                "minInvestment": rng.choice([10, 100, 1000]),
+                "email": f"campaign{i}@{EMAIL_DOMAIN}",
+                "address": f"{i} Bench Street",
+                "phone": f"+1555{i:07d}",
+                "personalizedMessage": _text(rng, 30),
+                "motivationLetter": _text(rng, 80),
+                "campaignCategory": rng.choice(CATEGORIES),
+                "campaignDescription": _text(rng, 60),
+                "campaignTitle": title,
+                "status": rng.choices(
+                    [models.LIVE_STATUS, models.PENDING_STATUS, models.REJECTED_STATUS], [80, 15, 5])[0],
+                "fundsRaised": 0.0,
+                "fanout_on_read": False,
+            })
+        project_ids = _insert(db, models.Project, project_rows, chunk)
+        timings["projects"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        investment_rows = []
+        funds = defaultdict(float)
+        rollups = defaultdict(lambda: [0.0, 0])
+        backers = defaultdict(set)
+        for _ in range(investments):
+            project_id = rng.choice(project_ids)
+            investor_id = rng.choice(investor_ids)
+            amount = float(rng.choice([10, 25, 50, 100, 250, 1000, 5000]))
+            created_at = now - timedelta(seconds=rng.randint(0, 30 * 86400))
+            investment_rows.append({
+                "amount": amount,
+                "investor_id": investor_id,
+                "project_id": project_id,
+                "created_at": created_at,
+                "payment_status": "succeeded",
+            })
+            funds[project_id] += amount
+            backers[project_id].add(investor_id)
+            for granularity in series.GRANULARITIES:
+                bucket = rollups[(project_id, granularity, series.truncate(created_at, granularity))]
+                bucket[0] += amount
+                bucket[1] += 1
+        _insert(db, models.Investment, investment_rows, chunk)
+        project_table = models.Project.__table__
+        totals = [{"project_id": project_id, "funds": amount} for project_id, amount in funds.items()]
+        for start in range(0, len(totals), chunk):
+            db.execute(
+                update(project_table)
+                .where(project_table.c.id == bindparam("project_id"))
+                .values(fundsRaised=func.coalesce(project_table.c.fundsRaised, 0.0) + bindparam("funds")),
+                totals[start:start + chunk],
+            )
+        rollup_rows = [
+            {"project_id": project_id, "granularity": granularity, "bucket": bucket, "amount": amount, "count": count}
+            for (project_id, granularity, bucket), (amount, count) in rollups.items()
+        ]
+        rollup = models.FundingRollup.__table__
+        for start in range(0, len(rollup_rows), chunk):
+            stmt = dialect_insert(db, rollup)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[rollup.c.project_id, rollup.c.granularity, rollup.c.bucket],
+                set_={"amount": rollup.c.amount + stmt.excluded.amount, "count": rollup.c.count + stmt.excluded.count},
+            )
+            db.execute(stmt, rollup_rows[start:start + chunk])
+        timings["investments"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        update_rows = []
+        for _ in range(updates):
+            update_rows.append({
+                "title": _text(rng, 4),
+                "content": _text(rng, 120),
+                "created_at": now - timedelta(seconds=rng.randint(0, 30 * 86400)),
+                "project_id": rng.choice(project_ids),
+            })
+        update_ids = _insert(db, models.Update, update_rows, chunk)
+        timeline_rows = [
+            {"investor_id": investor_id, "update_id": update_id, "project_id": row["project_id"]}
+            for update_id, row in zip(update_ids, update_rows)
+            for investor_id in backers.get(row["project_id"], ())
+        ]
+        _insert(db, models.TimelineEntry, timeline_rows, chunk)
+        timings["updates"] = time.perf_counter() - started
+
+        db.commit()
+
+    return {
+        "rows": {
+            "founders": len(founder_ids),
+            "investors": len(investor_ids),
+            "projects": len(project_ids),
+            "investments": len(investment_rows),
+            "funding_rollups": len(rollup_rows),
+            "updates": len(update_ids),
+            "timeline_entries": len(timeline_rows),
+        },
+        "seconds": timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--founders", type=int, default=200)
+    parser.add_argument("--investors", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--investments", type=int, default=20000)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chunk", type=int, default=5000, help="rows per INSERT batch")
+    args = parser.parse_args()
+    report = seed(args.founders, args.investors, args.projects, args.investments, args.updates,
+                  seed=args.seed, chunk=args.chunk)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
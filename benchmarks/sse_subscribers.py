@@ -0,0 +1,219 @@
+"""
+Hold many idle Server-Sent Events subscribers open against one uvicorn
+worker and measure what they cost and how fast a funding change reaches
+all of them.
+
+Starts `uvicorn app.main:app` on a local port, opens --subscribers streams
+on GET /campaigns/{id}/stream spread over --campaigns live campaigns, and
+waits for each one's initial snapshot. With everyone connected it samples
+the worker's resident memory and the latency of an ordinary request, then
+makes --publishes investments through POST /investments and times each
+event's delivery to every subscriber of that campaign. Seed the database
+first (python -m benchmarks.seed).
+
+    python -m benchmarks.sse_subscribers --subscribers 10000 --output sse.json
+
+Subscribers are raw sockets rather than HTTP client objects, so the client
+side stays small enough to hold 10k connections in one process. The exit
+status is 1 if a subscriber failed to connect or missed an event.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.load import BENCH_ENV, _free_port, load_fixtures, percentile  # noqa: F401  (BENCH_ENV sets the env)
+
+import httpx  # noqa: E402
+
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class Subscriber:
+    """One SSE connection; records when each funding event (after the first snapshot) arrives."""
+
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.received: list[float] = []
+        self.ready = asyncio.Event()
+        self.writer = None
+        self.task = None
+
+    async def connect(self, port: int, timeout: float):
+        reader, self.writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+        self.writer.write(
+            f"GET /campaigns/{self.project_id}/stream HTTP/1.1\r\nHost: bench\r\n"
+            "Accept: text/event-stream\r\n\r\n".encode())
+        await self.writer.drain()
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        if b" 200 " not in status:
+            raise RuntimeError(f"stream returned {status.decode().strip()}")
+        self.task = asyncio.create_task(self._read(reader))
+        await asyncio.wait_for(self.ready.wait(), timeout)
+
+    async def _read(self, reader: asyncio.StreamReader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"event: funding"):
+                if self.ready.is_set():
+                    self.received.append(time.perf_counter())
+                else:
+                    self.ready.set()
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def open_subscribers(port: int, project_ids: list[int], count: int, concurrency: int,
+                           timeout: float) -> tuple[list[Subscriber], list[str], float]:
+    subscribers = [Subscriber(project_ids[i % len(project_ids)]) for i in range(count)]
+    errors: list[str] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def connect(subscriber: Subscriber):
+        async with slots:
+            try:
+                await subscriber.connect(port, timeout)
+            except (OSError, RuntimeError, asyncio.TimeoutError) as exc:
+                errors.append(f"{type(exc).__name__}: {exc}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*[connect(subscriber) for subscriber in subscribers])
+    return subscribers, errors, time.perf_counter() - started
+
+
+async def publish_rounds(client: httpx.AsyncClient, subscribers: list[Subscriber], fixtures: dict,
+                         project_ids: list[int], rounds: int, settle: float) -> dict:
+    latencies: list[float] = []
+    missed = 0
+    for i in range(rounds):
+        project_id = project_ids[i % len(project_ids)]
+        audience = [s for s in subscribers if s.project_id == project_id and s.ready.is_set()]
+        before = {id(s): len(s.received) for s in audience}
+        started = time.perf_counter()
+        response = await client.post("/investments", params={"investor_id": fixtures["investor_ids"][0]},
+                                     json={"project_id": project_id, "amount": 1.0})
+        response.raise_for_status()
+        # Past the coalescing interval, so every round is delivered as its own event
+        await asyncio.sleep(settle)
+        for subscriber in audience:
+            if len(subscriber.received) > before[id(subscriber)]:
+                latencies.append(subscriber.received[before[id(subscriber)]] - started)
+            else:
+                missed += 1
+    latencies.sort()
+    return {
+        "rounds": rounds,
+        "deliveries": len(latencies),
+        "missed": missed,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0.0,
+        },
+    }
+
+
+async def run(args, fixtures: dict) -> dict:
+    project_ids = fixtures["project_ids"][:args.campaigns]
+    port = args.port or _free_port()
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        "--timeout-keep-alive", "600", "--timeout-graceful-shutdown", "5",
+    ])
+    subscribers: list[Subscriber] = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                if server.poll() is not None:
+                    raise SystemExit(f"uvicorn exited with status {server.returncode}")
+                try:
+                    if (await client.get("/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise SystemExit("uvicorn did not become ready within 60s")
+                await asyncio.sleep(0.2)
+
+            idle_rss = rss_bytes(server.pid)
+            subscribers, errors, connect_seconds = await open_subscribers(
+                port, project_ids, args.subscribers, args.connect_concurrency, args.timeout)
+            connected = sum(1 for s in subscribers if s.ready.is_set())
+            loaded_rss = rss_bytes(server.pid)
+
+            started = time.perf_counter()
+            (await client.get(f"/campaigns/{project_ids[0]}")).raise_for_status()
+            request_ms = (time.perf_counter() - started) * 1000
+
+            fanout = await publish_rounds(client, subscribers, fixtures, project_ids, args.publishes, args.settle)
+            return {
+                "subscribers": args.subscribers,
+                "connected": connected,
+                "connect_errors": errors[:10],
+                "connect_seconds": connect_seconds,
+                "server_rss_mb": {"idle": idle_rss / 2**20, "with_subscribers": loaded_rss / 2**20},
+                "server_kb_per_subscriber": (loaded_rss - idle_rss) / 1024 / connected if connected else None,
+                "request_ms_with_subscribers": request_ms,
+                "fanout": fanout,
+            }
+    finally:
+        for subscriber in subscribers:
+            subscriber.close()
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--campaigns", type=int, default=20, help="live campaigns the subscribers are spread over")
+    parser.add_argument("--publishes", type=int, default=20, help="investments made while everyone listens")
+    parser.add_argument("--settle", type=float, default=1.0,
+                        help="seconds to wait for delivery after each investment")
+    parser.add_argument("--connect-concurrency", type=int, default=500)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    # Every subscriber is a descriptor here and in the server
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < args.subscribers + 1024 <= hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (args.subscribers + 1024, hard))
+
+    report = asyncio.run(run(args, load_fixtures()))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    if report["connected"] < args.subscribers or report["fanout"]["missed"]:
+        print(f"{args.subscribers - report['connected']} subscribers failed to connect, "
+              f"{report['fanout']['missed']} deliveries missed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Import-to-ready time for the API.
+
+Each run starts a fresh interpreter, imports app.main and runs the lifespan
+startup (pool warm-up, rankings load, job runner) until the app reports
+ready, so import costs are measured cold every time. Needs a migrated
+database at DATABASE_URL.
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def main():
+    async with app.router.lifespan_context(app):
+        assert app.state.ready
+        return time.perf_counter()
+
+ready = asyncio.run(main())
+print(json.dumps({"import": imported - started, "startup": ready - imported, "total": ready - started}))
+"""
+
+
+def run_once() -> dict:
+    result = subprocess.run([sys.executable, "-c", CHILD], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "min": min(samples),
+        "p50": statistics.median(samples),
+        "max": max(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write the report here as well as to stdout")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "seconds": {phase: summarize([run[phase] for run in runs]) for phase in ("import", "startup", "total")},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Bytes on the wire and latency for serving uploaded documents, first view
+against repeat views.
+
+Writes a synthetic proof document of --size bytes into STATIC_FILES_DIR,
+runs the upload processors on it as the process_upload job would
+(checksum sidecar, gzip/brotli siblings) and then fetches it through the
+app in-process, the way a browser does:
+
+  first view          no validators, identity encoding (what every view cost before)
+  first view, br/gzip  Accept-Encoding as browsers send it
+  repeat view          If-None-Match with the ETag of the variant received first
+  repeat view by date  If-Modified-Since only
+  resume at 50%        Range with If-Range, as a download manager resumes
+
+Every response is also checked: decoded siblings and ranges must equal the
+original bytes and 304s must be empty. The exit status is 1 if any check
+fails. Pass --project-id to measure GET /campaigns/{id}/pdf of an existing
+campaign as well; both routes serve through app.static_files.
+
+    python -m benchmarks.static --size 3000000 --requests 50
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SQL_ECHO", "false")
+
+import httpx  # noqa: E402
+
+from app.config import STATIC_FILES_DIR  # noqa: E402
+from app import uploads  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BROWSER_ACCEPT_ENCODING = "gzip, deflate, br"
+WORDS = b"BT /F1 12 Tf 72 712 Td (Quarterly revenue grew across every market segment) Tj ET\n"
+
+
+def write_document(path: str, size: int, seed: int):
+    """Text-heavy content objects with a share of incompressible bytes, like a PDF with embedded images."""
+    rng = random.Random(seed)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        written = 9
+        while written < size:
+            if rng.random() < 0.3:
+                chunk = rng.randbytes(4096)
+            else:
+                chunk = WORDS * 48
+            chunk = chunk[:size - written]
+            f.write(chunk)
+            written += len(chunk)
+
+
+def _decode(body: bytes, encoding: str | None) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        return brotli.decompress(body) if brotli else body
+    return body
+
+
+async def fetch(client: httpx.AsyncClient, url: str, headers: dict) -> tuple[httpx.Response, bytes, float]:
+    started = time.perf_counter()
+    async with client.stream("GET", url, headers=headers) as response:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    return response, body, time.perf_counter() - started
+
+
+def scenarios(identity: httpx.Response, negotiated: httpx.Response, size: int) -> dict[str, dict]:
+    # A browser revalidates with the ETag of the variant it cached; a resumed download with the identity one
+    return {
+        "first view": {"accept-encoding": "identity"},
+        "first view, br/gzip": {"accept-encoding": BROWSER_ACCEPT_ENCODING},
+        "repeat view": {"accept-encoding": BROWSER_ACCEPT_ENCODING,
+                        "if-none-match": negotiated.headers.get("etag", "")},
+        "repeat view by date": {"accept-encoding": BROWSER_ACCEPT_ENCODING,
+                                "if-modified-since": negotiated.headers.get("last-modified", "")},
+        "resume at 50%": {"accept-encoding": BROWSER_ACCEPT_ENCODING, "range": f"bytes={size // 2}-",
+                          "if-range": identity.headers.get("etag", "")},
+    }
+
+
+def check(name: str, response: httpx.Response, body: bytes, original: bytes) -> list[str]:
+    problems = []
+    encoding = response.headers.get("content-encoding")
+    if name.startswith("repeat"):
+        if response.status_code != 304 or body:
+            problems.append(f"{name}: expected an empty 304, got {response.status_code} with {len(body)} bytes")
+    elif name.startswith("resume"):
+        expected = original[len(original) // 2:]
+        if response.status_code != 206 or encoding or body != expected:
+            problems.append(f"{name}: expected 206 with the identity tail, got {response.status_code}, "
+                            f"{len(body)} bytes, encoding {encoding}")
+    elif response.status_code != 200 or _decode(body, encoding) != original:
+        problems.append(f"{name}: status {response.status_code}, decoded body differs from the original")
+    if "etag" not in response.headers:
+        problems.append(f"{name}: no ETag")
+    return problems
+
+
+async def measure(client: httpx.AsyncClient, url: str, original: bytes, requests: int) -> tuple[dict, list[str]]:
+    identity, _, _ = await fetch(client, url, {"accept-encoding": "identity"})
+    negotiated, _, _ = await fetch(client, url, {"accept-encoding": BROWSER_ACCEPT_ENCODING})
+    results, problems = {}, []
+    for name, headers in scenarios(identity, negotiated, len(original)).items():
+        latencies = []
+        for _ in range(requests):
+            response, body, elapsed = await fetch(client, url, headers)
+            latencies.append(elapsed)
+        problems += check(name, response, body, original)
+        latencies.sort()
+        results[name] = {
+            "status": response.status_code,
+            "content_encoding": response.headers.get("content-encoding"),
+            "bytes": len(body),
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        }
+    return results, problems
+
+
+async def run(args) -> int:
+    from app.main import app
+
+    path = os.path.join(STATIC_FILES_DIR, "bench_static_document.pdf")
+    os.makedirs(STATIC_FILES_DIR, exist_ok=True)
+    write_document(path, args.size, args.seed)
+    for encoding in ("gz", "br"):
+        if os.path.exists(f"{path}.{encoding}"):
+            os.remove(f"{path}.{encoding}")
+    started = time.perf_counter()
+    uploads._process(path)
+    processing = time.perf_counter() - started
+    with open(path, "rb") as f:
+        original = f.read()
+
+    targets = {"/static": ("/static/" + os.path.basename(path), original)}
+    if args.project_id is not None:
+        from app import models
+        from app.database import SessionLocal
+        with SessionLocal() as db:
+            project = db.get(models.Project, args.project_id)
+            if project is None:
+                raise SystemExit(f"No campaign {args.project_id}")
+            pdf_path = project.pdf_document_path
+        if not os.path.exists(pdf_path + ".sha256"):
+            uploads._process(pdf_path)
+        with open(pdf_path, "rb") as f:
+            targets["/campaigns/{project_id}/pdf"] = (f"/campaigns/{args.project_id}/pdf", f.read())
+
+    report = {
+        "size": len(original),
+        "upload_processing_seconds": processing,
+        "siblings": {encoding: os.path.getsize(f"{path}.{encoding}")
+                     for encoding in ("br", "gz") if os.path.exists(f"{path}.{encoding}")},
+        "routes": {},
+    }
+    failures = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for route, (url, content) in targets.items():
+            report["routes"][route], problems = await measure(client, url, content, args.requests)
+            failures += [f"{route} {problem}" for problem in problems]
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        print("Checks failed:\n  " + "\n  ".join(failures), file=sys.stderr)
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=3_000_000, help="document size in bytes")
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--project-id", type=int, help="also measure this campaign's /pdf route")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Replay synthetic Stripe webhook events through POST /webhooks/stripe and
+the batch reconciler, then check the result.
+
+Seeds campaigns and investments, gives every investment a PaymentIntent
+and a payment lifecycle (succeeded, refunded after succeeding, failed,
+failed then retried, canceled), and builds the events Stripe would send
+for it. Some intent events carry no investment_id metadata and refunds
+never do, so both ways of matching an event are used. Redeliveries of
+random events and event types the reconciler ignores pad the stream to
+--events, which is then shuffled: Stripe guarantees neither order nor
+single delivery. Every event is POSTed signed, the inbox is drained by
+--reconcilers concurrent reconcile_batch loops, and the harness checks that:
+
+- the inbox holds each event id once, all processed, and each was applied
+  by exactly one reconciler
+- every investment ends in the status of its newest event
+- fundsRaised and the daily rollups of every campaign equal the sum of its
+  investments that still count
+
+Needs an empty, migrated database; it writes to it freely:
+
+    DATABASE_URL=sqlite:///./replay.db alembic upgrade head
+    DATABASE_URL=sqlite:///./replay.db python -m benchmarks.webhook_replay --events 100000
+
+Prints a JSON report; the exit status is 1 if any check failed.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Settings for the app under test; set before app is imported, explicit env wins
+REPLAY_ENV = {
+    "SQL_ECHO": "false",
+    "RUN_JOBS_IN_APP": "false",
+    "RANKINGS_REFRESH_SECONDS": "86400",
+    "STRIPE_WEBHOOK_SECRET": "whsec_replay",
+}
+for _name, _value in REPLAY_ENV.items():
+    os.environ.setdefault(_name, _value)
+
+import httpx  # noqa: E402
+from sqlalchemy import String, cast, func, literal, select, update  # noqa: E402
+
+from app import models, webhooks  # noqa: E402
+from app.config import STRIPE_WEBHOOK_SECRET  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from benchmarks import seed  # noqa: E402
+
+# name -> (weight, event types in the order Stripe creates them)
+LIFECYCLES = {
+    "succeeded": (60, ["payment_intent.succeeded"]),
+    "refunded": (10, ["payment_intent.succeeded", "charge.refunded"]),
+    "failed": (10, ["payment_intent.payment_failed"]),
+    "retried": (10, ["payment_intent.payment_failed", "payment_intent.succeeded"]),
+    "canceled": (10, ["payment_intent.canceled"]),
+}
+IGNORED_TYPES = ["customer.created", "payment_intent.created", "charge.succeeded"]
+# Share of padding that is redeliveries rather than ignored event types
+REDELIVERY_SHARE = 0.8
+# Share of intent events sent without investment_id metadata
+NO_METADATA_SHARE = 0.2
+
+
+def _intent_id(investment_id: int) -> str:
+    return f"pi_replay_{investment_id}"
+
+
+def build_events(investment_ids: list[int], total: int, rng: random.Random) -> tuple[list[dict], dict[int, str]]:
+    """The shuffled event stream, and the status each investment must end in."""
+    names = list(LIFECYCLES)
+    weights = [LIFECYCLES[name][0] for name in names]
+    base = int(time.time()) - 86400
+    stream, expected = [], {}
+    for investment_id in investment_ids:
+        types = LIFECYCLES[rng.choices(names, weights)[0]][1]
+        # A few minutes between steps, so the newest event is unambiguous
+        created = base + rng.randint(0, 3600)
+        for event_type in types:
+            created += rng.randint(60, 600)
+            if event_type.startswith("charge."):
+                obj = {"object": "charge", "payment_intent": _intent_id(investment_id)}
+            else:
+                obj = {"object": "payment_intent", "id": _intent_id(investment_id)}
+                if rng.random() >= NO_METADATA_SHARE:
+                    obj["metadata"] = {"investment_id": str(investment_id)}
+            stream.append({
+                "id": f"evt_{len(stream)}",
+                "type": event_type,
+                "created": created,
+                "data": {"object": obj},
+            })
+            expected[investment_id] = webhooks.EVENT_STATUS[event_type]
+    if len(stream) > total:
+        raise SystemExit(f"{len(stream)} lifecycle events already exceed --events {total}; use fewer --investments")
+    originals = list(stream)
+    while len(stream) < total:
+        if rng.random() < REDELIVERY_SHARE:
+            stream.append(rng.choice(originals))
+        else:
+            stream.append({
+                "id": f"evt_{len(stream)}",
+                "type": rng.choice(IGNORED_TYPES),
+                "created": base,
+                "data": {"object": {"id": f"obj_{len(stream)}"}},
+            })
+    rng.shuffle(stream)
+    return stream, expected
+
+
+def _signed(body: bytes) -> dict:
+    timestamp = str(int(time.time()))
+    signature = hmac.new(
+        STRIPE_WEBHOOK_SECRET.encode(), timestamp.encode() + b"." + body, hashlib.sha256,
+    ).hexdigest()
+    return {"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"}
+
+
+async def ingest(stream: list[dict], concurrency: int) -> dict:
+    from app.main import app
+
+    statuses: dict[int, int] = defaultdict(int)
+    remaining = iter(stream)
+
+    async def worker(client: httpx.AsyncClient):
+        for event in remaining:
+            body = json.dumps(event).encode()
+            response = await client.post("/webhooks/stripe", content=body, headers=_signed(body))
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {"seconds": elapsed, "events_per_second": len(stream) / elapsed, "statuses": dict(statuses)}
+
+
+def _drain(batch_size: int) -> list[int]:
+    counts = []
+    while True:
+        count = webhooks.reconcile_batch(batch_size)
+        if not count:
+            return counts
+        counts.append(count)
+
+
+def reconcile(batch_size: int, reconcilers: int) -> dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=reconcilers) as pool:
+        counts = [count for drained in pool.map(_drain, [batch_size] * reconcilers) for count in drained]
+    elapsed = time.perf_counter() - started
+    return {"seconds": elapsed, "reconcilers": reconcilers, "batches": len(counts), "events": sum(counts),
+            "events_per_second": sum(counts) / elapsed if elapsed else 0.0}
+
+
+def verify(stream: list[dict], expected: dict[int, str], applied: int) -> list[str]:
+    failures = []
+    with SessionLocal() as db:
+        inbox = db.execute(select(
+            func.count(), func.count(func.distinct(models.StripeEvent.event_id)),
+            func.count(models.StripeEvent.processed_at),
+        )).one()
+        unique = len({event["id"] for event in stream})
+        if tuple(inbox) != (unique, unique, unique):
+            failures.append(f"inbox: {inbox[0]} rows, {inbox[1]} distinct, {inbox[2]} processed; "
+                            f"expected {unique} of each")
+        if applied != unique:
+            failures.append(f"reconcilers applied {applied} events; expected {unique}")
+
+        actual = dict(db.execute(
+            select(models.Investment.id, models.Investment.payment_status)
+            .where(models.Investment.id.in_(list(expected)))
+        ).all())
+        wrong = [(i, actual.get(i), status) for i, status in expected.items() if actual.get(i) != status]
+        if wrong:
+            failures.append(f"{len(wrong)} investments in the wrong status, e.g. "
+                            + ", ".join(f"#{i} {got} != {want}" for i, got, want in wrong[:5]))
+
+        counted = models.Investment.payment_status.notin_(webhooks.UNCOUNTED_STATUSES)
+        sums = dict(db.execute(
+            select(models.Investment.project_id, func.sum(models.Investment.amount))
+            .where(counted).group_by(models.Investment.project_id)
+        ).all())
+        funds = dict(db.execute(select(models.Project.id, func.coalesce(models.Project.fundsRaised, 0.0))).all())
+        daily = dict(db.execute(
+            select(models.FundingRollup.project_id, func.sum(models.FundingRollup.amount))
+            .where(models.FundingRollup.granularity == "day").group_by(models.FundingRollup.project_id)
+        ).all())
+        for project_id, raised in funds.items():
+            want = sums.get(project_id, 0.0)
+            if abs(raised - want) > 0.01:
+                failures.append(f"campaign {project_id}: fundsRaised {raised} != {want}")
+            if abs(daily.get(project_id, 0.0) - want) > 0.01:
+                failures.append(f"campaign {project_id}: daily rollups {daily.get(project_id, 0.0)} != {want}")
+    return failures
+
+
+def replay(events: int, investments: int, batch_size: int, concurrency: int, reconcilers: int,
+           seed_value: int) -> tuple[dict, list[str]]:
+    rng = random.Random(seed_value)
+    seeded = seed.seed(founders=10, investors=200, projects=50, investments=investments, updates=0, seed=seed_value)
+    with SessionLocal() as db:
+        db.execute(update(models.Investment).values(
+            payment_intent_id=literal("pi_replay_") + cast(models.Investment.id, String)))
+        investment_ids = list(db.scalars(select(models.Investment.id).order_by(models.Investment.id)))
+        db.commit()
+    stream, expected = build_events(investment_ids, events, rng)
+    report = {
+        "events": len(stream),
+        "unique_events": len({event["id"] for event in stream}),
+        "investments": seeded["rows"]["investments"],
+        "ingest": asyncio.run(ingest(stream, concurrency)),
+        "reconcile": reconcile(batch_size, reconcilers),
+    }
+    return report, verify(stream, expected, report["reconcile"]["events"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000, help="events POSTed, redeliveries included")
+    parser.add_argument("--investments", type=int, default=40000, help="investments given a payment lifecycle")
+    parser.add_argument("--batch-size", type=int, default=500, help="events per reconcile_batch")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--reconcilers", type=int, default=4, help="reconcile_batch loops draining the inbox at once")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--allow-existing", action="store_true",
+                        help="run against a database that already has campaigns")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if db.scalar(select(func.count()).select_from(models.Project)) and not args.allow_existing:
+            print("The database already has campaigns; point DATABASE_URL at an empty scratch database "
+                  "or pass --allow-existing.", file=sys.stderr)
+            sys.exit(2)
+    report, failures = replay(args.events, args.investments, args.batch_size, args.concurrency,
+                             args.reconcilers, args.seed)
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    if failures:
+        print(f"{len(failures)} replay check(s) failed:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# In-process tests import the app, which reads its settings at import time:
+# point it at a throwaway SQLite database before any test module does
+_SESSION_DIR = tempfile.mkdtemp(prefix="fundraising-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_SESSION_DIR, 'test.db')}",
+    "STATIC_FILES_DIR": os.path.join(_SESSION_DIR, "static"),
+    "UPLOAD_PARTIAL_DIR": os.path.join(_SESSION_DIR, "partial"),
+    "LISTING_SNAPSHOT_PATH": "",
+    "RUN_JOBS_IN_APP": "false",
+    "SQL_ECHO": "false",
+})
+os.environ.setdefault("HOST_ADDRESS", "http://test")
+os.makedirs(os.environ["STATIC_FILES_DIR"], exist_ok=True)
+
+
+def run_module(module: str, *args: str, env: dict, timeout: float = 600) -> subprocess.CompletedProcess:
+    """Run `python -m module` from the repo root with `env`, capturing its output."""
+    return subprocess.run(
+        [sys.executable, "-m", module, *args], cwd=ROOT, env=env,
+        capture_output=True, text=True, timeout=timeout,
+    )
+
+
+def run_benchmark(module: str, *args: str, env: dict, timeout: float = 600) -> subprocess.CompletedProcess:
+    """run_module for a harness that exits non-zero on a failed check; fails the test with its report."""
+    result = run_module(module, *args, env=env, timeout=timeout)
+    assert result.returncode == 0, (result.stdout + result.stderr)[-6000:]
+    return result
+
+
+@pytest.fixture(scope="session")
+def database():
+    """The session's database, migrated to head."""
+    migrated = run_module("alembic", "upgrade", "head", env=dict(os.environ))
+    assert migrated.returncode == 0, migrated.stderr
+
+
+@pytest.fixture
+def scratch_database(tmp_path) -> dict:
+    """Environment for a subprocess pointed at a new SQLite database migrated to head."""
+    static_dir = tmp_path / "static"
+    static_dir.mkdir()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'scratch.db'}",
+        "STATIC_FILES_DIR": str(static_dir),
+        "UPLOAD_PARTIAL_DIR": str(tmp_path / "partial"),
+    }
+    migrated = run_module("alembic", "upgrade", "head", env=env)
+    assert migrated.returncode == 0, migrated.stderr
+    return env
+
+
+@pytest.fixture
+def client(database):
+    """A TestClient for the app on the session's database; the lifespan is not run."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    return TestClient(app)
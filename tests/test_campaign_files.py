@@ -0,0 +1,125 @@
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from app import main, models, uploads
+from app.config import STATIC_FILES_DIR
+from app.database import SessionLocal, engine
+
+FORM = {
+    "campaignTitle": "Files", "campaignDescription": "Files", "campaignCategory": "Tech",
+    "targetAmount": "1000", "fundingType": "Equity", "deadline": "2030-01-01T00:00:00",
+    "minInvestment": "10", "email": "files@example.com", "address": "Street 1", "phone": "555",
+}
+
+
+def test_rejected_upload_id_leaves_no_form_file_behind(client):
+    before = set(os.listdir(STATIC_FILES_DIR))
+    response = client.post(
+        "/campaigns",
+        data={**FORM, "campaignImageUploadId": "not-an-upload"},
+        files={"proofOfEligibility": ("proof.pdf", b"%PDF-1.4 proof", "application/pdf")},
+    )
+    assert response.status_code == 409
+    assert set(os.listdir(STATIC_FILES_DIR)) == before
+
+
+def test_failed_insert_removes_the_form_files(client):
+    before = set(os.listdir(STATIC_FILES_DIR))
+    with pytest.raises(Exception, match="FOREIGN KEY"):
+        client.post(
+            "/campaigns",
+            params={"founder_id": 10 ** 9},
+            data=FORM,
+            files={
+                "proofOfEligibility": ("proof.pdf", b"%PDF-1.4 proof", "application/pdf"),
+                "campaignImage": ("image.txt", b"not really an image", "text/plain"),
+            },
+        )
+    assert set(os.listdir(STATIC_FILES_DIR)) == before
+
+
+def test_form_files_are_stored_with_the_campaign(client):
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email="files-founder@example.com", password="x")
+        db.add(founder)
+        db.commit()
+        founder_id = founder.id
+    response = client.post(
+        "/campaigns",
+        params={"founder_id": founder_id},
+        data=FORM,
+        files={
+            "proofOfEligibility": ("proof.pdf", b"%PDF-1.4 proof", "application/pdf"),
+            "campaignImage": ("image.txt", b"not really an image", "text/plain"),
+        },
+    )
+    assert response.status_code == 201, response.text
+    stored = [name for name in os.listdir(STATIC_FILES_DIR) if name.endswith(("_proof.pdf", "_image.txt"))]
+    assert len(stored) == 2
+
+
+def _founder(email: str) -> int:
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email=email, password="x")
+        db.add(founder)
+        db.commit()
+        return founder.id
+
+
+def _received_upload(client, founder_id: int, content: bytes) -> str:
+    params = {"founder_id": founder_id}
+    upload_id = client.post("/uploads", params=params, json={"filename": "deck.pdf", "size": len(content)}).json()["id"]
+    response = client.patch(f"/uploads/{upload_id}", params=params, content=content, headers={"Upload-Offset": "0"})
+    assert response.status_code == 200, response.text
+    return upload_id
+
+
+def test_form_files_are_written_before_the_upload_is_claimed(client, monkeypatch):
+    founder_id = _founder("files-lock@example.com")
+    upload_id = _received_upload(client, founder_id, b"%PDF-1.4 resumable")
+    assert client.post(f"/uploads/{upload_id}/finalize", params={"founder_id": founder_id}).status_code == 200
+
+    save_form_file = main._save_form_file
+
+    def save_without_the_write_lock(prefix, file):
+        # Fails at once if this request's transaction already holds SQLite's write lock
+        other = sqlite3.connect(engine.url.database, timeout=0)
+        try:
+            other.execute("BEGIN IMMEDIATE")
+            other.rollback()
+        finally:
+            other.close()
+        return save_form_file(prefix, file)
+
+    monkeypatch.setattr(main, "_save_form_file", save_without_the_write_lock)
+    response = client.post(
+        "/campaigns",
+        params={"founder_id": founder_id},
+        data={**FORM, "proofOfEligibilityUploadId": upload_id},
+        files={"campaignImage": ("image.txt", b"not really an image", "text/plain")},
+    )
+    assert response.status_code == 201, response.text
+
+
+def test_failed_finalize_commit_leaves_the_upload_resumable(client):
+    founder_id = _founder("files-finalize@example.com")
+    content = b"%PDF-1.4 finalize"
+    upload_id = _received_upload(client, founder_id, content)
+    before = set(os.listdir(STATIC_FILES_DIR))
+
+    def fail_once(session):
+        event.remove(SessionLocal, "before_commit", fail_once)
+        raise RuntimeError("commit failed")
+
+    event.listen(SessionLocal, "before_commit", fail_once)
+    with pytest.raises(RuntimeError, match="commit failed"):
+        client.post(f"/uploads/{upload_id}/finalize", params={"founder_id": founder_id})
+    assert set(os.listdir(STATIC_FILES_DIR)) == before
+    assert uploads.received(upload_id) == len(content)
+
+    response = client.post(f"/uploads/{upload_id}/finalize", params={"founder_id": founder_id})
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == models.COMPLETE_STATUS
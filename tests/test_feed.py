@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import SessionLocal
+
+
+def _founder_with_projects(count: int) -> tuple[int, list[int], int]:
+    """A founder, `count` live campaigns of theirs and a new investor."""
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email=f"feed-founder-{datetime.utcnow().timestamp()}@example.com",
+                                 password="x")
+        investor = models.Investor(name="Investor", email=f"feed-investor-{datetime.utcnow().timestamp()}@example.com",
+                                   password="x")
+        db.add_all([founder, investor])
+        db.flush()
+        projects = [
+            models.Project(name=f"Campaign {i}", description="Feed", founder_id=founder.id, target_amount=1000.0,
+                           fundsRaised=0.0, status=models.LIVE_STATUS,
+                           deadline=datetime.utcnow() + timedelta(days=30))
+            for i in range(count)
+        ]
+        db.add_all(projects)
+        db.commit()
+        return founder.id, [project.id for project in projects], investor.id
+
+
+def _post_update(client: TestClient, founder_id: int, project_id: int) -> int:
+    response = client.post("/updates", params={"founder_id": founder_id},
+                           json={"project_id": project_id, "title": "News", "content": "Progress"})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def _invest(client: TestClient, investor_id: int, project_id: int):
+    response = client.post("/investments", params={"investor_id": investor_id},
+                           json={"project_id": project_id, "amount": 10.0})
+    assert response.status_code == 201, response.text
+
+
+def _feed(client: TestClient, investor_id: int, page_size: int) -> list[int]:
+    ids, before = [], None
+    while True:
+        params = {"investor_id": investor_id, "limit": page_size}
+        if before is not None:
+            params["before"] = before
+        page = [update["id"] for update in client.get("/investor/feed", params=params).json()]
+        ids.extend(page)
+        if len(page) < page_size:
+            return ids
+        before = page[-1]
+
+
+def test_feed_includes_updates_posted_before_investing(client):
+    founder_id, (early, late, other), investor_id = _founder_with_projects(3)
+    before_investing = [_post_update(client, founder_id, early) for _ in range(3)]
+    _invest(client, investor_id, early)
+    _invest(client, investor_id, early)
+    after_investing = [_post_update(client, founder_id, early), _post_update(client, founder_id, late)]
+    _post_update(client, founder_id, other)
+    _invest(client, investor_id, late)
+
+    expected = sorted(before_investing + after_investing, reverse=True)
+    assert _feed(client, investor_id, page_size=2) == expected
+
+
+def test_feed_merges_timeline_and_fan_out_on_read_without_duplicates(client):
+    founder_id, (pushed, switched), investor_id = _founder_with_projects(2)
+    _invest(client, investor_id, pushed)
+    _invest(client, investor_id, switched)
+    updates = []
+    for _ in range(4):
+        updates.append(_post_update(client, founder_id, pushed))
+        updates.append(_post_update(client, founder_id, switched))
+    # Switched after its first updates were fanned out; those are now read from the project
+    with SessionLocal() as db:
+        db.query(models.Project).filter(models.Project.id == switched).update({models.Project.fanout_on_read: True})
+        db.commit()
+    updates.append(_post_update(client, founder_id, switched))
+
+    expected = sorted(updates, reverse=True)
+    assert _feed(client, investor_id, page_size=3) == expected
+    assert _feed(client, investor_id, page_size=50) == expected
+
+
+def test_feed_drops_a_project_once_the_last_investment_in_it_is_gone(client):
+    founder_id, (kept, moved, deleted), investor_id = _founder_with_projects(3)
+    for project_id in (kept, kept, moved, deleted):
+        _invest(client, investor_id, project_id)
+    updates = {project_id: _post_update(client, founder_id, project_id) for project_id in (kept, moved, deleted)}
+    investments = {
+        investment["id"]: investment["project_id"]
+        for investment in client.get("/investor/investments", params={"investor_id": investor_id}).json()
+    }
+    kept_ids = [investment_id for investment_id, project_id in investments.items() if project_id == kept]
+    moved_id = next(investment_id for investment_id, project_id in investments.items() if project_id == moved)
+    deleted_id = next(investment_id for investment_id, project_id in investments.items() if project_id == deleted)
+
+    # One of two investments in `kept` goes; the other still shows its updates
+    assert client.delete(f"/investments/{kept_ids[0]}").status_code == 204
+    assert client.put(f"/investments/{moved_id}", json={"project_id": kept}).status_code == 200
+    assert client.delete(f"/investments/{deleted_id}").status_code == 204
+
+    assert _feed(client, investor_id, page_size=10) == [updates[kept]]
+    for project_id in (moved, deleted):
+        response = client.get(f"/project/{project_id}/updates", params={"investor_id": investor_id})
+        assert response.status_code == 403
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from app import models, series
+from app.database import SessionLocal
+
+
+def _refunded_investment(name: str) -> tuple[int, int, int, int]:
+    """Two live campaigns with 100 counted, and a refunded investment of 40 in the first."""
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email=f"{name}-founder@example.com", password="x")
+        investor = models.Investor(name="Investor", email=f"{name}-investor@example.com", password="x")
+        db.add_all([founder, investor])
+        db.flush()
+        projects = [
+            models.Project(name=f"{name} {i}", description="Refunds", founder_id=founder.id, target_amount=1000.0,
+                           fundsRaised=100.0, status=models.LIVE_STATUS,
+                           deadline=datetime.utcnow() + timedelta(days=30))
+            for i in range(2)
+        ]
+        db.add_all(projects)
+        db.flush()
+        now = datetime.utcnow()
+        for project in projects:
+            db.add(models.Investment(amount=100.0, investor_id=investor.id, project_id=project.id,
+                                     created_at=now, payment_status="succeeded"))
+            series.record_funding(db, project.id, now, 100.0, 1)
+        refunded = models.Investment(amount=40.0, investor_id=investor.id, project_id=projects[0].id,
+                                     created_at=now, payment_status="refunded")
+        db.add(refunded)
+        db.commit()
+        return founder.id, projects[0].id, projects[1].id, refunded.id
+
+
+def _totals(client, founder_id: int, project_id: int) -> tuple[float, float]:
+    """(fundsRaised, sum of the daily rollups)."""
+    with SessionLocal() as db:
+        raised = db.get(models.Project, project_id).fundsRaised
+    points = client.get(f"/campaigns/{project_id}/funding-series", params={"founder_id": founder_id}).json()
+    return raised, sum(point["amount"] for point in points)
+
+
+def test_deleting_a_refunded_investment_leaves_the_totals_alone(client):
+    founder_id, project_id, _, refunded_id = _refunded_investment("delete-refunded")
+    assert client.delete(f"/investments/{refunded_id}").status_code == 204
+    assert _totals(client, founder_id, project_id) == (100.0, 100.0)
+
+
+def test_moving_a_refunded_investment_leaves_the_totals_alone(client):
+    founder_id, project_id, other_id, refunded_id = _refunded_investment("move-refunded")
+    response = client.put(f"/investments/{refunded_id}", json={"project_id": other_id, "amount": 60.0})
+    assert response.status_code == 200
+    assert _totals(client, founder_id, project_id) == (100.0, 100.0)
+    assert _totals(client, founder_id, other_id) == (100.0, 100.0)
@@ -0,0 +1,54 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app import config, jobs, models
+from app.database import SessionLocal
+
+
+def _drain(batch_size: int) -> list[int]:
+    claimed = []
+    while True:
+        batch = jobs.claim(batch_size)
+        if not batch:
+            return claimed
+        claimed.extend(job_id for job_id, _, _ in batch)
+
+
+def test_concurrent_claims_hand_out_each_job_once(database):
+    with SessionLocal() as db:
+        db.query(models.Job).delete()
+        for i in range(300):
+            jobs.enqueue(db, "noop", {"i": i})
+        db.commit()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(_drain, [5] * 8))
+
+    counts = Counter(job_id for claimed in results for job_id in claimed)
+    assert len(counts) == 300
+    assert [job_id for job_id, count in counts.items() if count > 1] == []
+
+
+def test_purge_deletes_finished_jobs_past_retention(database, monkeypatch):
+    monkeypatch.setattr(jobs, "PURGE_BATCH_SIZE", 2)
+    old = datetime.utcnow() - timedelta(seconds=config.JOB_RETENTION_SECONDS + 60)
+    with SessionLocal() as db:
+        db.query(models.Job).delete()
+        for status in (jobs.DONE, jobs.FAILED, jobs.DONE, jobs.FAILED, jobs.DONE):
+            db.add(models.Job(kind="noop", payload="{}", status=status, run_at=old))
+        kept = [
+            models.Job(kind="noop", payload="{}", status=jobs.DONE),
+            models.Job(kind="noop", payload="{}", status=jobs.QUEUED, run_at=old),
+            models.Job(kind="noop", payload="{}", status=jobs.RUNNING, run_at=old),
+        ]
+        db.add_all(kept)
+        db.commit()
+        kept_ids = {job.id for job in kept}
+
+    assert jobs._purge_finished() == 5
+
+    with SessionLocal() as db:
+        left = db.query(models.Job).all()
+    assert {job.id for job in left if job.kind == "noop"} == kept_ids
+    assert [job.kind for job in left if job.kind != "noop"] == ["purge_finished_jobs"]
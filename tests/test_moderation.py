@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from app import models
+from app.config import ADMIN_CREATION_TOKEN
+from app.database import SessionLocal
+
+
+def _pending_campaign_with_investor() -> tuple[int, int]:
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email="moderation-founder@example.com", password="x")
+        investor = models.Investor(name="Investor", email="moderation-investor@example.com", password="x")
+        db.add_all([founder, investor])
+        db.flush()
+        project = models.Project(name="Pending", description="Moderation", founder_id=founder.id,
+                                 target_amount=1000.0, fundsRaised=10.0, status=models.PENDING_STATUS,
+                                 deadline=datetime.utcnow() + timedelta(days=30))
+        db.add(project)
+        db.flush()
+        db.add(models.Investment(amount=10.0, investor_id=investor.id, project_id=project.id,
+                                 created_at=datetime.utcnow()))
+        db.commit()
+        return project.id, investor.id
+
+
+def test_moderation_needs_the_admin_token(client):
+    assert client.get("/moderation/campaigns", params={"token": "wrong"}).status_code == 403
+    response = client.post("/moderation/campaigns/transition", params={"token": "wrong"},
+                           json={"ids": [1], "action": "approve"})
+    assert response.status_code == 403
+
+
+def test_transition_refreshes_the_investors_portfolios(client):
+    project_id, investor_id = _pending_campaign_with_investor()
+    before = client.get("/investor/portfolio", params={"investor_id": investor_id}).json()
+    assert [h["status"] for h in before["holdings"]] == [models.PENDING_STATUS]
+
+    response = client.post("/moderation/campaigns/transition", params={"token": ADMIN_CREATION_TOKEN},
+                           json={"ids": [project_id], "action": "approve"})
+    assert response.json() == {"updated": [project_id], "skipped": []}
+
+    after = client.get("/investor/portfolio", params={"investor_id": investor_id}).json()
+    assert [h["status"] for h in after["holdings"]] == [models.LIVE_STATUS]
@@ -0,0 +1,160 @@
+import asyncio
+import email
+import socketserver
+import threading
+
+import pytest
+
+from app import config, models, notifications
+from app.database import SessionLocal
+
+
+class _Session(socketserver.StreamRequestHandler):
+    """Just enough of SMTP for smtplib: no TLS, no AUTH."""
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        delivered = 0
+        recipients = []
+        self.reply("220 localhost test SMTP")
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            verb = line.split(" ", 1)[0].upper()
+            server.commands.append(verb)
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif verb in ("HELO", "NOOP", "MAIL"):
+                self.reply("250 OK")
+            elif verb == "RSET":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = line.split(":", 1)[1].strip(" <>")
+                if address in server.refuse:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in self.rfile:
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                with server.lock:
+                    server.messages.append((recipients, email.message_from_bytes(b"".join(lines))))
+                recipients = []
+                delivered += 1
+                self.reply("250 Queued")
+                if delivered == server.drop_after:
+                    return
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Session)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.commands: list[str] = []
+        self.messages: list[tuple[list[str], email.message.Message]] = []
+        self.refuse: set[str] = set()
+        # Hang up after this many messages on one connection
+        self.drop_after = None
+
+    @property
+    def delivered(self) -> list[str]:
+        return [address for recipients, _ in self.messages for address in recipients]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = LocalSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(config, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(config, "SMTP_PORT", server.server_address[1])
+    monkeypatch.setattr(config, "SMTP_USER", "")
+    monkeypatch.setattr(config, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(notifications.time, "sleep", lambda seconds: None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _recipients(count: int) -> list[str]:
+    return [f"investor{i}@example.com" for i in range(count)]
+
+
+def test_batch_is_sent_over_one_connection(smtp_server):
+    recipients = _recipients(20)
+    assert notifications._send_batch(recipients, "Subject", "Body") == []
+    assert smtp_server.delivered == recipients
+    assert smtp_server.connections == 1
+    assert smtp_server.commands[-1] == "QUIT"
+
+
+def test_refused_recipient_is_returned_and_the_rest_delivered(smtp_server):
+    recipients = _recipients(6)
+    smtp_server.refuse = {recipients[2]}
+    assert notifications._send_batch(recipients, "Subject", "Body") == [recipients[2]]
+    assert smtp_server.delivered == recipients[:2] + recipients[3:]
+    assert smtp_server.connections == 1
+
+
+def test_dropped_connection_is_reopened(smtp_server):
+    smtp_server.drop_after = 5
+    recipients = _recipients(12)
+    assert notifications._send_batch(recipients, "Subject", "Body") == []
+    assert sorted(smtp_server.delivered) == sorted(recipients)
+    assert smtp_server.connections == 3
+
+
+def test_nothing_is_sent_in_the_clear_when_starttls_is_required(smtp_server, monkeypatch):
+    monkeypatch.setattr(config, "SMTP_STARTTLS", True)
+    monkeypatch.setattr(config, "SMTP_USER", "mailer")
+    monkeypatch.setattr(config, "SMTP_PASSWORD", "secret")
+    recipients = _recipients(2)
+    assert notifications._send_batch(recipients, "Subject", "Body") == recipients
+    assert smtp_server.messages == []
+    assert "AUTH" not in smtp_server.commands
+    assert "MAIL" not in smtp_server.commands
+
+
+def test_send_job_keeps_only_failed_recipients_for_its_retry(smtp_server, database):
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email="notify-founder@example.com", password="x")
+        db.add(founder)
+        db.flush()
+        project = models.Project(name="Solar", description="Panels", founder_id=founder.id)
+        db.add(project)
+        db.flush()
+        update = models.Update(title="Shipped", content="The first batch is out.", project_id=project.id)
+        db.add(update)
+        db.commit()
+        update_id = update.id
+
+    recipients = _recipients(4)
+    smtp_server.refuse = {recipients[1]}
+    payload = {"update_id": update_id, "recipients": recipients}
+    with pytest.raises(RuntimeError, match="1 of 4"):
+        asyncio.run(notifications.send_update_emails(payload))
+    assert payload["recipients"] == [recipients[1]]
+    assert len(smtp_server.messages) == 3
+    _, message = smtp_server.messages[0]
+    assert message["Subject"] == "Solar: Shipped"
+    assert message.get_payload().strip() == "The first batch is out."
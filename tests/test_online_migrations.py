@@ -0,0 +1,130 @@
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from alembic.config import Config
+from alembic.operations import Operations
+from alembic.runtime.environment import EnvironmentContext
+from alembic.script import ScriptDirectory
+
+from app import online_migrations
+
+SCRIPT_LOCATION = str(Path(__file__).resolve().parents[1] / "alembic")
+
+
+@pytest.fixture
+def engine(scratch_database):
+    engine = sa.create_engine(scratch_database["DATABASE_URL"])
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER, label TEXT)"))
+        conn.execute(sa.text("CREATE TABLE copies (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, value INTEGER)"))
+        conn.execute(sa.text("INSERT INTO items (id, value) VALUES (:id, :value)"),
+                     [{"id": i, "value": i * 10} for i in range(1, 101)])
+    yield engine
+    engine.dispose()
+
+
+@contextmanager
+def migration(engine, *x: str):
+    """What a migration's upgrade() runs in, as `alembic -x ... upgrade` sets it up."""
+    config = Config()
+    config.set_main_option("script_location", SCRIPT_LOCATION)
+    config.cmd_opts = argparse.Namespace(x=list(x))
+    with engine.connect() as conn, EnvironmentContext(config, ScriptDirectory.from_config(config)) as env:
+        # A real transaction around the helpers, like the one run_migrations opens per migration
+        env.configure(connection=conn, transactional_ddl=True)
+        with env.begin_transaction(), Operations.context(env.get_context()):
+            yield
+
+
+def _rows(engine, sql: str) -> list:
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(sa.text(sql))]
+
+
+def _checkpoints(engine) -> list:
+    return _rows(engine, f"SELECT name, last_key FROM {online_migrations.CHECKPOINT_TABLE}")
+
+
+def test_backfill_updates_matching_rows_in_batches(engine):
+    with migration(engine):
+        online_migrations.backfill("items", {"label": "'big-' || (value * :scale)"}, where="value > :floor",
+                                   params={"scale": 2, "floor": 500}, batch_size=7)
+
+    assert _rows(engine, "SELECT count(*) FROM items WHERE label IS NULL") == [(50,)]
+    assert _rows(engine, "SELECT label FROM items WHERE id IN (50, 51, 100) ORDER BY id") == [
+        (None,), ("big-1020",), ("big-2000",)]
+    assert _checkpoints(engine) == []
+
+
+def test_backfill_resumes_after_its_checkpoint(engine):
+    with engine.begin() as conn:
+        online_migrations._load_checkpoint(conn, "items:label")
+        online_migrations._save_checkpoint(conn, "items:label", 60)
+
+    with migration(engine):
+        online_migrations.backfill("items", {"label": "'done'"}, batch_size=15)
+
+    assert _rows(engine, "SELECT min(id), max(id), count(*) FROM items WHERE label = 'done'") == [(61, 100, 40)]
+    assert _checkpoints(engine) == []
+
+
+def test_backfill_insert_copies_rows_once(engine):
+    select = ("SELECT items.id, items.value FROM items WHERE items.id > :last_key AND items.id <= :upto "
+              "AND items.value >= :floor AND NOT EXISTS (SELECT 1 FROM copies WHERE copies.item_id = items.id)")
+    for _ in range(2):
+        with migration(engine):
+            online_migrations.backfill_insert("copies", ["item_id", "value"], select, key_table="items",
+                                              params={"floor": 200}, batch_size=9)
+
+    assert _rows(engine, "SELECT count(*), min(item_id), max(item_id), sum(value) FROM copies") == [
+        (81, 20, 100, sum(range(200, 1001, 10)))]
+    assert _checkpoints(engine) == []
+
+
+def test_add_column_with_backfill_fills_existing_rows(engine):
+    with migration(engine):
+        online_migrations.add_column_with_backfill(
+            "items", sa.Column("doubled", sa.Integer(), nullable=False), "value * 2", not_null=True, batch_size=30)
+
+    assert _rows(engine, "SELECT count(*) FROM items WHERE doubled = value * 2") == [(100,)]
+    with pytest.raises(sa.exc.IntegrityError), engine.begin() as conn:
+        conn.execute(sa.text("INSERT INTO items (id, value) VALUES (101, 1)"))
+
+
+def test_create_index_concurrently_builds_a_partial_index(engine):
+    with migration(engine):
+        online_migrations.create_index_concurrently("ix_items_big", "items", ["value"], where="value > 500")
+
+    index = sa.inspect(engine).get_indexes("items")
+    assert [(i["name"], i["column_names"]) for i in index] == [("ix_items_big", ["value"])]
+    plan = _rows(engine, "EXPLAIN QUERY PLAN SELECT id FROM items WHERE value > 500 AND value < 600")
+    assert any("ix_items_big" in row[-1] for row in plan)
+
+    with migration(engine):
+        online_migrations.drop_index_concurrently("ix_items_big", "items")
+    assert sa.inspect(engine).get_indexes("items") == []
+
+
+def test_dry_run_estimates_and_changes_nothing(engine, monkeypatch):
+    # Table statistics come from Postgres' catalog; give the estimate fixed ones
+    monkeypatch.setattr(online_migrations, "table_stats", lambda table: (40000, 200 * 1024 * 1024))
+    monkeypatch.setattr(online_migrations, "estimated_seconds", 0.0)
+
+    with migration(engine, "dry_run=true"):
+        assert online_migrations.dry_run()
+        online_migrations.backfill("items", {"label": "'dry'"}, batch_size=10000, pause_seconds=0.5)
+        online_migrations.create_index_concurrently("ix_items_value", "items", ["value"])
+
+    # 40000 rows at 20000/s plus 4 pauses, then two 200 MiB scans at 100 MiB/s
+    assert online_migrations.estimated_seconds == pytest.approx(2 + 4 * 0.5 + 4)
+    assert _rows(engine, "SELECT count(*) FROM items WHERE label IS NOT NULL") == [(0,)]
+    assert sa.inspect(engine).get_indexes("items") == []
+    assert not sa.inspect(engine).has_table(online_migrations.CHECKPOINT_TABLE) or _checkpoints(engine) == []
+
+
+def test_dry_run_is_off_without_the_argument(engine):
+    with migration(engine, "other=1"):
+        assert not online_migrations.dry_run()
@@ -0,0 +1,9 @@
+from .conftest import run_benchmark
+
+
+def test_payment_jobs_give_every_investment_one_intent(scratch_database):
+    """A small run of the payment throughput benchmark; the full run is `python -m benchmarks.payments`."""
+    run_benchmark(
+        "benchmarks.payments", "--jobs", "40", "--batch-sizes", "1,10",
+        env={**scratch_database, "STRIPE_STUB_LATENCY_MS": "5"},
+    )
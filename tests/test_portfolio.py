@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+from app import models
+from app.database import SessionLocal
+
+
+def test_campaign_edits_reach_cached_portfolios(client):
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email="portfolio-founder@example.com", password="x")
+        investor = models.Investor(name="Investor", email="portfolio-investor@example.com", password="x")
+        db.add_all([founder, investor])
+        db.flush()
+        project = models.Project(name="Portfolio", description="Cached", founder_id=founder.id,
+                                 target_amount=1000.0, fundsRaised=0.0, status=models.LIVE_STATUS,
+                                 image_url="static/portfolio.png", deadline=datetime.utcnow() + timedelta(days=30))
+        db.add(project)
+        db.commit()
+        investor_id, project_id = investor.id, project.id
+
+    response = client.post("/investments", params={"investor_id": investor_id},
+                           json={"project_id": project_id, "amount": 100.0})
+    assert response.status_code == 201
+
+    def holding() -> dict:
+        (item,) = client.get("/investor/portfolio", params={"investor_id": investor_id}).json()["holdings"]
+        return item
+
+    assert (holding()["status"], holding()["progress"]) == (models.LIVE_STATUS, 10.0)
+    response = client.put(f"/campaigns/{project_id}", json={"status": models.REJECTED_STATUS, "target_amount": 500.0})
+    assert response.status_code == 200
+    item = holding()
+    assert (item["status"], item["targetAmount"], item["progress"]) == (models.REJECTED_STATUS, 500.0, 20.0)
@@ -0,0 +1,6 @@
+from .conftest import run_benchmark
+
+
+def test_every_route_stays_within_its_query_budget(scratch_database):
+    """Runs benchmarks.query_budget; its output lists the statements of any route over budget."""
+    run_benchmark("benchmarks.query_budget", env=scratch_database, timeout=900)
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import models, rankings
+from app.database import SessionLocal
+
+
+def test_changes_during_a_rebuild_survive_the_swap(database):
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email="rankings-founder@example.com", password="x")
+        db.add(founder)
+        db.flush()
+        funded, approved = [
+            models.Project(name=name, description="Rankings", founder_id=founder.id, target_amount=1000.0,
+                           fundsRaised=0.0, status=models.LIVE_STATUS, campaignTitle=name,
+                           deadline=datetime.utcnow() + timedelta(days=30))
+            for name in ("Funded", "Approved")
+        ]
+        db.add_all([funded, approved])
+        db.commit()
+        funded_id, approved_id = funded.id, approved.id
+
+    board = rankings.Rankings()
+    arrived = []
+    with SessionLocal() as db:
+        def arrive_mid_load(orm_execute_state):
+            if arrived:
+                return
+            arrived.append(True)
+            # While the live campaigns are being read, one is funded and the other taken down
+            board.on_funding({"project_id": funded_id, "fundsRaised": 250.0, "delta": 250.0, "count": 1})
+            board.remove(approved_id)
+
+        event.listen(db, "do_orm_execute", arrive_mid_load)
+        board.rebuild(db)
+
+    assert funded_id in board.summaries and approved_id not in board.summaries
+    assert board.summaries[funded_id]["fundsRaised"] == 250.0
+    assert board.most_funded.get(funded_id) == -250.0
+    assert funded_id in [item["id"] for item in board.top_trending(100)]
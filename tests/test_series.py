@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from app import models
+from app.database import SessionLocal
+
+
+def test_undated_investments_stay_out_of_the_funding_series(client):
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email="series-founder@example.com", password="x")
+        investor = models.Investor(name="Investor", email="series-investor@example.com", password="x")
+        db.add_all([founder, investor])
+        db.flush()
+        project = models.Project(name="Series", description="Series", founder_id=founder.id, target_amount=1000.0,
+                                 fundsRaised=50.0, status=models.LIVE_STATUS,
+                                 deadline=datetime.utcnow() + timedelta(days=30))
+        db.add(project)
+        db.flush()
+        undated = models.Investment(amount=50.0, investor_id=investor.id, project_id=project.id)
+        db.add(undated)
+        db.flush()
+        # From before investments had a timestamp
+        db.query(models.Investment).filter(models.Investment.id == undated.id).update(
+            {models.Investment.created_at: None})
+        db.commit()
+        founder_id, investor_id, project_id, undated_id = founder.id, investor.id, project.id, undated.id
+
+    response = client.post("/investments", params={"investor_id": investor_id},
+                           json={"project_id": project_id, "amount": 20.0})
+    assert response.status_code == 201
+    assert client.put(f"/investments/{undated_id}", json={"amount": 40.0}).status_code == 200
+    assert client.delete(f"/investments/{undated_id}").status_code == 204
+
+    for granularity in ("hour", "day"):
+        series = client.get(f"/campaigns/{project_id}/funding-series",
+                            params={"founder_id": founder_id, "granularity": granularity}).json()
+        assert [(point["amount"], point["count"]) for point in series] == [(20.0, 1)]
+
+
+def test_undated_investments_open_the_cumulative_total(client):
+    with SessionLocal() as db:
+        founder = models.Founder(name="Founder", email="opening-founder@example.com", password="x")
+        investor = models.Investor(name="Investor", email="opening-investor@example.com", password="x")
+        db.add_all([founder, investor])
+        db.flush()
+        project = models.Project(name="Opening", description="Series", founder_id=founder.id, target_amount=1000.0,
+                                 fundsRaised=50.0, status=models.LIVE_STATUS,
+                                 deadline=datetime.utcnow() + timedelta(days=30))
+        db.add(project)
+        db.flush()
+        undated = models.Investment(amount=50.0, investor_id=investor.id, project_id=project.id)
+        db.add(undated)
+        db.flush()
+        db.query(models.Investment).filter(models.Investment.id == undated.id).update(
+            {models.Investment.created_at: None})
+        db.commit()
+        founder_id, investor_id, project_id = founder.id, investor.id, project.id
+
+    for amount in (20.0, 5.0):
+        response = client.post("/investments", params={"investor_id": investor_id},
+                               json={"project_id": project_id, "amount": amount})
+        assert response.status_code == 201
+
+    with SessionLocal() as db:
+        funds_raised = db.get(models.Project, project_id).fundsRaised
+    for granularity in ("hour", "day"):
+        series = client.get(f"/campaigns/{project_id}/funding-series",
+                            params={"founder_id": founder_id, "granularity": granularity}).json()
+        assert sum(point["amount"] for point in series) == 25.0
+        assert series[-1]["cumulative"] == funds_raised == 75.0
@@ -0,0 +1,13 @@
+from .conftest import run_benchmark
+
+
+def test_idle_subscribers_all_receive_funding_changes(scratch_database):
+    """A small run of the idle-subscriber benchmark; the 10k run is `python -m benchmarks.sse_subscribers`."""
+    run_benchmark(
+        "benchmarks.seed", "--founders", "5", "--investors", "50", "--projects", "30",
+        "--investments", "200", "--updates", "10", env=scratch_database,
+    )
+    run_benchmark(
+        "benchmarks.sse_subscribers", "--subscribers", "300", "--campaigns", "5", "--publishes", "5",
+        env=scratch_database,
+    )
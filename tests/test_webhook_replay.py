@@ -0,0 +1,9 @@
+from .conftest import run_benchmark
+
+
+def test_replayed_events_reconcile_to_the_newest_status(scratch_database):
+    """A shuffled stream with redeliveries; the full 100k run is `python -m benchmarks.webhook_replay`."""
+    run_benchmark(
+        "benchmarks.webhook_replay", "--events", "3000", "--investments", "1200", "--batch-size", "100",
+        env=scratch_database,
+    )